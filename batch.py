@@ -0,0 +1,156 @@
+import argparse, csv, os, sys, time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from metrics import SCORE_KEYS, score_table
+from session import analyze_video, init_worker
+
+# Traitement hors ligne d'un dossier (ou d'un manifeste CSV) de vidéos enregistrées, une vidéo par processus.
+# Les résultats sont écrits au fil de l'eau, ce qui permet de reprendre un traitement interrompu.
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".webm")
+METRIC_KEYS = ("avg_bpm", "avg_hrv", "avg_spo2", "avg_respiration", "avg_systolic", "avg_diastolic")
+CONFIDENCE_KEYS = tuple(key.replace("avg_", "confidence_") for key in METRIC_KEYS)  # Confiance de chaque moyenne
+COLUMNS = ("path", "age", "weight", "height", "frames", "samples", *METRIC_KEYS, *SCORE_KEYS,
+        "stress_level", "detect_ratio", *CONFIDENCE_KEYS, "rejected_windows", "seconds", "error")
+
+# Lister les vidéos à traiter : (chemin, âge, poids, taille)
+def load_jobs(source, age, weight, height):
+    if os.path.isdir(source):
+        paths = sorted(os.path.join(root, name) for root, _, names in os.walk(source)
+                    for name in names if name.lower().endswith(VIDEO_EXTENSIONS))
+        return [(path, age, weight, height) for path in paths]
+    # Manifeste CSV : colonne path obligatoire, age/weight/height optionnelles (valeurs par défaut sinon)
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source, newline='') as manifest:
+        return [(os.path.join(base, row["path"]), int(row.get("age") or age), int(row.get("weight") or weight),
+                int(row.get("height") or height)) for row in csv.DictReader(manifest)]
+
+# Analyser une vidéo dans un processus du pool ; les erreurs sont renvoyées dans la ligne de résultat
+def process_job(job, params):
+    path, age, weight, height = job
+    row = {"path": path, "age": age, "weight": weight, "height": height}
+    start = time.perf_counter()
+    try:
+        results = analyze_video(path, age, weight, height, **params)
+        if results is None:
+            row["error"] = "Erreur lors du chargement de la vidéo."
+        else:
+            row.update(frames=results["frames"], samples=results["samples"], stress_level=results["stress_level"],
+                    detect_ratio=results["face_tracking"]["detect_ratio"],
+                    **{key.replace("avg_", "confidence_"): value for key, value in results["quality"]["confidence"].items()},
+                    rejected_windows=sum(results["quality"]["rejected"].values()), **results["metrics"], **results["scores"])
+    except Exception as error:
+        row["error"] = f"{type(error).__name__}: {error}"
+    row["seconds"] = round(time.perf_counter() - start, 3)
+    return row
+
+# Chemins déjà traités avec succès (sortie CSV / journal partiel, ou Parquet final) ; les vidéos en erreur
+# seront retraitées
+def completed_paths(output, journal):
+    done = set()
+    if os.path.exists(journal):
+        with open(journal, newline='') as existing:
+            done.update(row["path"] for row in csv.DictReader(existing) if not row.get("error"))
+    if output != journal and os.path.exists(output):
+        import pandas as pd
+        table = pd.read_parquet(output, columns=["path", "error"])
+        done.update(table["path"][table["error"].isna() | (table["error"] == "")])
+    return done
+
+# Retirer du journal les lignes en erreur avant de retraiter ces vidéos (réécriture atomique)
+def drop_failed(journal):
+    if not os.path.exists(journal):
+        return
+    with open(journal, newline='') as existing:
+        reader = csv.DictReader(existing)
+        fieldnames, rows = reader.fieldnames or COLUMNS, list(reader)
+    kept = [row for row in rows if not row.get("error")]
+    if len(kept) == len(rows):
+        return
+    with open(journal + ".tmp", "w", newline='') as out:
+        writer = csv.DictWriter(out, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(kept)
+    os.replace(journal + ".tmp", journal)
+
+def write_parquet(output, journal):
+    import pandas as pd
+    frames = [pd.read_csv(journal)]
+    if os.path.exists(output):
+        frames.insert(0, pd.read_parquet(output))
+    # Une vidéo retraitée après une erreur remplace sa ligne précédente
+    table = pd.concat(frames, ignore_index=True).drop_duplicates("path", keep="last")
+    table.to_parquet(output, index=False)
+    os.remove(journal)
+
+# Recalculer les scores d'un fichier de résultats existant (ex: après un changement des formules de metrics.py)
+# sans réanalyser les vidéos, en une passe vectorisée. Comme dans la session, une vidéo avec moins de
+# min_total_sec secondes de signal (échantillons à fs) garde des scores nuls ; les lignes en erreur restent vides
+def rescore_file(source, output, fs=30, min_total_sec=20):
+    import pandas as pd
+    table = pd.read_parquet(source) if source.endswith(".parquet") else pd.read_csv(source)
+    samples = table["samples"].to_numpy(dtype=float)
+    for key, scores in score_table(table).items():
+        table[key] = np.where(np.isnan(samples), np.nan, np.where(samples > min_total_sec * fs, scores, 0.0))
+    if output.endswith(".parquet"):
+        table.to_parquet(output, index=False)
+    else:
+        table.to_csv(output, index=False)
+    return len(table)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyse rPPG hors ligne d'un dossier ou d'un manifeste CSV de vidéos")
+    parser.add_argument("source", help="Dossier de vidéos ou manifeste CSV (colonnes path[,age,weight,height])")
+    parser.add_argument("-o", "--output", default="results.csv", help="Fichier de résultats (.csv ou .parquet)")
+    parser.add_argument("--age", type=int, default=30)
+    parser.add_argument("--weight", type=int, default=70)
+    parser.add_argument("--height", type=int, default=175)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Nombre de processus")
+    parser.add_argument("--fs", type=float, default=30,
+                        help="Fréquence d'analyse (Hz) : les signaux sont rééchantillonnés à cette fréquence")
+    parser.add_argument("--method", default="green", help="Algorithme rPPG (green, chrom, pos)")
+    parser.add_argument("--window-sec", type=float, default=20, help="Taille de la fenêtre glissante (s)")
+    parser.add_argument("--hop-sec", type=float, default=1, help="Intervalle entre deux recalculs (s)")
+    parser.add_argument("--rescore", action="store_true",
+                        help="Source = fichier de résultats : recalculer seulement les scores (pandas requis)")
+    args = parser.parse_args(argv)
+
+    if args.rescore:
+        start = time.perf_counter()
+        count = rescore_file(args.source, args.output, args.fs)
+        print(f"{count} lignes recalculées en {time.perf_counter() - start:.1f} s -> {args.output}")
+        return 0
+
+    params = dict(fs=args.fs, method=args.method, window_sec=args.window_sec, hop_sec=args.hop_sec)
+    parquet = args.output.endswith(".parquet")
+    journal = args.output + ".partial.csv" if parquet else args.output
+
+    jobs = load_jobs(args.source, args.age, args.weight, args.height)
+    done = completed_paths(args.output, journal)
+    drop_failed(journal)
+    pending = [job for job in jobs if job[0] not in done]
+    print(f"{len(jobs)} vidéos, {len(jobs) - len(pending)} déjà traitées, {len(pending)} à traiter avec {args.workers} processus")
+
+    new_file = not os.path.exists(journal)
+    start = time.perf_counter()
+    with open(journal, "a", newline='') as out, \
+            ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker) as pool:
+        writer = csv.DictWriter(out, fieldnames=COLUMNS, extrasaction="ignore")
+        if new_file:
+            writer.writeheader()
+        futures = [pool.submit(process_job, job, params) for job in pending]
+        for count, future in enumerate(as_completed(futures), 1):
+            row = future.result()
+            writer.writerow(row)
+            out.flush()  # Chaque résultat est sur disque : une interruption ne perd que les vidéos en cours
+            status = row.get("error") or f"HR {row.get('avg_bpm')}"
+            print(f"[{count}/{len(pending)}] {row['path']} ({row['seconds']} s) {status}")
+
+    elapsed = time.perf_counter() - start
+    if pending:
+        print(f"{len(pending)} vidéos en {elapsed:.1f} s, soit {len(pending) / elapsed * 60:.1f} vidéos/min")
+    if parquet:
+        write_parquet(args.output, journal)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+import os, sys, timeit
+import numpy as np
+from scipy.signal import butter, filtfilt
+from scipy.fft import fft, rfft
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from spectral import frequency_grid
+from vitals import GrowableBuffer, bandpass_filter, dsp
+
+# Anciennes versions : conception du filtre à chaque appel sur une liste Python, FFT complexe et grille recalculée
+def legacy_bandpass(signal, lowcut, highcut, fs, order=4):
+    nyquist = 0.5 * fs
+    b, a = butter(order, [lowcut / nyquist, highcut / nyquist], btype='bandpass')
+    return filtfilt(b, a, signal)
+
+def legacy_spectrum(signal, fs):
+    n = len(signal)
+    return np.fft.fftfreq(n, d=1/fs)[:n // 2], np.abs(fft(signal)[:n // 2])
+
+def cached_spectrum(signal, fs):
+    n = len(signal)
+    return frequency_grid(n, fs)[:n // 2], np.abs(rfft(signal)[:n // 2])
+
+def bench(label, func, number=200):
+    seconds = min(timeit.repeat(func, number=number, repeat=5)) / number
+    print(f"{label:<44} {seconds * 1e6:>9.1f} µs/appel")
+    return seconds
+
+if __name__ == "__main__":
+    fs = 30
+    for seconds in (20, 60):
+        n = seconds * fs
+        signal = list(100 + np.sin(2 * np.pi * 1.2 * np.arange(n) / fs))
+        array = np.asarray(signal)
+        print(f"signal de {seconds} s à {fs} Hz ({n} échantillons)")
+        before = bench("butter + filtfilt sur liste (avant)", lambda: legacy_bandpass(signal, 0.8, 2.5, fs))
+        after = bench("SOS et zi en cache, zéro-phase (après)", lambda: bandpass_filter(array, 0.8, 2.5, fs))
+        print(f"{'':<44} {before / after:>9.1f}x")
+        bench("butter seul (conception du filtre)", lambda: butter(4, [0.8, 2.5], btype='bandpass', fs=fs))
+        bench("dsp.bandpass_sos (cache LRU)", lambda: dsp.bandpass_sos(0.8, 2.5, fs, 4))
+        bench("fft + fftfreq (avant)", lambda: legacy_spectrum(array, fs))
+        bench("rfft + rfftfreq en cache (après)", lambda: cached_spectrum(array, fs))
+        print()
+
+    # Moyenne des valeurs accumulées après chaque intervalle : liste + np.mean contre moyenne glissante
+    values = list(np.random.default_rng(0).normal(72, 3, 3600))
+    def list_means():
+        history = []
+        for value in values:
+            history.append(value)
+            np.mean(history)
+    def buffer_means():
+        history = GrowableBuffer()
+        for value in values:
+            history.append(value)
+            history.mean()
+    print(f"moyenne après chaque ajout, {len(values)} valeurs")
+    bench("liste + np.mean (avant)", list_means, 1)
+    bench("GrowableBuffer.mean (après)", buffer_means, 1)
+    print(f"cache DSP : {dsp.hits} hits, {dsp.misses} misses")
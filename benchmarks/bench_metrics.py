@@ -0,0 +1,61 @@
+import argparse, os, sys, time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from metrics import (SCORE_KEYS, score_table, calculate_activity, calculate_sleep, calculate_equilibrium,
+                    calculate_metabolism, calculate_health, calculate_relaxation)
+
+# Recalcul des six scores sur une population : boucle Python sur les fonctions calculate_* (une session à la fois,
+# mesurée sur un sous-ensemble puis extrapolée) contre score_table en une passe sur les colonnes.
+# Une partie des lignes a des signaux manquants (NaN) ou nuls, comme des sessions sans mesure exploitable.
+def make_table(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    table = {"avg_bpm": rng.uniform(45, 160, rows), "avg_hrv": rng.uniform(10, 150, rows),
+            "avg_spo2": rng.uniform(88, 100, rows), "avg_respiration": rng.uniform(5, 30, rows),
+            "avg_systolic": rng.uniform(95, 150, rows), "avg_diastolic": rng.uniform(55, 95, rows),
+            "age": rng.integers(18, 90, rows).astype(float), "weight": rng.uniform(45, 120, rows),
+            "height": rng.uniform(145, 200, rows)}
+    for key in ("avg_bpm", "avg_systolic", "avg_diastolic", "avg_respiration"):
+        table[key][rng.random(rows) < 0.01] = np.nan
+    table["avg_bpm"][rng.random(rows) < 0.01] = 0
+    return table
+
+def score_loop(table, rows):
+    columns = {key: values[:rows].tolist() for key, values in table.items()}
+    scores = {key: [] for key in SCORE_KEYS}
+    for bpm, hrv, spo2, resp, sys_, dia, age, weight, height in zip(*(columns[key] for key in columns)):
+        scores["activity_score"].append(calculate_activity(bpm, age))
+        scores["sleep_score"].append(calculate_sleep(hrv, resp))
+        scores["equilibrium_score"].append(calculate_equilibrium(hrv, sys_, dia))
+        scores["metabolism_score"].append(calculate_metabolism(weight, height, age))
+        scores["health_score"].append(calculate_health(spo2, bpm, sys_))
+        scores["relaxation_score"].append(calculate_relaxation(hrv, resp))
+    return scores
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scores en boucle Python contre scores vectorisés")
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--loop-rows", type=int, default=50_000, help="Lignes traitées par la boucle (extrapolée)")
+    args = parser.parse_args()
+
+    table = make_table(args.rows)
+    start = time.perf_counter()
+    vectorized = score_table(table)
+    vector_time = time.perf_counter() - start
+
+    loop_rows = min(args.loop_rows, args.rows)
+    start = time.perf_counter()
+    looped = score_loop(table, loop_rows)
+    loop_time = (time.perf_counter() - start) * args.rows / loop_rows
+
+    # Les fonctions scalaires renvoient 0 pour un score manquant, score_table NaN
+    for key in SCORE_KEYS:
+        assert np.array_equal(np.nan_to_num(vectorized[key][:loop_rows], nan=0.0), looped[key]), key
+    missing = np.mean(np.isnan(np.column_stack([vectorized[key] for key in SCORE_KEYS])).any(axis=1))
+
+    print(f"{args.rows} lignes ({100 * missing:.1f} % avec un score manquant)")
+    print(f"{'méthode':<12} {'temps (s)':>10} {'lignes/s':>14}")
+    print(f"{'boucle':<12} {loop_time:>10.2f} {args.rows / loop_time:>14,.0f}  (extrapolé de {loop_rows} lignes)")
+    print(f"{'vectorisé':<12} {vector_time:>10.2f} {args.rows / vector_time:>14,.0f}")
+    print(f"accélération : x{loop_time / vector_time:.0f}")
@@ -0,0 +1,130 @@
+import argparse, json, os, sys, tempfile, time, timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+os.environ["RPPG_CACHE_DIR"] = tempfile.mkdtemp(prefix="rppg-bench-cache-")  # Cache vide : chaque clip est analysé
+from synthetic import make_video
+
+# Suite de référence : vidéos synthétiques à vérité terrain connue (pouls, respiration) traitées par la route
+# /upload_video complète, puis fonctions de vitals.py sur la trace extraite. Rapporte le débit (frames/s,
+# ms par clip) et l'erreur par rapport à la vérité terrain ; --save / --baseline permettent de détecter
+# hors ligne une régression de l'un ou de l'autre.
+SCENARIOS = {
+    "propre": dict(hr_bpm=72, breathing_bpm=15),
+    "bruit": dict(hr_bpm=84, breathing_bpm=12, noise=4, texture=6),
+    "mouvement": dict(hr_bpm=66, breathing_bpm=18, motion=6, texture=6),
+}
+DURATIONS = (30, 60, 120)
+FPS = 30
+MAX_SLOWDOWN = 1.25  # Régression de débit tolérée par rapport à la référence
+MAX_EXTRA_ERROR = 2.0  # Hausse d'erreur tolérée (BPM ou respirations/min)
+
+# Générer (ou réutiliser) la vidéo d'un scénario
+def clip_path(folder, name, seconds):
+    path = os.path.join(folder, f"{name}-{seconds}s.mp4")
+    if not os.path.exists(path):
+        make_video(path, seconds=seconds, fps=FPS, **SCENARIOS[name])
+    return path
+
+# Pipeline complet : envoi multipart à /upload_video (copie, hachage, décodage, visage, signaux, scores)
+def run_upload(client, path):
+    start = time.perf_counter()
+    with open(path, "rb") as video:
+        response = client.post("/upload_video", data={"age": "30", "weight": "70", "height": "175", "video": (video, "clip.mp4")},
+                            content_type="multipart/form-data")
+    elapsed = time.perf_counter() - start
+    assert response.status_code == 200, response.get_json()
+    return response.get_json(), elapsed
+
+# Durée moyenne d'un appel (µs)
+def per_call(func, number=20):
+    return min(timeit.repeat(func, number=number, repeat=3)) / number * 1e6
+
+# Fonctions de vitals.py sur une fenêtre de 20 s de la trace extraite : durée et erreur de HR
+def bench_functions(trace, truth, fs):
+    from vitals import (bandpass_filter, calculate_heart_rate, calculate_hrv, calculate_respiration_rate, calculate_spo2,
+                        extract_pulse)
+    from spectral import estimate_rates
+    from hrv import RRSeries
+    rgb = trace["samples"][-int(20 * fs):, 1:4]
+    green = rgb[:, 1]
+    filtered = bandpass_filter(green, 0.8, 2.5, fs)
+    bpm, intervals, peaks = calculate_heart_rate(filtered, fs)
+    infra = 0.3 * rgb[:, 0] + 0.59 * rgb[:, 1] + 0.11 * rgb[:, 2]
+    rows = {
+        "bandpass_filter": per_call(lambda: bandpass_filter(green, 0.8, 2.5, fs)),
+        "calculate_heart_rate": per_call(lambda: calculate_heart_rate(filtered, fs)),
+        "estimate_rates": per_call(lambda: estimate_rates(green, fs)),
+        "calculate_spo2": per_call(lambda: calculate_spo2(rgb[:, 0], infra, fs)),
+        "calculate_hrv": per_call(lambda: calculate_hrv(intervals)),
+        "RRSeries.update": per_call(lambda: RRSeries(fs).update(peaks, len(green))),
+        "calculate_respiration_rate": per_call(lambda: calculate_respiration_rate(filtered, fs)),
+        "extract_pulse[pos]": per_call(lambda: extract_pulse(rgb, fs, "pos")),
+    }
+    return rows, abs(bpm - truth["hr_bpm"])
+
+def compare(results, baseline):
+    failures = []
+    for key, run in results["clips"].items():
+        reference = baseline["clips"].get(key)
+        if reference is None:
+            continue
+        if run["fps"] * MAX_SLOWDOWN < reference["fps"]:
+            failures.append(f"{key} : débit {run['fps']:.1f} frames/s contre {reference['fps']:.1f}")
+        for error in ("hr_error", "respiration_error"):
+            if run[error] > reference[error] + MAX_EXTRA_ERROR:
+                failures.append(f"{key} : {error} {run[error]:.2f} contre {reference[error]:.2f}")
+    return failures
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Débit et précision du pipeline rPPG sur des vidéos synthétiques")
+    parser.add_argument("--durations", type=int, nargs="+", default=DURATIONS, help="Durées des clips (s)")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--clips", help="Dossier où conserver les vidéos générées (par défaut temporaire)")
+    parser.add_argument("--save", help="Écrire les résultats en JSON (référence pour --baseline)")
+    parser.add_argument("--baseline", help="Résultats JSON de référence : code de sortie 1 en cas de régression")
+    args = parser.parse_args()
+
+    import main
+    main.session_params["log_every"] = 0
+    client = main.app.test_client()
+    folder = args.clips or tempfile.mkdtemp(prefix="rppg-bench-clips-")
+    os.makedirs(folder, exist_ok=True)
+
+    results = {"clips": {}, "functions": {}}
+    print(f"{'clip':<18} {'frames':>7} {'ms/clip':>9} {'frames/s':>9} {'HR':>7} {'vérité':>7} {'resp.':>6} {'vérité':>7} {'conf. HR':>9} {'conf. resp.':>11}")
+    for seconds in args.durations:
+        for name in args.scenarios:
+            truth = SCENARIOS[name]
+            path = clip_path(folder, name, seconds)
+            response, elapsed = run_upload(client, path)
+            frames = response["face_tracking"]["frames"]
+            row = {"frames": frames, "ms": elapsed * 1e3, "fps": frames / elapsed,
+                "hr": response["evaluation_HR"], "respiration": response["evaluation_respiration"],
+                "hr_error": abs(response["evaluation_HR"] - truth["hr_bpm"]),
+                "respiration_error": abs(response["evaluation_respiration"] - truth["breathing_bpm"]),
+                "hr_confidence": response["quality"]["confidence"]["avg_bpm"],
+                "respiration_confidence": response["quality"]["confidence"]["avg_respiration"]}
+            results["clips"][f"{name}-{seconds}s"] = row
+            print(f"{name + '-' + str(seconds) + 's':<18} {frames:>7} {row['ms']:>9.0f} {row['fps']:>9.1f} {row['hr']:>7.2f} "
+                f"{truth['hr_bpm']:>7} {row['respiration']:>6.2f} {truth['breathing_bpm']:>7} {row['hr_confidence']:>9.3f} "
+                f"{row['respiration_confidence']:>11.3f}")
+
+    # Fonctions individuelles sur la trace du scénario bruité le plus court
+    from session import analyze_video
+    name, seconds = ("bruit" if "bruit" in args.scenarios else args.scenarios[0]), min(args.durations)
+    trace = analyze_video(clip_path(folder, name, seconds), 30, 70, 175, record_trace=True)["trace"]
+    rows, hr_error = bench_functions(trace, SCENARIOS[name], FPS)
+    print(f"\nfonctions de vitals.py, fenêtre de 20 s ({name}-{seconds}s), erreur HR de calculate_heart_rate : {hr_error:.2f} BPM")
+    for function, microseconds in rows.items():
+        print(f"{function:<28} {microseconds:>10.1f} µs/appel")
+    results["functions"] = {"us_per_call": rows, "hr_error": hr_error}
+
+    if args.save:
+        with open(args.save, "w") as out:
+            json.dump(results, out, indent=1)
+    if args.baseline:
+        with open(args.baseline) as reference:
+            failures = compare(results, json.load(reference))
+        for failure in failures:
+            print("RÉGRESSION", failure)
+        sys.exit(1 if failures else 0)
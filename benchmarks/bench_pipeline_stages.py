@@ -0,0 +1,36 @@
+import argparse, os, sys, tempfile, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from pipeline import analyze_video_pipelined
+from session import analyze_video
+from synthetic import make_video
+
+STAGES = ("decode", "detect", "track", "roi")
+
+# Temps cumulé de chaque étage (profil de la session) et temps total de la vidéo
+def measure(func, video_path, **kwargs):
+    start = time.perf_counter()
+    results = func(video_path, 30, 70, 175, **kwargs)
+    wall = time.perf_counter() - start
+    histograms = results["profile"]["histograms"]
+    stages = {stage: histograms[stage]["sum"] if stage in histograms else 0.0 for stage in STAGES}
+    stages["analyse"] = wall - sum(stages.values()) if func is analyze_video else None
+    return wall, stages, results["metrics"]["avg_bpm"]
+
+# Séquentiel contre pipeline : le temps total du pipeline doit tendre vers celui de l'étage le plus lent
+# (décodage, détection + suivi + ROI dans l'ordre des frames, ou analyse) plutôt que vers la somme des étages
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Temps par vidéo : analyse séquentielle contre pipeline à étages")
+    parser.add_argument("--video", help="Vidéo à analyser (par défaut une vidéo synthétique)")
+    parser.add_argument("--seconds", type=float, default=30, help="Durée de la vidéo synthétique (s)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        video_path = args.video or make_video(os.path.join(tmp, "pipeline.mp4"), seconds=args.seconds, breathing_bpm=15)
+        wall, stages, bpm = measure(analyze_video, video_path)
+        print(f"séquentiel : {wall:.2f} s, HR {bpm}")
+        for stage, seconds in stages.items():
+            print(f"  {stage:<10} {seconds:>7.2f} s")
+        pipelined, _, bpm = measure(analyze_video_pipelined, video_path)
+        bound = max(stages["decode"], stages["detect"] + stages["track"] + stages["roi"], stages["analyse"])
+        print(f"pipeline : {pipelined:.2f} s ({wall / pipelined:.2f}x), étage le plus lent {bound:.2f} s, HR {bpm}")
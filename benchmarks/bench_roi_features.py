@@ -0,0 +1,29 @@
+import os, sys, timeit
+import cv2, numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from face import FACE_REGIONS, roi_means
+from synthetic import draw_face
+
+# Ancienne extraction : conversion RGB (copie) puis plusieurs parcours de la ROI
+def legacy_means(frame, x, y, w, h):
+    roi_rgb = cv2.cvtColor(frame[y:y+h, x:x+w], cv2.COLOR_BGR2RGB)
+    avg_color = np.mean(roi_rgb, axis=(0, 1))
+    avg_red = np.mean(roi_rgb[:, :, 0])
+    avg_infra = 0.3 * avg_red + 0.59 * avg_color[1] + 0.11 * np.mean(roi_rgb[:, :, 2])
+    return avg_color, avg_infra
+
+def bench(label, func, number, frames=1):
+    seconds = min(timeit.repeat(func, number=number, repeat=5)) / number / frames
+    print(f"{label:<38} {seconds * 1e6:>9.1f} µs/frame")
+
+if __name__ == "__main__":
+    for width, height, size in ((640, 480, 110), (1280, 720, 200), (1920, 1080, 300)):
+        frame, _ = draw_face(height, width, size=size)
+        x, y, w, h = width // 2 - size, height // 2 - size, 2 * size, 2 * size
+        print(f"frame {width}x{height}, ROI {w}x{h} (budget à 30 fps : 33333 µs/frame)")
+        bench("cvtColor + np.mean (ancien)", lambda: legacy_means(frame, x, y, w, h), 200)
+        bench("roi_means", lambda: roi_means(frame, x, y, w, h), 200)
+        bench("roi_means + régions", lambda: roi_means(frame, x, y, w, h, FACE_REGIONS), 200)
+        bench("roi_means + masque de peau", lambda: roi_means(frame, x, y, w, h, skin=True), 200)
+        print()
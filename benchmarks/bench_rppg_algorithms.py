@@ -0,0 +1,42 @@
+import os, sys, timeit
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from vitals import RPPG_ALGORITHMS, extract_pulse
+
+# POS écrit avec une boucle Python par fenêtre, pour comparaison avec la version vectorisée
+def pos_loop(rgb, fs, window_sec=1.6):
+    n = len(rgb)
+    length = int(window_sec * fs)
+    pulse = np.zeros(n)
+    for start in range(n - length + 1):
+        cn = rgb[start:start + length] / rgb[start:start + length].mean(axis=0)
+        s1 = cn[:, 1] - cn[:, 2]
+        s2 = cn[:, 1] + cn[:, 2] - 2 * cn[:, 0]
+        h = s1 + s1.std() / s2.std() * s2
+        pulse[start:start + length] += h - h.mean()
+    return pulse
+
+# Trace RGB synthétique : pouls à 72 BPM et variations d'éclairage communes aux trois canaux
+def make_trace(seconds, fs, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * fs)) / fs
+    pulse = 0.003 * np.sin(2 * np.pi * 1.2 * t)
+    illumination = 1 + 0.01 * np.convolve(rng.standard_normal(len(t)), np.ones(5) / 5, 'same')
+    rgb = np.column_stack([150 * (1 + 0.33 * pulse), 120 * (1 + 0.77 * pulse), 90 * (1 + 0.53 * pulse)])
+    return rgb * illumination[:, None]
+
+def bench(label, func, seconds, number):
+    elapsed = min(timeit.repeat(func, number=number, repeat=3)) / number
+    print(f"{label:<16} {elapsed * 1e3:>10.2f} ms  {elapsed / seconds * 1e6:>8.2f} µs par seconde de signal")
+
+if __name__ == "__main__":
+    fs = 30
+    for seconds in (60, 600, 3600):
+        rgb = make_trace(seconds, fs)
+        print(f"trace de {seconds} s à {fs} Hz ({len(rgb)} échantillons)")
+        for name in RPPG_ALGORITHMS:
+            bench(name, lambda: extract_pulse(rgb, fs, name), seconds, 5)
+        if seconds <= 600:
+            bench("pos (boucle)", lambda: pos_loop(rgb, fs), seconds, 1)
+        print()
@@ -0,0 +1,53 @@
+import argparse, json, os, subprocess, sys, tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+# Démarrage à froid d'un worker, dans un nouveau processus à chaque essai : durée de l'import de l'application,
+# délai avant que /healthz réponde 200, puis durée de la première requête /upload_video. Sans préchauffage
+# (RPPG_WARMUP=0), la première requête paie les imports SciPy et le chargement du détecteur ; avec, ils sont
+# faits avant que le worker soit annoncé prêt.
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+import {app} as app
+imported = time.perf_counter()
+client = app.app.test_client() if "{app}" == "main" else __import__("fastapi.testclient").testclient.TestClient(app.app)
+while client.get("/healthz").status_code != 200:
+    time.sleep(0.01)
+ready = time.perf_counter()
+with open({video!r}, "rb") as video:
+    if "{app}" == "main":
+        response = client.post("/upload_video", data={{"age": "30", "weight": "70", "height": "175", "video": (video, "clip.mp4")}},
+                            content_type="multipart/form-data")
+    else:
+        response = client.post("/upload_video", data={{"age": "30", "weight": "70", "height": "175"}},
+                            files={{"video": ("clip.mp4", video, "video/mp4")}})
+assert response.status_code == 200, response.status_code
+done = time.perf_counter()
+print(json.dumps({{"import": imported - start, "ready": ready - start, "first": done - ready, "total": done - start}}))
+"""
+
+def cold_start(app, video, warmup, cache_dir):
+    env = {**os.environ, "RPPG_WARMUP": "1" if warmup else "0", "RPPG_CACHE_DIR": cache_dir, "RPPG_LOG_EVERY": "0",
+        "RPPG_LOG_LEVEL": "WARNING"}
+    output = subprocess.run([sys.executable, "-c", CHILD.format(app=app, video=video)], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Temps de démarrage à froid et de première réponse d'un worker")
+    parser.add_argument("--app", choices=("main", "threads_main"), default="main")
+    parser.add_argument("--video", help="Vidéo envoyée en première requête (par défaut un clip synthétique de 5 s)")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    from synthetic import make_video
+    with tempfile.TemporaryDirectory() as tmp:
+        video = args.video or make_video(os.path.join(tmp, "clip.mp4"), seconds=5)
+        print(f"{'préchauffage':<13} {'import (s)':>10} {'prêt (s)':>9} {'1re requête (s)':>16} {'total (s)':>10}")
+        for warmup in (False, True):
+            runs = [cold_start(args.app, video, warmup, tempfile.mkdtemp(dir=tmp)) for _ in range(args.runs)]
+            best = {key: min(run[key] for run in runs) for key in runs[0]}
+            print(f"{'oui' if warmup else 'non':<13} {best['import']:>10.2f} {best['ready']:>9.2f} {best['first']:>16.2f} "
+                f"{best['total']:>10.2f}")
@@ -0,0 +1,35 @@
+import argparse, os, sys, tempfile, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from session import analyze_video, analyze_video_subjects
+from synthetic import make_group_video
+
+HR_BPM = (66, 78, 90, 60)
+
+# Plusieurs personnes dans le même cadre : une seule passe (un décodage, une détection par frame pour tous les
+# visages) contre une analyse par personne sur des clips séparés, comme lorsqu'on filme chacun à part
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyse multi-personnes en une passe contre une vidéo par personne")
+    parser.add_argument("--subjects", type=int, default=3, choices=range(1, len(HR_BPM) + 1))
+    parser.add_argument("--seconds", type=float, default=30, help="Durée des vidéos synthétiques (s)")
+    args = parser.parse_args()
+
+    size = (320 * args.subjects, 480)
+    subjects = [dict(hr_bpm=bpm, center=(160 + 320 * i, 240)) for i, bpm in enumerate(HR_BPM[:args.subjects])]
+    with tempfile.TemporaryDirectory() as tmp:
+        group = make_group_video(os.path.join(tmp, "groupe.mp4"), subjects, seconds=args.seconds, size=size)
+        start = time.perf_counter()
+        results = analyze_video_subjects(group, 30, 70, 175)
+        together = time.perf_counter() - start
+        print(f"une passe ({args.subjects} personnes) : {together:.2f} s, suivi {results['face_tracking']}")
+        for subject_id, subject in results["subjects"].items():
+            print(f"  personne {subject_id} : HR {subject['metrics']['avg_bpm']}")
+
+        separate = 0.0
+        for i, subject in enumerate(subjects):
+            clip = make_group_video(os.path.join(tmp, f"personne-{i}.mp4"), [subject], seconds=args.seconds, size=size)
+            start = time.perf_counter()
+            bpm = analyze_video(clip, 30, 70, 175, confidence_threshold=2)["metrics"]["avg_bpm"]
+            separate += time.perf_counter() - start
+            print(f"  clip séparé {i + 1} (vérité {subject['hr_bpm']}) : HR {bpm}")
+        print(f"une vidéo par personne : {separate:.2f} s, soit {separate / together:.2f}x le temps d'une passe")
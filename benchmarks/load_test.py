@@ -0,0 +1,36 @@
+import argparse, os, sys, tempfile, time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from session import analyze_video, init_worker
+from synthetic import make_video
+
+# Test de charge : débit (vidéos/min) de analyze_video en fonction du nombre de processus du pool
+def run(video_path, requests, workers):
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+        pool.submit(init_worker).result()  # Démarrer les processus hors chronométrage
+        start = time.perf_counter()
+        futures = [pool.submit(analyze_video, video_path, 30, 70, 175) for _ in range(requests)]
+        results = [future.result() for future in futures]
+        elapsed = time.perf_counter() - start
+    assert all(result is not None for result in results)
+    return elapsed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Débit de traitement des vidéos selon le nombre de workers")
+    parser.add_argument("--seconds", type=float, default=20, help="Durée de la vidéo synthétique (s)")
+    parser.add_argument("--requests", type=int, default=8, help="Nombre de vidéos traitées par mesure")
+    parser.add_argument("--workers", type=int, nargs="+", default=None, help="Nombres de workers à tester")
+    args = parser.parse_args()
+
+    cpus = os.cpu_count() or 1
+    workers = args.workers or sorted({1, 2, 4, cpus} & set(range(1, cpus + 1)))
+    with tempfile.TemporaryDirectory() as tmp:
+        video_path = make_video(os.path.join(tmp, "load.mp4"), seconds=args.seconds)
+        print(f"{'workers':>8} {'temps (s)':>10} {'vidéos/min':>11} {'accélération':>13}")
+        baseline = None
+        for n in workers:
+            elapsed = run(video_path, args.requests, n)
+            throughput = args.requests / elapsed * 60
+            baseline = baseline or throughput
+            print(f"{n:>8} {elapsed:>10.2f} {throughput:>11.1f} {throughput / baseline:>12.2f}x")
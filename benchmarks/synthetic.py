@@ -0,0 +1,73 @@
+import cv2, numpy as np
+
+SKIN_BGR = (150, 170, 210)
+
+# Dessiner un visage schématique (ovale de peau, yeux, sourcils, nez, bouche) détectable par la cascade Haar,
+# sur un fond uni ou sur une image existante `img` (plusieurs visages)
+def draw_face(height=480, width=640, center=None, size=110, skin=SKIN_BGR, img=None):
+    cx, cy = center if center is not None else (width // 2, height // 2)
+    img = np.full((height, width, 3), (60, 60, 60), np.uint8) if img is None else img.copy()
+    cv2.ellipse(img, (cx, cy), (int(size * 0.8), size), 0, 0, 360, skin, -1)
+    for side in (-1, 1):
+        ex, ey = cx + side * int(size * 0.35), cy - int(size * 0.2)
+        cv2.ellipse(img, (ex, ey - int(size * 0.18)), (int(size * 0.22), int(size * 0.05)), 0, 0, 360, (40, 40, 40), -1)
+        cv2.ellipse(img, (ex, ey), (int(size * 0.16), int(size * 0.08)), 0, 0, 360, (255, 255, 255), -1)
+        cv2.circle(img, (ex, ey), int(size * 0.07), (30, 30, 30), -1)
+    cv2.ellipse(img, (cx, cy + int(size * 0.12)), (int(size * 0.08), int(size * 0.2)), 0, 0, 360, (110, 130, 170), -1)
+    cv2.ellipse(img, (cx, cy + int(size * 0.5)), (int(size * 0.3), int(size * 0.08)), 0, 0, 360, (60, 60, 140), -1)
+    img = cv2.GaussianBlur(img, (5, 5), 0)
+    skin_mask = np.abs(img.astype(np.int16) - np.array(skin)).sum(axis=2) < 40
+    return img, skin_mask
+
+# Générer une vidéo dont la couleur de peau est modulée par un pouls connu, et optionnellement par la respiration
+# (variation lente de l'intensité), une texture de peau fixe, du bruit de capteur et un balancement de la tête.
+# Les paramètres donnent la vérité terrain (hr_bpm, breathing_bpm) ; seed rend la vidéo reproductible.
+def make_video(path, seconds=30, fps=30, hr_bpm=72, amplitude=1.5, size=(640, 480), breathing_bpm=0,
+            breathing_amplitude=2.0, texture=0.0, noise=0.0, motion=0.0, seed=0):
+    width, height = size
+    rng = np.random.default_rng(seed)
+    base, skin_mask = draw_face(height, width)
+    base = base.astype(np.float32)
+    skin = skin_mask[..., None].astype(np.float32)
+    if texture:
+        base += skin * cv2.GaussianBlur(rng.normal(0, texture, (height, width)).astype(np.float32), (3, 3), 0)[..., None]
+    gains = np.array([1.0, 1.5, 0.6], np.float32)  # B, G, R : le vert porte le plus de signal
+    # Bruit de capteur tiré d'une petite banque de frames (choisies au hasard à chaque frame, beaucoup plus rapide)
+    noise_bank = rng.standard_normal((8, height, width, 3), dtype=np.float32) * noise if noise else None
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    for i in range(int(seconds * fps)):
+        t = i / fps
+        pulse = amplitude * np.sin(2 * np.pi * hr_bpm / 60 * t)
+        breath = breathing_amplitude * np.sin(2 * np.pi * breathing_bpm / 60 * t) if breathing_bpm else 0.0
+        frame = base + skin * (gains * pulse + breath)
+        if motion:
+            # Balancement lent de la tête (0.3 Hz horizontal, 0.2 Hz vertical), amplitude `motion` pixels
+            shift = np.float32([[1, 0, motion * np.sin(2 * np.pi * 0.3 * t)], [0, 1, 0.5 * motion * np.sin(2 * np.pi * 0.2 * t)]])
+            frame = cv2.warpAffine(frame, shift, (width, height), borderMode=cv2.BORDER_REPLICATE)
+        if noise:
+            frame += noise_bank[rng.integers(len(noise_bank))]
+        writer.write(np.clip(frame, 0, 255).astype(np.uint8))
+    writer.release()
+    return path
+
+# Plusieurs personnes dans le même cadre, chacune avec son propre pouls : subjects est une liste de
+# dictionnaires (hr_bpm, center, size[, amplitude]) ; renvoie le chemin de la vidéo
+def make_group_video(path, subjects, seconds=30, fps=30, size=(960, 480)):
+    width, height = size
+    base = np.full((height, width, 3), (60, 60, 60), np.uint8)
+    masks, covered = [], np.zeros((height, width), bool)
+    for subject in subjects:
+        base, skin_mask = draw_face(height, width, subject["center"], subject.get("size", 90), img=base)
+        masks.append(skin_mask & ~covered)  # Peau de ce visage uniquement
+        covered |= skin_mask
+    base = base.astype(np.float32)
+    gains = np.array([1.0, 1.5, 0.6], np.float32)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    for i in range(int(seconds * fps)):
+        t = i / fps
+        frame = base.copy()
+        for subject, mask in zip(subjects, masks):
+            frame[mask] += gains * subject.get("amplitude", 1.5) * np.sin(2 * np.pi * subject["hr_bpm"] / 60 * t)
+        writer.write(np.clip(frame, 0, 255).astype(np.uint8))
+    writer.release()
+    return path
@@ -0,0 +1,67 @@
+import argparse, asyncio, json, os, sys, tempfile, time
+import cv2
+import websockets
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from face import FaceTracker, filter_by_confidence
+from synthetic import make_video
+
+# Lire une vidéo et produire les messages à envoyer : frames JPEG ou moyennes RGB de la ROI calculées localement
+def read_messages(video_path, mode, quality=80):
+    cap = cv2.VideoCapture(video_path)
+    tracker = FaceTracker()
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if mode == "jpeg":
+            yield cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes()
+            continue
+        face_roi, _, _, w, h = tracker.update(frame)
+        if face_roi is not None and filter_by_confidence(w, h, frame.shape, threshold=8)[0]:
+            b, g, r = cv2.mean(face_roi)[:3]
+            yield json.dumps({"rgb": [r, g, b], "t": cap.get(cv2.CAP_PROP_POS_MSEC) / 1000})
+    cap.release()
+
+# Envoyer la vidéo au rythme de la capture et mesurer la latence entre la dernière frame et le résultat final
+async def run(url, video_path, fps, mode, realtime):
+    messages = list(read_messages(video_path, mode))
+    updates = []
+    async with websockets.connect(url, max_size=None) as websocket:
+        await websocket.send(json.dumps({"age": 30, "weight": 70, "height": 175, "fps": fps}))
+
+        async def receive():
+            async for message in websocket:
+                data = json.loads(message)
+                updates.append((time.perf_counter(), data))
+                if data["type"] == "final":
+                    return data
+
+        receiver = asyncio.create_task(receive())
+        start = time.perf_counter()
+        for i, message in enumerate(messages):
+            if realtime:
+                await asyncio.sleep(max(0, start + i / fps - time.perf_counter()))
+            await websocket.send(message)
+        capture_end = time.perf_counter()
+        await websocket.send(json.dumps({"type": "end"}))
+        final = await receiver
+
+    latency = updates[-1][0] - capture_end
+    print(f"messages envoyés : {len(messages)} ({mode}), durée de capture : {capture_end - start:.2f} s")
+    print(f"mises à jour reçues : {len(updates) - 1}, latence du résultat final : {latency * 1000:.1f} ms")
+    print(json.dumps(final, indent=1))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Client de test et de latence pour /ws/stream")
+    parser.add_argument("--url", default="ws://localhost:10000/ws/stream")
+    parser.add_argument("--video", help="Vidéo à envoyer (par défaut une vidéo synthétique)")
+    parser.add_argument("--seconds", type=float, default=20, help="Durée de la vidéo synthétique (s)")
+    parser.add_argument("--fps", type=float, default=15)
+    parser.add_argument("--mode", choices=("jpeg", "rgb"), default="jpeg")
+    parser.add_argument("--no-realtime", action="store_true", help="Envoyer les frames sans attendre le rythme de capture")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        video_path = args.video or make_video(os.path.join(tmp, "stream.mp4"), seconds=args.seconds, fps=args.fps)
+        asyncio.run(run(args.url, video_path, args.fps, args.mode, not args.no_realtime))
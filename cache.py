@@ -0,0 +1,124 @@
+import os, json, hashlib, tempfile, threading
+import numpy as np
+
+# Cache disque des résultats, indexé par l'empreinte SHA-256 du contenu de la vidéo.
+# Deux niveaux : la trace par frame (décodage + détection, le plus coûteux) ne dépend que de la vidéo et des
+# paramètres d'extraction ; les résultats dépendent en plus des paramètres d'analyse. Les scores (metrics.py)
+# ne sont jamais mis en cache : ils sont recalculés à chaque requête avec l'âge, le poids et la taille.
+CACHE_VERSION = 7  # À incrémenter quand le pipeline change : les anciennes entrées ne sont plus utilisées
+CACHE_FOLDER = os.environ.get("RPPG_CACHE_DIR", "cache/")
+CACHE_MAX_BYTES = int(os.environ.get("RPPG_CACHE_MB", 512)) * 1024 * 1024  # Taille maximale du cache sur disque
+# Paramètres qui modifient la trace extraite ; "analyzer" distingue l'analyse séquentielle du pipeline,
+# dont le suivi du visage peut différer
+TRACE_PARAMS = ("analyzer", "confidence_threshold", "skin", "regions")
+IGNORED_PARAMS = ("log_every", "record_trace")  # Paramètres sans effet sur les résultats
+
+def _hash(*parts):
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()[:32]
+
+# Écriture atomique : fichier temporaire dans le même dossier puis renommage
+def _write_atomic(path, write):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            write(out)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+class ResultCache:
+    def __init__(self, folder=CACHE_FOLDER, max_bytes=CACHE_MAX_BYTES, version=CACHE_VERSION):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.version = version
+        self.lock = threading.Lock()
+        self.hits = 0  # Résultats complets trouvés
+        self.trace_hits = 0  # Seule la trace était en cache (analyse refaite sans décodage)
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(folder, exist_ok=True)
+
+    # Clés de la trace et des résultats pour un contenu et un jeu de paramètres de session
+    def keys(self, content_hash, params):
+        trace_key = _hash(self.version, content_hash, {key: params.get(key) for key in TRACE_PARAMS})
+        analysis = {key: value for key, value in params.items() if key not in TRACE_PARAMS + IGNORED_PARAMS}
+        return trace_key, f"{trace_key}-{_hash(analysis)}"
+
+    def _path(self, key, extension):
+        return os.path.join(self.folder, key + extension)
+
+    # Lire une entrée et la marquer comme récemment utilisée (LRU sur la date de modification)
+    def _read(self, path, load):
+        try:
+            with open(path, "rb") as entry:
+                value = load(entry)
+            os.utime(path)
+            return value
+        except (OSError, ValueError, KeyError):
+            return None
+
+    # Chercher les résultats, puis à défaut la trace : renvoie (statut, résultats, trace)
+    # avec statut "hit", "trace" ou "miss"
+    def lookup(self, content_hash, params):
+        trace_key, result_key = self.keys(content_hash, params)
+        results = self._read(self._path(result_key, ".json"), json.load)
+        if results is not None:
+            with self.lock:
+                self.hits += 1
+            return "hit", results, None
+        trace = self._read(self._path(trace_key, ".npz"), _load_trace)
+        with self.lock:
+            if trace is not None:
+                self.trace_hits += 1
+            else:
+                self.misses += 1
+        return ("trace" if trace is not None else "miss"), None, trace
+
+    # Enregistrer les résultats (sans les scores ni la trace) et la trace par frame, puis appliquer la taille maximale
+    def store(self, content_hash, params, results, trace=None):
+        trace_key, result_key = self.keys(content_hash, params)
+        stored = {key: value for key, value in results.items() if key not in ("scores", "trace", "profile")}
+        stored["scores"] = dict.fromkeys(results["scores"], 0)
+        _write_atomic(self._path(result_key, ".json"), lambda out: out.write(json.dumps(stored).encode()))
+        if trace is not None:
+            _write_atomic(self._path(trace_key, ".npz"), lambda out: _save_trace(out, trace))
+        self.evict()
+
+    # Supprimer les entrées les moins récemment utilisées tant que le cache dépasse sa taille maximale
+    def evict(self):
+        with self.lock:
+            entries = []
+            for entry in os.scandir(self.folder):
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.trace_hits + self.misses
+        return {"hits": self.hits, "trace_hits": self.trace_hits, "misses": self.misses, "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0}
+
+    # Compteurs pour la route /metrics
+    def counters(self):
+        return {"cache_hits_total": self.hits, "cache_trace_hits_total": self.trace_hits,
+                "cache_misses_total": self.misses, "cache_evictions_total": self.evictions}
+
+# Trace par frame : tableau (N, 6) et métadonnées JSON dans un .npz non compressé
+def _save_trace(out, trace):
+    meta = json.dumps({"frames": trace["frames"], "face_tracking": trace["face_tracking"]})
+    np.savez(out, samples=trace["samples"], meta=np.array(meta))
+
+def _load_trace(entry):
+    with np.load(entry) as data:
+        return {"samples": data["samples"], **json.loads(str(data["meta"]))}
@@ -1,10 +1,30 @@
-import cv2
-# Initialisation du détecteur de visage
-face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+import threading
+from functools import lru_cache
+import cv2, numpy as np
+CASCADE_FILE = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+_local = threading.local()
+
+# Contenu du fichier du classifieur Haar, lu une seule fois (par le préchauffage ou au premier usage)
+@lru_cache(maxsize=1)
+def cascade_data():
+    with open(CASCADE_FILE) as xml:
+        return xml.read()
+
+# Détecteur de visage du thread appelant, créé au premier usage à partir du fichier déjà lu : un classifieur
+# n'est jamais utilisé par deux threads à la fois
+def face_detector():
+    cascade = getattr(_local, "cascade", None)
+    if cascade is None:
+        storage = cv2.FileStorage(cascade_data(), cv2.FILE_STORAGE_READ | cv2.FILE_STORAGE_MEMORY)
+        cascade = cv2.CascadeClassifier()
+        cascade.read(storage.getFirstTopLevelNode())
+        _local.cascade = cascade
+    return cascade
+
 # Fonction pour détecter le visage avec le plus grand rectangle
 def detect_face(frame):
     gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    faces = face_cascade.detectMultiScale(gray, scaleFactor=1.2, minNeighbors=6)
+    faces = face_detector().detectMultiScale(gray, scaleFactor=1.2, minNeighbors=6)
     if len(faces) == 0:
         return None, None, None, None, None
     best_face = max(faces, key=lambda rect: rect[2] * rect[3])
@@ -14,4 +34,230 @@ def detect_face(frame):
 # Fonction pour filtrer les visages avec une confiance inférieure à 8 %
 def filter_by_confidence(w, h, frame_shape, threshold=7):
     confidence = (w * h) / (frame_shape[0] * frame_shape[1]) * 100  # Calculer la confiance en pourcentage
-    return confidence >= threshold, confidence
\ No newline at end of file
+    return confidence >= threshold, confidence
+
+# Suivi du visage : détection Haar sur une image réduite toutes les N frames (ou si le suivi décroche),
+# suivi par template matching entre deux détections et lissage exponentiel de la boîte
+class FaceTracker:
+    def __init__(self, detect_every=15, scale=0.5, min_score=0.6, smoothing=0.5, search_margin=0.2, cascade=None):
+        self.cascade = cascade  # None : classifieur du thread qui appelle update
+        self.detect_every = detect_every  # Re-détection forcée toutes les N frames
+        self.scale = scale  # Facteur de réduction de l'image pour la détection et le suivi
+        self.min_score = min_score  # Score de corrélation minimal pour accepter le suivi
+        self.smoothing = smoothing  # Poids de la boîte précédente dans le lissage (0 = pas de lissage)
+        self.search_margin = search_margin  # Marge de la zone de recherche autour de la boîte (fraction de la taille)
+        self.reset()
+        self.frames = 0
+        self.detections = 0
+        self.tracked = 0
+
+    def reset(self):
+        self.box = None  # Boîte lissée (x, y, w, h) dans l'image réduite
+        self.raw_box = None  # Dernière boîte non lissée dans l'image réduite
+        self.template = None
+        self.since_detection = 0
+
+    def _detect(self, small_gray):
+        self.detections += 1
+        cascade = self.cascade if self.cascade is not None else face_detector()
+        faces = cascade.detectMultiScale(small_gray, scaleFactor=1.2, minNeighbors=6)
+        if len(faces) == 0:
+            return None
+        x, y, w, h = max(faces, key=lambda rect: rect[2] * rect[3])
+        self.template = small_gray[y:y+h, x:x+w].copy()
+        self.since_detection = 0
+        return float(x), float(y), float(w), float(h)
+
+    def _track(self, small_gray):
+        box = match_template(small_gray, self.raw_box, self.template, self.search_margin, self.min_score)
+        if box is None:
+            return None
+        self.tracked += 1
+        self.since_detection += 1
+        return box
+
+    # Même contrat que detect_face : (roi, x, y, w, h) en coordonnées de la frame d'origine
+    def update(self, frame):
+        self.frames += 1
+        small = cv2.resize(frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        small_gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+        box = None
+        if self.raw_box is not None and self.since_detection < self.detect_every:
+            box = self._track(small_gray)
+        if box is None:
+            box = self._detect(small_gray)
+        if box is None:
+            self.reset()
+            return None, None, None, None, None
+
+        self.raw_box = box
+        self.box = smooth_box(self.box, box, self.smoothing)
+        x, y, w, h = frame_box(self.box, self.scale, frame.shape)
+        roi = frame[y:y+h, x:x+w]
+        return roi, x, y, w, h
+
+    # Statistiques détection / suivi
+    def stats(self):
+        return {"frames": self.frames, "detections": self.detections, "tracked": self.tracked,
+                "detect_ratio": round(self.detections / self.frames, 4) if self.frames else 0}
+
+# Chercher le template autour de la boîte précédente (image réduite) : nouvelle boîte, ou None si le suivi décroche
+def match_template(small_gray, raw_box, template, search_margin, min_score):
+    x, y, w, h = (int(round(v)) for v in raw_box)
+    mx, my = int(w * search_margin), int(h * search_margin)
+    x0, y0 = max(x - mx, 0), max(y - my, 0)
+    x1, y1 = min(x + w + mx, small_gray.shape[1]), min(y + h + my, small_gray.shape[0])
+    th, tw = template.shape
+    if x1 - x0 < tw or y1 - y0 < th:
+        return None
+    result = cv2.matchTemplate(small_gray[y0:y1, x0:x1], template, cv2.TM_CCOEFF_NORMED)
+    _, score, _, (dx, dy) = cv2.minMaxLoc(result)
+    if score < min_score:
+        return None
+    return float(x0 + dx), float(y0 + dy), float(tw), float(th)
+
+# Lissage exponentiel d'une boîte (poids a de la boîte précédente)
+def smooth_box(previous, box, a):
+    if previous is None:
+        return box
+    return tuple(a * p + (1 - a) * n for p, n in zip(previous, box))
+
+# Boîte de l'image réduite en coordonnées entières de la frame d'origine, limitée à la frame
+def frame_box(box, scale, shape):
+    x, y, w, h = (int(round(v / scale)) for v in box)
+    x, y = max(x, 0), max(y, 0)
+    return x, y, min(w, shape[1] - x), min(h, shape[0] - y)
+
+# Recouvrement (intersection sur union) de deux boîtes (x, y, w, h)
+def box_iou(a, b):
+    w = min(a[0] + a[2], b[0] + b[2]) - max(a[0], b[0])
+    h = min(a[1] + a[3], b[1] + b[3]) - max(a[1], b[1])
+    if w <= 0 or h <= 0:
+        return 0.0
+    inter = w * h
+    return inter / (a[2] * a[3] + b[2] * b[3] - inter)
+
+# Suivi de plusieurs visages avec un identifiant stable par personne : détection Haar de tous les visages toutes
+# les N frames (ou dès qu'un suivi décroche), template matching de chaque visage entre deux détections, et
+# appariement des détections aux visages suivis par recouvrement (IoU). Un visage absent garde son identifiant
+# pendant max_missed détections, pour être retrouvé s'il réapparaît au même endroit
+class MultiFaceTracker:
+    def __init__(self, detect_every=15, scale=0.5, min_score=0.6, smoothing=0.5, search_margin=0.2, min_iou=0.3,
+                max_missed=2, max_faces=None, cascade=None):
+        self.cascade = cascade  # None : classifieur du thread qui appelle update
+        self.detect_every = detect_every  # Re-détection forcée toutes les N frames
+        self.scale = scale  # Facteur de réduction de l'image pour la détection et le suivi
+        self.min_score = min_score  # Score de corrélation minimal pour accepter le suivi
+        self.smoothing = smoothing  # Poids de la boîte précédente dans le lissage (0 = pas de lissage)
+        self.search_margin = search_margin  # Marge de la zone de recherche autour de la boîte (fraction de la taille)
+        self.min_iou = min_iou  # Recouvrement minimal entre une détection et un visage suivi pour les apparier
+        self.max_missed = max_missed  # Détections sans correspondance avant d'oublier un visage
+        self.max_faces = max_faces  # Nombre maximal de visages suivis (les plus grands), None : pas de limite
+        self.tracks = {}  # identifiant -> {"box", "raw_box", "template", "missed", "visible"}
+        self.next_id = 1
+        self.since_detection = 0
+        self.frames = 0
+        self.detections = 0
+        self.tracked = 0
+
+    def _detect(self, small_gray):
+        self.detections += 1
+        self.since_detection = 0
+        cascade = self.cascade if self.cascade is not None else face_detector()
+        faces = sorted(cascade.detectMultiScale(small_gray, scaleFactor=1.2, minNeighbors=6),
+                    key=lambda rect: rect[2] * rect[3], reverse=True)
+        faces = [tuple(float(v) for v in rect) for rect in faces]
+        # Appariement glouton par recouvrement décroissant
+        pairs = sorted(((box_iou(track["raw_box"], face), track_id, i) for track_id, track in self.tracks.items()
+                        for i, face in enumerate(faces)), reverse=True)
+        matched = {}
+        for iou, track_id, i in pairs:
+            if iou < self.min_iou:
+                break
+            if track_id not in matched and i not in matched.values():
+                matched[track_id] = i
+        for track_id in list(self.tracks):
+            track = self.tracks[track_id]
+            if track_id in matched:
+                self._set(track, small_gray, faces[matched[track_id]], True)
+            else:
+                track["visible"] = False
+                track["missed"] += 1
+                if track["missed"] > self.max_missed:
+                    del self.tracks[track_id]
+        for i, face in enumerate(faces):
+            if i in matched.values() or (self.max_faces is not None and len(self.tracks) >= self.max_faces):
+                continue
+            self.tracks[self.next_id] = {"box": None}
+            self._set(self.tracks[self.next_id], small_gray, face, True)
+            self.next_id += 1
+
+    def _set(self, track, small_gray, box, detected):
+        if detected:
+            x, y, w, h = (int(v) for v in box)
+            track["template"] = small_gray[y:y+h, x:x+w].copy()
+            track["missed"] = 0
+        track["raw_box"] = box
+        track["box"] = smooth_box(track["box"], box, self.smoothing)
+        track["visible"] = True
+
+    # Boîtes (x, y, w, h) des visages visibles dans la frame d'origine, par identifiant
+    def update(self, frame):
+        self.frames += 1
+        small = cv2.resize(frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        small_gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+        visible = [track for track in self.tracks.values() if track["visible"]]
+        detect = not visible or self.since_detection >= self.detect_every
+        if not detect:
+            boxes = [match_template(small_gray, track["raw_box"], track["template"], self.search_margin, self.min_score)
+                    for track in visible]
+            detect = any(box is None for box in boxes)
+            if not detect:
+                for track, box in zip(visible, boxes):
+                    self._set(track, small_gray, box, False)
+                self.tracked += len(visible)
+                self.since_detection += 1
+        if detect:
+            self._detect(small_gray)
+        return {track_id: frame_box(track["box"], self.scale, frame.shape)
+                for track_id, track in self.tracks.items() if track["visible"]}
+
+    # Statistiques détection / suivi ; "subjects" : nombre d'identifiants attribués
+    def stats(self):
+        return {"frames": self.frames, "detections": self.detections, "tracked": self.tracked,
+                "detect_ratio": round(self.detections / self.frames, 4) if self.frames else 0,
+                "subjects": self.next_id - 1}
+
+# Sous-régions du visage en fractions de la boîte (x, y, w, h) : front et joues, disjointes
+FACE_REGIONS = {"forehead": (0.25, 0.05, 0.5, 0.2),
+                "left_cheek": (0.12, 0.5, 0.25, 0.22),
+                "right_cheek": (0.63, 0.5, 0.25, 0.22)}
+
+# Masque de peau dans l'espace YCrCb (seuils classiques Cr 133-173, Cb 77-127)
+def skin_mask(roi):
+    ycrcb = cv2.cvtColor(roi, cv2.COLOR_BGR2YCrCb)
+    return cv2.inRange(ycrcb, (0, 133, 77), (255, 173, 127))
+
+# Moyenne (R, G, B) d'une vue BGR, lue directement par cv2.mean sans conversion ni copie
+def _bgr_mean(view, mask=None):
+    if view.size == 0 or (mask is not None and cv2.countNonZero(mask) == 0):
+        return np.full(3, np.nan)
+    b, g, r, _ = cv2.mean(view, mask=mask)
+    return np.array([r, g, b])
+
+# Moyennes RGB de la ROI (x, y, w, h) de la frame : un vecteur (R, G, B) pour tout le visage,
+# ou un dictionnaire par sous-région si regions est donné. Les sous-régions étant disjointes,
+# chaque pixel n'est lu qu'une fois. Le masque de peau (optionnel) est calculé une seule fois pour la ROI.
+def roi_means(frame, x, y, w, h, regions=None, skin=False):
+    roi = frame[y:y+h, x:x+w]
+    mask = skin_mask(roi) if skin else None
+    if regions is None:
+        return _bgr_mean(roi, mask)
+    means = {}
+    for name, (rx, ry, rw, rh) in regions.items():
+        x0, y0 = int(rx * w), int(ry * h)
+        x1, y1 = x0 + max(int(rw * w), 1), y0 + max(int(rh * h), 1)
+        means[name] = _bgr_mean(roi[y0:y1, x0:x1], None if mask is None else mask[y0:y1, x0:x1])
+    return means
@@ -0,0 +1,138 @@
+import numpy as np
+from functools import lru_cache
+from lazy import LazyModule
+
+scipy_signal = LazyModule("scipy.signal")  # Loaded on first use
+
+# Frequency-domain HRV bands (Hz)
+LF_BAND = (0.04, 0.15)
+HF_BAND = (0.15, 0.4)
+MIN_INTERVALS = 2  # Intervals needed for the time-domain statistics
+MIN_SPECTRAL_INTERVALS = 6  # Intervals needed for the Lomb-Scargle LF/HF estimate
+MIN_SPECTRAL_SDNN = 1.0  # SDNN (ms) below which the tachogram is flat: LF/HF would only measure rounding noise
+
+EMPTY_STATS = {"count": 0, "mean_rr": None, "sdnn": None, "rmssd": None, "pnn50": None, "lf_hf": None, "lf_nu": None,
+            "hf_nu": None}
+
+# -----------------------------------------------------------------------------------------------------------------------
+# Cached frequency grid (Hz) and band masks for the Lomb-Scargle periodogram (0.01 Hz: finer than a
+# 20 s window can resolve)
+@lru_cache(maxsize=4)
+def spectral_grid(step=0.01):
+    freqs = np.arange(LF_BAND[0], HF_BAND[1] + step / 2, step)
+    lf = (freqs >= LF_BAND[0]) & (freqs < LF_BAND[1])
+    hf = (freqs >= HF_BAND[0]) & (freqs <= HF_BAND[1])
+    return freqs, 2 * np.pi * freqs, lf, hf
+
+# -----------------------------------------------------------------------------------------------------------------------
+# LF/HF balance of an unevenly sampled RR series (beat times in s, intervals in ms) via Lomb-Scargle:
+# no resampling of the tachogram is needed. Returns (LF/HF, LF n.u., HF n.u.) or Nones if too short or flat
+def lf_hf(times, intervals):
+    if len(intervals) < MIN_SPECTRAL_INTERVALS or intervals.std() < MIN_SPECTRAL_SDNN:
+        return None, None, None
+    _, omega, lf_mask, hf_mask = spectral_grid()
+    power = scipy_signal.lombscargle(times, intervals - intervals.mean(), omega)
+    lf, hf = power[lf_mask].sum(), power[hf_mask].sum()
+    if lf + hf <= 0:
+        return None, None, None
+    return (float(lf / hf) if hf > 0 else None), float(100 * lf / (lf + hf)), float(100 * hf / (lf + hf))
+
+# -----------------------------------------------------------------------------------------------------------------------
+# Full HRV set from an array of RR intervals (s), vectorized: mean RR, SDNN, RMSSD (ms), pNN50 (%), LF/HF
+def rr_statistics(peak_intervals):
+    rr = np.asarray(peak_intervals, dtype=float) * 1000
+    if len(rr) < MIN_INTERVALS:
+        return {**EMPTY_STATS, "count": len(rr)}
+    diff = np.diff(rr)
+    ratio, lf_nu, hf_nu = lf_hf(np.cumsum(rr) / 1000, rr)
+    return {"count": len(rr), "mean_rr": float(rr.mean()), "sdnn": float(rr.std()),
+            "rmssd": float(np.sqrt(np.mean(diff ** 2))), "pnn50": float(100 * np.mean(np.abs(diff) > 50)),
+            "lf_hf": ratio, "lf_nu": lf_nu, "hf_nu": hf_nu}
+
+# -----------------------------------------------------------------------------------------------------------------------
+# Incremental RR series over a sliding window of beats. Peaks are given as absolute sample positions, fractional
+# after vitals.refine_peaks; beats already accepted are kept, only newer peaks are appended and beats older than the
+# window are dropped, with running sums updated on both ends so the time-domain statistics cost O(new beats) per window.
+# Peaks in the last `guard` samples are deferred: the smoothing filter may still move them. Peaks before
+# sample `settle` are ignored: the causal bandpass has not settled yet and shifts them.
+class RRSeries:
+    def __init__(self, fs, window_sec=20, guard=5, settle=0):
+        self.fs = fs
+        self.span = int(window_sec * fs)
+        self.guard = guard
+        self.settle = settle
+        self.min_distance = fs / 2  # Same refractory period as find_heart_peaks
+        self.peaks = np.empty(0)  # Accepted beats (absolute sample positions)
+        self.sum = self.sum_sq = 0.0  # Running sums of the intervals (ms) and of their squares
+        self.diff_sq = 0.0  # Running sum of squared successive differences (ms^2)
+        self.nn50 = 0  # Successive differences above 50 ms
+
+    def _intervals(self, peaks):
+        return np.diff(peaks) * (1000 / self.fs)
+
+    # Running-sum contributions of the intervals between consecutive `peaks`
+    def _sums(self, peaks):
+        rr = self._intervals(peaks)
+        diff = np.diff(rr)
+        return rr.sum(), (rr ** 2).sum(), (diff ** 2).sum(), int(np.count_nonzero(np.abs(diff) > 50))
+
+    def _apply(self, peaks, sign):
+        if len(peaks) < 2:
+            return
+        total, sum_sq, diff_sq, nn50 = self._sums(peaks)
+        self.sum += sign * total
+        self.sum_sq += sign * sum_sq
+        self.diff_sq += sign * diff_sq
+        self.nn50 += sign * nn50
+
+    # Add the peaks of the window ending at absolute sample `end` and drop beats that left the window
+    def update(self, peaks, end):
+        peaks = np.asarray(peaks, dtype=float) + (end - min(end, self.span))
+        last = self.peaks[-1] if len(self.peaks) else self.settle - self.min_distance
+        new = peaks[(peaks >= last + self.min_distance) & (peaks < end - self.guard)]
+        if len(new):
+            # The last accepted beat (and the one before it) link the new intervals to the old ones
+            self._apply(np.concatenate((self.peaks[-2:], new)), 1)
+            self._apply(self.peaks[-2:], -1)
+            self.peaks = np.concatenate((self.peaks, new))
+        expired = int(np.searchsorted(self.peaks, end - self.span))
+        if expired:
+            # Remove the intervals (and successive differences) that involve an expired beat
+            self._apply(self.peaks[:expired + 2], -1)
+            self._apply(self.peaks[expired:expired + 2], 1)
+            self.peaks = self.peaks[expired:]
+        return self.stats()
+
+    # Statistics of the current series; LF/HF is computed on demand from the (short) interval array
+    def stats(self):
+        n = len(self.peaks) - 1
+        if n < MIN_INTERVALS:
+            return {**EMPTY_STATS, "count": max(n, 0)}
+        mean = self.sum / n
+        ratio, lf_nu, hf_nu = lf_hf(self.peaks[1:] / self.fs, self._intervals(self.peaks))
+        return {"count": n, "mean_rr": float(mean), "sdnn": float(np.sqrt(max(self.sum_sq / n - mean ** 2, 0.0))),
+                "rmssd": float(np.sqrt(max(self.diff_sq, 0.0) / (n - 1))), "pnn50": float(100 * self.nn50 / (n - 1)),
+                "lf_hf": ratio, "lf_nu": lf_nu, "hf_nu": hf_nu}
+
+# -----------------------------------------------------------------------------------------------------------------------
+# Stress level from RMSSD (ms)
+def stress_level(stats):
+    rmssd = stats["rmssd"]
+    if rmssd is None:
+        return "Insufficient data"
+    if rmssd > 50:
+        return "Very low stress"
+    elif 30 <= rmssd < 50:
+        return "Mild stress"
+    elif 15 <= rmssd <= 30:
+        return "Moderate stress"
+    else:
+        return "High stress"
+
+# -----------------------------------------------------------------------------------------------------------------------
+# Blood pressure (basic estimate from the mean RR interval)
+def blood_pressure(stats):
+    if stats["mean_rr"] is None:
+        return None, None
+    mean_rr = stats["mean_rr"] / 1000
+    return 85 + mean_rr * 40, 50 + mean_rr * 20
@@ -0,0 +1,124 @@
+import os, json, hashlib, tempfile
+import numpy as np
+from contextlib import contextmanager, asynccontextmanager
+
+# Paramètres de réception des vidéos
+CHUNK_SIZE = 1024 * 1024  # Taille des blocs copiés sur disque (octets)
+MAX_UPLOAD_BYTES = int(os.environ.get("RPPG_MAX_UPLOAD_MB", 200)) * 1024 * 1024  # Taille maximale d'une vidéo
+
+# Exception levée quand la vidéo dépasse la taille maximale autorisée
+class UploadTooLarge(Exception):
+    pass
+
+# Créer un fichier temporaire unique dans le dossier d'upload en gardant l'extension d'origine
+def _temp_file(folder, filename):
+    os.makedirs(folder, exist_ok=True)
+    suffix = os.path.splitext(os.path.basename(filename or ''))[1]
+    return tempfile.mkstemp(suffix=suffix, dir=folder)
+
+def _check_size(size, max_bytes):
+    if size > max_bytes:
+        raise UploadTooLarge(f"La vidéo dépasse la taille maximale autorisée ({max_bytes // (1024 * 1024)} Mo).")
+
+def _remove(path):
+    if os.path.exists(path):
+        os.remove(path)
+
+# Copier un flux (fichier Flask/werkzeug) bloc par bloc vers un fichier temporaire, supprimé à la sortie.
+# Le contenu est haché (SHA-256) pendant la copie : renvoie (chemin, empreinte du contenu)
+@contextmanager
+def spooled_upload(stream, folder, filename='', max_bytes=MAX_UPLOAD_BYTES, chunk_size=CHUNK_SIZE):
+    fd, path = _temp_file(folder, filename)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            size = 0
+            digest = hashlib.sha256()
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                _check_size(size, max_bytes)
+                digest.update(chunk)
+                out.write(chunk)
+        yield path, digest.hexdigest()
+    finally:
+        _remove(path)
+
+# Même chose pour un UploadFile FastAPI (lecture asynchrone)
+@asynccontextmanager
+async def spooled_upload_async(upload, folder, max_bytes=MAX_UPLOAD_BYTES, chunk_size=CHUNK_SIZE):
+    fd, path = _temp_file(folder, upload.filename)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            size = 0
+            digest = hashlib.sha256()
+            while True:
+                chunk = await upload.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                _check_size(size, max_bytes)
+                digest.update(chunk)
+                out.write(chunk)
+        yield path, digest.hexdigest()
+    finally:
+        _remove(path)
+
+# Sortir une vidéo du fichier temporaire de spooled_upload (analyse en arrière-plan, après la requête) :
+# renvoie le nouveau chemin, que l'appelant doit supprimer
+def keep_upload(path):
+    root, extension = os.path.splitext(path)
+    kept = f"{root}-job{extension}"
+    os.replace(path, kept)
+    return kept
+
+# Lire une trace RGB compacte envoyée à la place de la vidéo (ROI déjà moyennée côté client) :
+# - JSON : {"age", "weight", "height"[, "fps"], "rgb": [[r, g, b], ...][, "t": [s, ...]]}
+# - binaire (application/octet-stream) : float32 little-endian, lignes (t, r, g, b), paramètres dans l'URL
+def parse_trace(body, content_type, params, max_bytes=MAX_UPLOAD_BYTES):
+    _check_size(len(body), max_bytes)
+    if (content_type or '').startswith("application/json"):
+        try:
+            data = json.loads(body)
+        except ValueError:
+            raise ValueError("Trace JSON invalide.")
+        params = {**params, **data}
+        rgb = np.asarray(data.get("rgb", []), dtype=float)
+        t = np.asarray(data["t"], dtype=float) if data.get("t") is not None else None
+    else:
+        if len(body) % 16:
+            raise ValueError("La trace binaire doit contenir des lignes float32 (t, r, g, b).")
+        rows = np.frombuffer(body, dtype="<f4").reshape(-1, 4).astype(float)
+        t, rgb = rows[:, 0], rows[:, 1:]
+    if rgb.ndim != 2 or rgb.shape[1] != 3 or len(rgb) == 0:
+        raise ValueError("La trace doit contenir des moyennes RGB de forme (N, 3).")
+    if t is not None and len(t) != len(rgb):
+        raise ValueError("Les horodatages et la trace RGB n'ont pas la même longueur.")
+    try:
+        age, weight, height = int(params["age"]), int(params["weight"]), int(params["height"])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("Les paramètres age, weight et height sont obligatoires.")
+
+    # Sans horodatage, les échantillons sont supposés réguliers à la fréquence fps (si elle est donnée)
+    if t is None and params.get("fps"):
+        t = np.arange(len(rgb)) / float(params["fps"])
+    if not np.isfinite(rgb).all() or (t is not None and not np.isfinite(t).all()):
+        raise ValueError("La trace contient des valeurs non finies (NaN ou infini).")
+    return {"age": age, "weight": weight, "height": height, "t": t, "rgb": rgb}
+
+# Échantillon du flux temps réel ({"rgb": [r, g, b][, "t": s]}) : renvoie (rgb, t) ou lève ValueError.
+# Sans horodatage, `t` (attribué à la réception) est utilisé ; il doit suivre le dernier échantillon accepté
+def parse_sample(data, t, previous_t=None):
+    try:
+        rgb = np.asarray(data["rgb"], dtype=float)
+        t = float(data.get("t", t))
+    except (KeyError, TypeError, ValueError, AttributeError):
+        raise ValueError('Échantillon invalide : {"rgb": [r, g, b], "t": s} attendu.')
+    if rgb.shape != (3,):
+        raise ValueError("L'échantillon doit contenir une moyenne RGB (3 valeurs).")
+    if not np.isfinite(rgb).all() or not np.isfinite(t):
+        raise ValueError("L'échantillon contient des valeurs non finies (NaN ou infini).")
+    if previous_t is not None and t <= previous_t:
+        raise ValueError("Les horodatages doivent être croissants.")
+    return rgb, t
@@ -0,0 +1,170 @@
+import os, json, time, uuid, threading, multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+# Analyses asynchrones : /upload_video peut renvoyer un identifiant de job tout de suite, l'analyse tourne dans un
+# pool de threads en arrière-plan et /jobs/<id> donne l'avancement (frames traitées, HR/SpO2 partiels), le
+# résultat final ou l'erreur. L'état des jobs est dans un store à durée de vie limitée : en mémoire (par défaut),
+# en mémoire partagée avec les processus d'un pool (multiprocessing.Manager), ou dans Redis (ou un serveur
+# compatible) avec RPPG_JOB_STORE=redis://..., pour le partager entre processus. L'avancement et l'annulation
+# passent par le store : l'analyse d'un job peut tourner dans un autre processus que le gestionnaire.
+JOB_TTL = int(os.environ.get("RPPG_JOB_TTL", 3600))  # Durée de vie d'un job sans mise à jour (s)
+JOB_WORKERS = int(os.environ.get("RPPG_JOB_WORKERS", 2))  # Analyses simultanées en arrière-plan
+
+# Exception levée dans l'analyse quand le job a été annulé
+class JobCancelled(Exception):
+    pass
+
+# Store en mémoire ; les jobs expirent JOB_TTL secondes après leur dernière mise à jour. Avec un
+# multiprocessing.Manager, l'état est tenu par le processus du gestionnaire et le store peut être envoyé
+# aux processus d'un pool (avancement et annulation visibles depuis l'analyse)
+class MemoryJobStore:
+    def __init__(self, ttl=JOB_TTL, manager=None):
+        self.ttl = ttl
+        self.manager = manager
+        self.jobs = manager.dict() if manager is not None else {}
+        self.cancelled = manager.dict() if manager is not None else {}
+        self.lock = manager.Lock() if manager is not None else threading.Lock()
+
+    # Copie envoyée à un processus du pool : les proxys du gestionnaire, sans le gestionnaire lui-même
+    def __getstate__(self):
+        return {**self.__dict__, "manager": None}
+
+    def _evict(self, now):
+        for job_id in [job_id for job_id, (expires, _) in self.jobs.items() if expires < now]:
+            del self.jobs[job_id]
+            self.cancelled.pop(job_id, None)
+
+    def create(self, job_id, job):
+        now = time.time()
+        with self.lock:
+            self._evict(now)
+            self.jobs[job_id] = (now + self.ttl, dict(job))
+
+    def get(self, job_id):
+        now = time.time()
+        with self.lock:
+            self._evict(now)
+            entry = self.jobs.get(job_id)
+            return dict(entry[1]) if entry else None
+
+    def update(self, job_id, **fields):
+        with self.lock:
+            entry = self.jobs.get(job_id)
+            if entry is None:
+                return None
+            job = {**entry[1], **fields}
+            self.jobs[job_id] = (time.time() + self.ttl, job)
+            return dict(job)
+
+    def cancel(self, job_id):
+        with self.lock:
+            if job_id in self.jobs:
+                self.cancelled[job_id] = True
+
+    def is_cancelled(self, job_id):
+        with self.lock:
+            return job_id in self.cancelled
+
+# Store Redis : un job par clé JSON avec expiration ; l'annulation est une clé séparée, pour ne pas être
+# écrasée par les mises à jour d'avancement du worker
+class RedisJobStore:
+    def __init__(self, client, ttl=JOB_TTL, prefix="rppg:job:", url=None):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.url = url  # Pour recréer le client dans un processus du pool
+
+    # Copie envoyée à un processus du pool : le client est recréé à partir de l'URL
+    def __getstate__(self):
+        return {**self.__dict__, "client": None}
+
+    def __setstate__(self, state):
+        import redis
+        self.__dict__.update(state)
+        self.client = redis.Redis.from_url(self.url)
+
+    def create(self, job_id, job):
+        self.client.set(self.prefix + job_id, json.dumps(job), ex=self.ttl)
+
+    def get(self, job_id):
+        value = self.client.get(self.prefix + job_id)
+        return json.loads(value) if value is not None else None
+
+    def update(self, job_id, **fields):
+        job = self.get(job_id)
+        if job is None:
+            return None
+        job.update(fields)
+        self.create(job_id, job)
+        return job
+
+    def cancel(self, job_id):
+        self.client.set(self.prefix + "cancel:" + job_id, 1, ex=self.ttl)
+
+    def is_cancelled(self, job_id):
+        return bool(self.client.exists(self.prefix + "cancel:" + job_id))
+
+# Store choisi par RPPG_JOB_STORE : vide pour la mémoire, URL redis:// sinon (paquet redis requis).
+# shared=True : store en mémoire partagé avec les processus d'un pool (à créer avant le pool)
+def make_store(url=None, ttl=JOB_TTL, shared=False):
+    url = url if url is not None else os.environ.get("RPPG_JOB_STORE", "")
+    if not url:
+        return MemoryJobStore(ttl, multiprocessing.Manager() if shared else None)
+    import redis
+    return RedisJobStore(redis.Redis.from_url(url), ttl, url=url)
+
+# Suivi d'avancement d'un job, passé à l'analyse : publie l'avancement dans le store et lève JobCancelled après
+# une annulation. Peut être envoyé à un processus du pool avec le store
+class JobProgress:
+    def __init__(self, store, job_id):
+        self.store = store
+        self.job_id = job_id
+
+    def __call__(self, info):
+        if self.store.is_cancelled(self.job_id):
+            raise JobCancelled()
+        self.store.update(self.job_id, progress=info)
+
+class JobManager:
+    def __init__(self, store=None, workers=JOB_WORKERS):
+        self.store = store or make_store()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rppg-job")
+
+    # Lancer run(progress) en arrière-plan ; progress (JobProgress) publie l'avancement et lève JobCancelled après
+    # une annulation, y compris depuis un processus du pool si run y envoie l'analyse. cleanup() est appelé à la fin
+    # dans tous les cas (ex: supprimer la vidéo). Renvoie l'identifiant
+    def submit(self, run, cleanup=None):
+        job_id = uuid.uuid4().hex
+        self.store.create(job_id, {"id": job_id, "status": "queued", "created": time.time(), "progress": None,
+                                "result": None, "error": None})
+        self.executor.submit(self._run, job_id, run, cleanup)
+        return job_id
+
+    def _run(self, job_id, run, cleanup):
+        try:
+            if self.store.is_cancelled(job_id):
+                raise JobCancelled()
+            self.store.update(job_id, status="running", started=time.time())
+            result = run(JobProgress(self.store, job_id))
+            self.store.update(job_id, status="done", result=result, finished=time.time())
+        except JobCancelled:
+            self.store.update(job_id, status="cancelled", finished=time.time())
+        except Exception as error:
+            self.store.update(job_id, status="failed", error=f"{type(error).__name__}: {error}", finished=time.time())
+        finally:
+            if cleanup is not None:
+                cleanup()
+
+    def get(self, job_id):
+        return self.store.get(job_id)
+
+    # Demander l'annulation : un job en attente ne démarre pas, un job en cours s'arrête à la prochaine mise à jour
+    # de l'avancement (son statut passe alors à "cancelled")
+    def cancel(self, job_id):
+        job = self.store.get(job_id)
+        if job is None or job["status"] not in ("queued", "running"):
+            return job
+        self.store.cancel(job_id)
+        if job["status"] == "queued":
+            return self.store.update(job_id, status="cancelled")
+        return {**job, "cancel_requested": True}
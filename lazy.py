@@ -0,0 +1,27 @@
+import importlib, threading
+
+# Import différé d'un module lourd (sous-modules de SciPy) : le module n'est chargé qu'au premier accès à un de
+# ses attributs, puis chaque attribut lu est gardé sur l'objet (accès suivants sans surcoût).
+# Un worker démarre ainsi sans payer l'import ; warm_up (startup.py) le déclenche avant d'annoncer qu'il est prêt.
+class LazyModule:
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._module is None:
+                self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        if attr.startswith("_"):
+            raise AttributeError(attr)
+        value = getattr(self._module or self._load(), attr)
+        setattr(self, attr, value)
+        return value
+
+    @property
+    def loaded(self):
+        return self._module is not None
@@ -1,28 +1,54 @@
-import cv2, os, numpy as np 
+import os, logging
 from flask_cors import CORS
-from flask import Flask, request, jsonify
-from face import detect_face, filter_by_confidence
-from metrics import (calculate_activity, calculate_sleep, calculate_equilibrium,
-                    calculate_metabolism, calculate_health, calculate_relaxation)
-from vitals import (bandpass_filter, calculate_heart_rate, calculate_hrv, calculate_stress_level, calculate_blood_pressure,
-                    calculate_spo2, verify_signal_strength, calculate_respiration_rate)
+from flask import Flask, Response, request, jsonify
+from cache import ResultCache
+from profiling import profiler
+from jobs import JobManager
+from session import (analyze_video, analyze_video_subjects, analyze_trace, analyze_upload, format_subjects,
+                    merge_profile, submit_job)
+from pipeline import PIPELINE, analyze_video_pipelined
+from ingest import spooled_upload, keep_upload, parse_trace, UploadTooLarge, MAX_UPLOAD_BYTES
+from startup import readiness, start
 # Paramètres de capture
-fs = 30  # Fréquence d'échantillonnage (frames par seconde)
+fs = float(os.environ.get("RPPG_FS", 30))  # Fréquence d'analyse (Hz) : les signaux sont rééchantillonnés à cette fréquence
 lowcut = 0.8  # Fréquence de coupure basse (Hz)
 highcut = 2.5  # Fréquence de coupure haute (Hz)
 order = 4  # Ordre du filtre
-frame_idx = []
-stress_level_label =''
-# Limites des frames pour calculer différents signaux vitaux
-max_frame_HR = 500
-max_frame_HRV = 510
-max_frame_respiration = 520
-max_frame_SPO2 = 530
-max_frame_pressions = 540
-max_frame_total = 600  # Limite pour les frames totales
+window_sec = 20  # Taille de la fenêtre glissante d'analyse (s)
+hop_sec = 1  # Intervalle entre deux recalculs des signaux vitaux (s)
+method = os.environ.get("RPPG_METHOD", "green")  # Algorithme rPPG (green, chrom, pos)
+# Durées de signal (s) avant de calculer différents signaux vitaux : 500 à 600 frames à 30 images/s,
+# indépendamment de la fréquence d'analyse fs
+min_sec_HR = 500 / 30
+min_sec_HRV = 510 / 30
+min_sec_respiration = 520 / 30
+min_sec_SPO2 = 530 / 30
+min_sec_pressions = 540 / 30
+min_sec_total = 600 / 30  # Durée avant de calculer les scores
+
+# Paramètres de chaque session d'analyse
+session_params = dict(fs=fs, lowcut=lowcut, highcut=highcut, order=order, window_sec=window_sec, hop_sec=hop_sec, method=method,
+                    min_total_sec=min_sec_total, log_every=int(os.environ.get("RPPG_LOG_EVERY", 30)))
+
+# Journal des mesures (une ligne toutes les RPPG_LOG_EVERY frames) au niveau RPPG_LOG_LEVEL
+logging.basicConfig(level=os.environ.get("RPPG_LOG_LEVEL", "INFO"), format="%(asctime)s %(levelname)s %(name)s %(message)s")
+
+# Cache disque des résultats, indexé par le contenu des vidéos (envois répétés de la même vidéo)
+result_cache = ResultCache()
+
+# Analyse d'une vidéo : séquentielle, ou pipeline décodage / suivi du visage / analyse (RPPG_PIPELINE=1)
+analyze = analyze_video_pipelined if PIPELINE else analyze_video
+
+# Analyses en arrière-plan (/upload_video avec async=true), suivies par /jobs/<id>
+job_manager = JobManager()
+
+# Préchauffage en arrière-plan (imports, détecteur, filtres) ; /healthz indique quand le worker est prêt
+start(session_params)
+
 # Initialisation de l'application Flask
 
 app = Flask(__name__)
+app.config["MAX_CONTENT_LENGTH"] = MAX_UPLOAD_BYTES + 1024 * 1024  # Rejeter les requêtes trop volumineuses (413)
 
 # Liste des origines autorisées
 allowed_origins = ["http://localhost:8001"]
@@ -31,131 +57,94 @@ allowed_origins = ["http://localhost:8001"]
 CORS(app, resources={r"/*": {"origins": allowed_origins}})
 
 # Dossier pour stocker les vidéos téléchargées
-UPLOAD_FOLDER = 'uploads/'
+UPLOAD_FOLDER = os.environ.get("RPPG_UPLOAD_DIR", "uploads/")
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
 
-# Initialisation du détecteur de visage en utilisant le modèle Haar Cascade
-face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-
-# Variables pour stocker les signaux RGB et RPPG 
-signals = {"rppg_signal": [], "heart_rates": [], "spo2_rates": [], "hrv_rates": [], "respiration_rates": [], 
-        "systolic_rates": [], "diastolic_rates": [], "ppg_red_signal": [], "ppg_infra_signal": []}
-
-# Variables moyennes et actuelles pour les signaux physiologiques
-metrics = {"avg_bpm": 0, "bpm": 0, "avg_hrv": 0, "hrv": 0,
-        "avg_spo2": 0, "spo2": 0, "avg_respiration": 0, "respiration": 0,
-        "avg_diastolic": 0, "diastolic": 0, "avg_systolic": 0, "systolic": 0}
-
-# Variables pour stocker les scores calculés par les métriques des signaux vitaux
-scores = {"activity_score": 0, "sleep_score": 0, "equilibrium_score": 0,
-        "metabolism_score": 0, "health_score": 0, "relaxation_score": 0}
-
-# Fonction pour réinitialiser les signaux et les métriques si le nombre de frames dépasse une limite
-def reset_signals_if_exceeds(frame_idx, signals, metrics):
-    signals["rppg_signal"].clear()
-    signals["ppg_red_signal"].clear()
-    signals["ppg_infra_signal"].clear()
-    signals["heart_rates"].clear()
-    signals["spo2_rates"].clear()
-    signals["hrv_rates"].clear()
-    signals["respiration_rates"].clear()
-    signals["systolic_rates"].clear()
-    signals["diastolic_rates"].clear()
-    metrics["avg_bpm"] = 0
-    metrics["avg_spo2"] = 0
-    metrics["avg_hrv"] = 0
-    metrics["avg_respiration"] = 0
-    metrics["avg_systolic"] = 0
-    metrics["avg_diastolic"] = 0
-    frame_idx.clear()
-
-# Route pour télécharger et traiter la vidéo
+# Route pour télécharger et traiter la vidéo ; avec async=true (formulaire ou URL), renvoie tout de suite
+# un identifiant de job (202) et l'analyse continue en arrière-plan. Avec subjects=true, toutes les personnes
+# visibles sont suivies et les signaux vitaux sont renvoyés par personne (sans passer par le cache)
 @app.route("/upload_video", methods=["POST"])
 def upload_video():
     age = int(request.form["age"])
     weight = int(request.form["weight"])
     height = int(request.form["height"])
     video = request.files["video"]
-    global signals, metrics, scores, frame_idx , stress_level_label 
-    
-    # Sauvegarder la vidéo temporairement
-    video_path = os.path.join(UPLOAD_FOLDER, video.filename)
-    print('le path est :', video_path)
-    
-    reset_signals_if_exceeds(frame_idx, signals, metrics)
-    
-    video.save(video_path)  # Enregistrer la vidéo sur le serveur
-    cap = cv2.VideoCapture(video_path)  # Charger la vidéo
+    background = request.values.get("async", "").lower() in ("1", "true", "yes")
+    group = request.values.get("subjects", "").lower() in ("1", "true", "yes")
+
+    # Copier la vidéo par blocs dans un fichier temporaire, supprimé même en cas d'erreur
+    # Une session par requête : les signaux et métriques ne sont plus partagés entre utilisateurs
+    try:
+        with spooled_upload(video.stream, UPLOAD_FOLDER, video.filename) as (video_path, content_hash):
+            if background:
+                job_id = submit_job(job_manager, result_cache, keep_upload(video_path), content_hash, age, weight, height,
+                                    format_results, group, analyze=analyze, **session_params)
+                return jsonify({"job_id": job_id, "status_url": f"/jobs/{job_id}"}), 202
+            if group:
+                results = analyze_video_subjects(video_path, age, weight, height, **session_params)
+            else:
+                # Même contenu déjà analysé : seuls les scores sont recalculés ; trace seule : pas de décodage ni de détection
+                status, results = analyze_upload(result_cache, video_path, content_hash, age, weight, height,
+                                                analyze=analyze, **session_params)
+    except UploadTooLarge as error:
+        return jsonify({"error": str(error)}), 413
 
     # Vérifier si la vidéo a été correctement chargée
-    if not cap.isOpened():
+    if results is None:
         return jsonify({"error": "Erreur lors du chargement de la vidéo."}), 400
-        
-    # Boucle pour traiter chaque frame de la vidéo
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break  # Sortir de la boucle si la vidéo est terminée
-        frame_idx.append(len(frame_idx) + 1)  # Ajouter l'index de la frame
-
-        # Détecter le visage
-        face_roi, _, _, w, h = detect_face(frame)
-        if face_roi is not None:
-            is_confident, _ = filter_by_confidence(w, h, frame.shape, threshold=8)
-            if is_confident:
-                roi_rgb = cv2.cvtColor(face_roi, cv2.COLOR_BGR2RGB)
-                avg_color = np.mean(roi_rgb, axis=(0, 1))
-                signals["rppg_signal"].append(avg_color[1])
-
-                avg_red = np.mean(roi_rgb[:, :, 0])
-                avg_infra = 0.3 * avg_red + 0.59 * avg_color[1] + 0.11 * np.mean(roi_rgb[:, :, 2])
-                signals["ppg_red_signal"].append(avg_red)
-                signals["ppg_infra_signal"].append(avg_infra)
-
-                if len(signals["rppg_signal"]) > 33:
-                    filtered_signal = bandpass_filter(signals["rppg_signal"], lowcut, highcut, fs, order)
-                    bpm, peak_intervals, peaks = calculate_heart_rate(filtered_signal, fs)
-                    signals["heart_rates"].append(bpm)
-                    metrics["avg_bpm"] = round(np.mean(signals["heart_rates"]), 2)
-
-                    if verify_signal_strength(signals["ppg_red_signal"]) and verify_signal_strength(signals["ppg_infra_signal"]):
-                        spo2 = calculate_spo2(signals["ppg_red_signal"], signals["ppg_infra_signal"], fs)
-                        signals["spo2_rates"].append(spo2)
-                        metrics["avg_spo2"] = round(np.mean(signals["spo2_rates"]), 2)
-
-                    if len(peaks) > 1:
-                        _, hrv, _ = calculate_hrv(peaks)
-                        signals["hrv_rates"].append(hrv)
-                        metrics["avg_hrv"] = round(np.mean(signals["hrv_rates"]), 2)
-
-                    stress_level_label = calculate_stress_level(peak_intervals)
-
-                    respiration = calculate_respiration_rate(filtered_signal, fs)
-                    signals["respiration_rates"].append(respiration)
-                    metrics["avg_respiration"] = round(np.mean(signals["respiration_rates"]), 2)
-
-                    systolic, diastolic = calculate_blood_pressure(peak_intervals)
-                    if systolic and diastolic:
-                        signals["systolic_rates"].append(systolic)
-                        signals["diastolic_rates"].append(diastolic)
-                        metrics["avg_systolic"] = round(np.mean(signals["systolic_rates"]), 2)
-                        metrics["avg_diastolic"] = round(np.mean(signals["diastolic_rates"]), 2)
-            print('les mesures sont :', len(frame_idx), metrics["avg_bpm"], metrics["avg_hrv"], metrics["avg_spo2"], 
-                metrics["avg_respiration"], metrics["avg_diastolic"], metrics["avg_systolic"], stress_level_label)
-    
-    cap.release()
-    os.remove(video_path)
-
-    if len(signals["rppg_signal"]) > max_frame_total:
-        scores["activity_score"] = calculate_activity(metrics["avg_bpm"], age)
-        scores["sleep_score"] = calculate_sleep(metrics["avg_hrv"], metrics["avg_respiration"])
-        scores["equilibrium_score"] = calculate_equilibrium(metrics["avg_hrv"], metrics["avg_systolic"], metrics["avg_diastolic"])
-        scores["metabolism_score"] = calculate_metabolism(weight, height, age)
-        scores["health_score"] = calculate_health(metrics["avg_spo2"], metrics["avg_bpm"], metrics["avg_systolic"])
-        scores["relaxation_score"] = calculate_relaxation(metrics["avg_hrv"], metrics["avg_respiration"])
-
-    return jsonify({
+    merge_profile(results)
+
+    if group:
+        return jsonify(format_subjects(results, age, weight, height, format_results))
+    return jsonify({**format_results(results, age, weight, height), "cache": status})
+
+# État d'un job : statut (queued, running, done, failed, cancelled), avancement (frames traitées, mesures
+# partielles), résultats ou erreur ; 404 si le job est inconnu ou expiré
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job introuvable."}), 404
+    return jsonify(job)
+
+# Annuler un job en attente ou en cours
+@app.route("/jobs/<job_id>", methods=["DELETE"])
+def cancel_job(job_id):
+    job = job_manager.cancel(job_id)
+    if job is None:
+        return jsonify({"error": "Job introuvable."}), 404
+    return jsonify(job)
+
+# Route pour analyser une trace RGB déjà extraite côté client (JSON ou float32 binaire)
+@app.route("/upload_trace", methods=["POST"])
+def upload_trace():
+    try:
+        trace = parse_trace(request.get_data(), request.content_type, request.args)
+    except UploadTooLarge as error:
+        return jsonify({"error": str(error)}), 413
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+    results = analyze_trace(trace["rgb"], trace["age"], trace["weight"], trace["height"],
+                            t=trace["t"], **session_params)
+    merge_profile(results)
+    return jsonify(format_results(results, trace["age"], trace["weight"], trace["height"]))
+
+# Disponibilité du worker : 200 une fois le préchauffage terminé, 503 pendant le préchauffage ou s'il a échoué
+@app.route("/healthz", methods=["GET"])
+def healthz():
+    status = readiness()
+    return jsonify(status), 200 if status["ready"] else 503
+
+# Durées par étape, débit et compteurs (détection/suivi, cache) au format texte Prometheus
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    return Response(profiler.render(extra=result_cache.counters()), mimetype="text/plain; version=0.0.4")
+
+# Mettre en forme les résultats d'une session pour la réponse
+def format_results(results, age, weight, height):
+    metrics, scores = results["metrics"], results["scores"]
+    return {
         "message": "Vidéo et données reçues avec succès",
         "age": age,
         "weight": weight,
@@ -172,7 +161,11 @@ def upload_video():
         "metabolism_score": scores["metabolism_score"],
         "health_score": scores["health_score"],
         "relaxation_score": scores["relaxation_score"],
-        "stress_level": stress_level_label
-    })
+        "stress_level": results["stress_level"],
+        "hrv": results["hrv"],
+        "face_tracking": results["face_tracking"],
+        "quality": results["quality"]
+    }
+
 if __name__ == "__main__":
-    app.run(debug=True, port=10000)
\ No newline at end of file
+    app.run(debug=True, port=10000, threaded=True)
\ No newline at end of file
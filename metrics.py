@@ -1,39 +1,87 @@
-# Function to estimate each parameter based on physiological data
+import numpy as np
+
+# Scores calculés à partir des signaux vitaux, vectorisés avec NumPy : chaque fonction accepte des scalaires ou
+# des tableaux (une valeur par session) et renvoie un tableau. Une valeur manquante (None ou NaN) donne un score
+# NaN pour la ligne concernée, sans avertissement. Les fonctions calculate_* restent l'interface scalaire.
+SCORE_KEYS = ("activity_score", "sleep_score", "equilibrium_score", "metabolism_score", "health_score", "relaxation_score")
+
+def _array(values):
+    return np.asarray(np.nan if values is None else values, dtype=float)
+
+# Arrondi à 2 décimales en conservant les NaN
+def _round(scores):
+    return np.round(scores, 2)
+
+# Valeur scalaire d'un score vectorisé ; un score manquant vaut 0, comme les valeurs par défaut des scores
+def _scalar(score):
+    score = float(score)
+    return 0 if np.isnan(score) else score
+
+def activity_scores(heart_rate, age):
+    max_heart_rate = 220 - _array(age)  # Fréquence cardiaque maximale estimée
+    met_value = (_array(heart_rate) / max_heart_rate) * 15  # Le MET peut aller de 1 à 15
+    return _round(np.clip(met_value / 3, 0, 5))  # Normalisation sur une échelle de 0 à 5
+
+def sleep_scores(hrv, respiration_rate):
+    normalized_hrv = _array(hrv) / 100  # Normalisation de HRV pour une échelle cohérente
+    normalized_respiration_rate = _array(respiration_rate) / 30  # Fréquence respiratoire max autour de 30 BPM
+    # Score basé sur la somme pondérée de HRV et de la fréquence respiratoire
+    return _round(np.clip((0.6 * normalized_hrv + 0.6 * normalized_respiration_rate) * 5, 0, 5))
+
+def equilibrium_scores(hrv, blood_pressure_sys, blood_pressure_dia):
+    difference = np.abs(_array(blood_pressure_sys) - _array(blood_pressure_dia)) + 1
+    return _round(np.minimum((_array(hrv) / difference) * 2, 5))
+
+def metabolism_scores(weight, height, age):
+    bmr = 10 * _array(weight) + 6.25 * _array(height) - 5 * _array(age) + 5  # For men
+    return _round(np.minimum((bmr / 2000) * 5, 5))  # Normalize on a scale of 5
+
+def health_scores(spo2, heart_rate, blood_pressure_sys):
+    heart_rate, blood_pressure_sys = _array(heart_rate), _array(blood_pressure_sys)
+    # Fréquence cardiaque ou pression nulle (non mesurée) : score 0
+    missing = (heart_rate == 0) | (blood_pressure_sys == 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # General health based on key vitals like oxygen saturation, heart rate, and blood pressure
+        health_score = (_array(spo2) / 100 + 60 / heart_rate + 120 / blood_pressure_sys) / 3 * 5
+    return _round(np.where(missing, 0.0, np.minimum(health_score, 5)))
+
+def relaxation_scores(hrv, respiration_rate):
+    respiration_rate = _array(respiration_rate)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        relaxation_score = np.minimum((_array(hrv) / respiration_rate) * 3, 5)
+    # Respiration trop lente (ou non mesurée) : score 0 ; respiration manquante : NaN
+    relaxation_score = np.where(respiration_rate > 7, relaxation_score, 0.0)
+    return _round(np.where(np.isnan(respiration_rate), np.nan, relaxation_score))
+
+# Les six scores pour une table en colonnes (dictionnaire de tableaux, DataFrame...) avec les moyennes des
+# signaux vitaux (avg_bpm, avg_hrv, avg_spo2, avg_respiration, avg_systolic, avg_diastolic) et age, weight, height
+def score_table(table):
+    column = lambda key: np.asarray(table[key], dtype=float)
+    bpm, hrv, respiration = column("avg_bpm"), column("avg_hrv"), column("avg_respiration")
+    systolic, age = column("avg_systolic"), column("age")
+    return {"activity_score": activity_scores(bpm, age),
+            "sleep_score": sleep_scores(hrv, respiration),
+            "equilibrium_score": equilibrium_scores(hrv, systolic, column("avg_diastolic")),
+            "metabolism_score": metabolism_scores(column("weight"), column("height"), age),
+            "health_score": health_scores(column("avg_spo2"), bpm, systolic),
+            "relaxation_score": relaxation_scores(hrv, respiration)}
+
+# Function to estimate each parameter based on physiological data (une session à la fois)
 def calculate_activity(heart_rate, age):
-    max_heart_rate = 220 - age  # Fréquence cardiaque maximale estimée
-    met_value = (heart_rate / max_heart_rate) * 15  # Le MET peut aller de 1 à 15
-    activity_score = met_value / 3  # Normalisation sur une échelle de 0 à 5
-    return round(min(max(activity_score, 0), 5), 2)  # Limite entre 0 et 5
+    return _scalar(activity_scores(heart_rate, age))
 
 def calculate_sleep(hrv, respiration_rate):
-    normalized_hrv = hrv / 100  # Normalisation de HRV pour une échelle cohérente
-    normalized_respiration_rate = respiration_rate / 30  # Fréquence respiratoire max autour de 30 BPM
-    # Score basé sur la somme pondérée de HRV et de la fréquence respiratoire
-    sleep_score = (0.6 * normalized_hrv + 0.6 * normalized_respiration_rate) * 5
-    return round(min(max(sleep_score, 0), 5), 2)  # Limite entre 0 et 5
+    return _scalar(sleep_scores(hrv, respiration_rate))
 
+# Pression artérielle manquante : score 0
 def calculate_equilibrium(hrv, blood_pressure_sys, blood_pressure_dia):
-    if blood_pressure_sys is not None and blood_pressure_dia is not None :
-        difference = abs(blood_pressure_sys - blood_pressure_dia) + 1
-        equilibrium_score = (hrv / difference) * 2
-    return round(min(equilibrium_score, 5), 2)
+    return _scalar(equilibrium_scores(hrv, blood_pressure_sys, blood_pressure_dia))
 
 def calculate_metabolism(weight, height, age):
-    bmr = 10 * weight + 6.25 * height - 5 * age + 5  # For men
-    metabolism_score = (bmr / 2000) * 5  # Normalize on a scale of 5
-    return round(min(metabolism_score, 5), 2)
+    return _scalar(metabolism_scores(weight, height, age))
 
 def calculate_health(spo2, heart_rate, blood_pressure_sys):
-    # Vérification si heart_rate et blood_pressure_sys ne sont pas zéro
-    if heart_rate == 0 or blood_pressure_sys == 0:
-        return 0  # Vous pouvez choisir une autre valeur par défaut ou une gestion d'erreur
-    # General health based on key vitals like oxygen saturation, heart rate, and blood pressure
-    health_score = (spo2 / 100 + 60 / heart_rate + 120 / blood_pressure_sys) / 3 * 5
-    return round(min(health_score, 5), 2)
+    return _scalar(health_scores(spo2, heart_rate, blood_pressure_sys))
 
 def calculate_relaxation(hrv, respiration_rate):
-    if respiration_rate >7 : 
-        relaxation_score = (hrv / respiration_rate) * 3
-    else:
-        relaxation_score = 0  # Ou une autre valeur par défaut
-    return round(min(relaxation_score, 5), 2)
+    return _scalar(relaxation_scores(hrv, respiration_rate))
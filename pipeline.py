@@ -0,0 +1,114 @@
+import os, time, queue, threading
+import cv2
+from session import PROGRESS_EVERY, RPPGSession, read_frames
+
+# Pipeline producteur-consommateur pour une vidéo, en trois étages reliés par des files bornées :
+#   décodage (un thread) -> détection / suivi du visage et mesures de la ROI (un thread, dans l'ordre des frames)
+#   -> analyse (thread appelant)
+# Les frames circulent par blocs consécutifs. Le suivi garde un seul tracker pour toute la vidéo (mêmes boîtes, même
+# lissage et même mouvement qu'analyze_video), ce qui le rend séquentiel ; les mesures de la ROI (quelques dizaines
+# de µs par frame) sont faites dans le même thread. OpenCV relâchant le GIL, les trois étages se recouvrent et le
+# temps par vidéo est borné par l'étage le plus lent : en général le suivi (détection comprise) ou l'analyse
+PIPELINE = os.environ.get("RPPG_PIPELINE", "0").lower() not in ("0", "false", "no")  # Sinon analyse séquentielle
+CHUNK_SIZE = 30  # Frames par bloc
+MAX_CHUNKS = 4  # Blocs en attente entre deux étages : borne la mémoire et ralentit le décodage si l'aval sature
+
+_END = object()  # Fin de flux
+
+class VideoPipeline:
+    def __init__(self, session, chunk_size=CHUNK_SIZE, max_chunks=MAX_CHUNKS, progress=None):
+        self.session = session
+        self.progress = progress  # Suivi d'avancement, comme pour analyze_video
+        self.total = 0
+        self.chunk_size = chunk_size
+        self.chunks = queue.Queue(maxsize=max_chunks)
+        self.samples = queue.Queue(maxsize=max_chunks)
+        self.stop = threading.Event()
+        self.errors = []
+
+    # Traiter la vidéo ; renvoie False si elle ne peut pas être ouverte
+    def run(self, video_path):
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            return False
+        self.total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        threads = [threading.Thread(target=self._decode, args=(cap,), daemon=True),
+                threading.Thread(target=self._track, daemon=True)]
+        for thread in threads:
+            thread.start()
+        finished = False
+        try:
+            self._analyze()
+            finished = True
+        finally:
+            self.stop.set()
+            while not finished and self.samples.get() is not _END:  # Analyse interrompue : débloquer le suivi
+                pass
+            for thread in threads:
+                thread.join()
+            cap.release()
+        if self.errors:
+            raise self.errors[0]
+        return True
+
+    # Étage 1 : décoder les frames par blocs
+    def _decode(self, cap):
+        try:
+            frames = read_frames(cap, self.session.profiler, self.session.fs)
+            while not self.stop.is_set():
+                chunk = [item for _, item in zip(range(self.chunk_size), frames)]
+                if not chunk:
+                    break
+                self.chunks.put(chunk)
+        except Exception as error:
+            self.errors.append(error)
+            self.stop.set()
+        finally:
+            self.chunks.put(_END)
+
+    # Étage 2 : détection/suivi du visage avec le tracker de la session, puis moyenne RGB et saturation de la ROI
+    def _track(self):
+        sampler = self.session.sampler
+        try:
+            while True:
+                chunk = self.chunks.get()
+                if chunk is _END:
+                    return
+                if self.stop.is_set():
+                    continue
+                located = [(frame, t, sampler.locate(frame)) for frame, t in chunk]
+                self.samples.put([(None if box is None else sampler.measure_roi(frame, *box), t)
+                                for frame, t, box in located])
+        except Exception as error:
+            self.errors.append(error)
+            self.stop.set()
+            while self.chunks.get() is not _END:  # Vider la file pour ne pas bloquer le décodage
+                pass
+        finally:
+            self.samples.put(_END)
+
+    # Étage 3 : alimenter la session (un seul thread : état non partagé)
+    def _analyze(self):
+        reported = 0
+        while True:
+            samples = self.samples.get()
+            if samples is _END:
+                return
+            if self.stop.is_set():
+                continue
+            for sample, t in samples:
+                self.session.process_sample(sample, t)
+            frames = len(self.session.frame_idx)
+            if self.progress is not None and frames - reported >= PROGRESS_EVERY:
+                reported = frames
+                self.progress({**self.session.live(), "total_frames": self.total})
+
+# Même contrat qu'analyze_video, avec le pipeline à plusieurs étages
+def analyze_video_pipelined(video_path, age, weight, height, progress=None, **params):
+    session = RPPGSession(**params)
+    start = time.perf_counter()
+    if not VideoPipeline(session, progress=progress).run(video_path):
+        return None
+    session.compute_scores(age, weight, height)
+    session.profiler.observe("analysis", time.perf_counter() - start)
+    return session.results()
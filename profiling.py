@@ -0,0 +1,78 @@
+import time, threading
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Instrumentation du pipeline : histogrammes de durée par étape (décodage, détection, ROI, filtrage, HR, SpO2,
+# scores...) et compteurs, exposés au format texte Prometheus. Chaque session a son propre profileur ; son
+# instantané (dictionnaire simple, transmissible entre processus) est fusionné dans le profileur global de l'application.
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+class Profiler:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.histograms = {}  # étape -> {"buckets": effectifs par intervalle (+Inf en dernier), "sum": s, "count": n}
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    # Mesurer la durée d'un bloc : with profiler.stage("decode"): ...
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def observe(self, name, seconds):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = {"buckets": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+            histogram["buckets"][bisect_left(self.buckets, seconds)] += 1
+            histogram["sum"] += seconds
+            histogram["count"] += 1
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def snapshot(self):
+        with self.lock:
+            return {"histograms": {name: {**h, "buckets": list(h["buckets"])} for name, h in self.histograms.items()},
+                    "counters": dict(self.counters)}
+
+    # Ajouter l'instantané d'un autre profileur (session terminée, processus du pool)
+    def merge(self, snapshot):
+        with self.lock:
+            for name, other in snapshot["histograms"].items():
+                histogram = self.histograms.setdefault(name, {"buckets": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0})
+                histogram["buckets"] = [a + b for a, b in zip(histogram["buckets"], other["buckets"])]
+                histogram["sum"] += other["sum"]
+                histogram["count"] += other["count"]
+            for name, value in snapshot["counters"].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    # Format d'exposition texte de Prometheus ; `extra` : compteurs supplémentaires (ex: cache de résultats)
+    def render(self, prefix="rppg", extra=None):
+        snapshot = self.snapshot()
+        lines = [f"# HELP {prefix}_stage_seconds Durée de chaque étape du pipeline (s)",
+                f"# TYPE {prefix}_stage_seconds histogram"]
+        for name, histogram in sorted(snapshot["histograms"].items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), histogram["buckets"]):
+                cumulative += count
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{name}"}} {histogram["sum"]:.6f}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{name}"}} {histogram["count"]}')
+        for name, value in sorted({**snapshot["counters"], **(extra or {})}.items()):
+            lines += [f"# TYPE {prefix}_{name} counter", f"{prefix}_{name} {value}"]
+
+        # Débit moyen : frames traitées par seconde d'analyse
+        analysis = snapshot["histograms"].get("analysis")
+        frames = snapshot["counters"].get("frames_total", 0)
+        fps = frames / analysis["sum"] if analysis and analysis["sum"] else 0.0
+        lines += [f"# TYPE {prefix}_frames_per_second gauge", f"{prefix}_frames_per_second {fps:.3f}"]
+        return "\n".join(lines) + "\n"
+
+# Profileur global de l'application (processus principal)
+profiler = Profiler()
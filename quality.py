@@ -0,0 +1,60 @@
+import cv2, numpy as np
+from spectral import HR_BAND
+
+# Indice de qualité du signal (SQI) par fenêtre : SNR spectral dans la bande cardiaque, mouvement de la ROI
+# et proportion de pixels saturés. Les fenêtres de mauvaise qualité sont écartées avant le filtrage et les pics.
+
+# Proportion de pixels de la ROI écrêtés (proches de 0 ou de 255 sur au moins un canal)
+def saturation_ratio(roi, low=5, high=250):
+    if roi is None or roi.size == 0:
+        return 0.0
+    valid = cv2.countNonZero(cv2.inRange(roi, (low, low, low), (high, high, high)))
+    return 1 - valid / (roi.shape[0] * roi.shape[1])
+
+# Déplacement du centre de la ROI entre deux frames, relatif à la largeur du visage
+def box_motion(previous_box, box):
+    if previous_box is None or box is None:
+        return 0.0
+    (px, py, pw, ph), (x, y, w, h) = previous_box, box
+    shift = np.hypot((x + w / 2) - (px + pw / 2), (y + h / 2) - (py + ph / 2))
+    return float(shift / max(w, 1))
+
+# SNR (dB) : puissance autour de la fréquence cardiaque et de sa première harmonique, rapportée au reste de la bande.
+# None sans fréquence cardiaque ou sans puissance dans la bande (signal constant) : la fenêtre est alors rejetée
+def spectral_snr(freqs, psd, hr_freq, band=HR_BAND, width=0.1):
+    in_band = (freqs >= band[0]) & (freqs <= band[1])
+    if not hr_freq or not psd[in_band].sum() > 0:
+        return None
+    near_peak = (np.abs(freqs - hr_freq) <= width) | (np.abs(freqs - 2 * hr_freq) <= width)
+    tiny = np.finfo(float).tiny  # Tout dans le pic (ou aucun pic) : SNR borné au lieu d'une division par zéro
+    signal = psd[in_band & near_peak].sum() + tiny
+    noise = psd[in_band & ~near_peak].sum() + tiny
+    return float(10 * np.log10(signal / noise))
+
+# Seuils d'acceptation d'une fenêtre et score de qualité entre 0 (inutilisable) et 1
+class QualityGate:
+    def __init__(self, min_snr=-5.0, good_snr=5.0, max_motion=0.05, max_saturation=0.1):
+        self.min_snr = min_snr  # SNR (dB) en dessous duquel la fenêtre est rejetée
+        self.good_snr = good_snr  # SNR (dB) à partir duquel la composante spectrale du score vaut 1
+        self.max_motion = max_motion  # Déplacement moyen par frame (fraction de la largeur du visage)
+        self.max_saturation = max_saturation  # Proportion moyenne de pixels saturés
+
+    # Contrôle peu coûteux (mouvement, saturation) fait avant toute extraction du pouls
+    def precheck(self, motion, saturation):
+        quality = {"snr": None, "motion": round(float(motion), 4), "saturation": round(float(saturation), 4)}
+        if motion > self.max_motion:
+            return {**quality, "score": 0.0, "ok": False, "reason": "motion"}
+        if saturation > self.max_saturation:
+            return {**quality, "score": 0.0, "ok": False, "reason": "saturation"}
+        return {**quality, "score": None, "ok": True, "reason": None}
+
+    # Score final une fois le spectre disponible (snr None : pas de pouls mesurable)
+    def assess(self, quality, snr):
+        quality = {**quality, "snr": None if snr is None else round(snr, 2)}
+        if snr is None or snr < self.min_snr:
+            return {**quality, "score": 0.0, "ok": False, "reason": "snr"}
+        snr_score = np.clip((snr - self.min_snr) / (self.good_snr - self.min_snr), 0, 1)
+        motion_score = 1 - quality["motion"] / self.max_motion
+        saturation_score = 1 - quality["saturation"] / self.max_saturation
+        score = float(snr_score * max(motion_score, 0) * max(saturation_score, 0))
+        return {**quality, "score": round(score, 3), "ok": True, "reason": None}
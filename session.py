@@ -0,0 +1,427 @@
+import os, time, logging, cv2, numpy as np
+from functools import partial
+from face import FaceTracker, MultiFaceTracker, FACE_REGIONS, filter_by_confidence, roi_means
+from profiling import Profiler, profiler
+from quality import QualityGate, box_motion, saturation_ratio
+from metrics import (calculate_activity, calculate_sleep, calculate_equilibrium,
+                    calculate_metabolism, calculate_health, calculate_relaxation)
+from vitals import GrowableBuffer, StreamingVitals, resample_trace
+
+logger = logging.getLogger("rppg")
+PROGRESS_EVERY = 30  # Frames entre deux appels du suivi d'avancement d'analyze_video
+
+# Correspondance entre les séries de valeurs, la moyenne associée et la clé de StreamingVitals
+RATE_KEYS = {"heart_rates": ("avg_bpm", "bpm"), "spo2_rates": ("avg_spo2", "spo2"), "hrv_rates": ("avg_hrv", "hrv"),
+        "respiration_rates": ("avg_respiration", "respiration"), "systolic_rates": ("avg_systolic", "systolic"),
+        "diastolic_rates": ("avg_diastolic", "diastolic")}
+HRV_KEYS = ("mean_rr", "sdnn", "rmssd", "pnn50", "lf_hf")  # Statistiques HRV moyennées sur les fenêtres acceptées
+
+# Mesure des frames d'une séquence : détection/suivi du visage, mouvement de la ROI, moyenne RGB et saturation
+class FrameSampler:
+    def __init__(self, confidence_threshold=8, skin=False, regions=None, profiler=None):
+        self.confidence_threshold = confidence_threshold  # Seuil de confiance du visage (% de la frame)
+        self.skin = skin  # Ne moyenner que les pixels de peau de la ROI
+        self.regions = regions  # Sous-régions à moyenner (front, joues) au lieu de tout le visage
+        self.profiler = profiler or Profiler()
+        self.tracker = FaceTracker()
+        self.previous_box = None  # ROI de la frame précédente, pour mesurer le mouvement
+
+    # (moyenne RGB, mouvement, saturation) de la frame, ou None sans visage exploitable
+    def sample(self, frame):
+        located = self.locate(frame)
+        return None if located is None else self.measure_roi(frame, *located)
+
+    # Détection ou suivi du visage et mouvement de la ROI : (x, y, w, h, mouvement), ou None sans visage.
+    # Le tracker et le mouvement dépendent de la frame précédente : à appeler dans l'ordre des frames
+    def locate(self, frame):
+        # Durée de la détection ou du suivi du visage, selon ce que le tracker a fait pour cette frame
+        detections, start = self.tracker.detections, time.perf_counter()
+        face_roi, x, y, w, h = self.tracker.update(frame)
+        self.profiler.observe("detect" if self.tracker.detections > detections else "track", time.perf_counter() - start)
+        if face_roi is None:
+            self.previous_box = None
+            return None
+        return x, y, w, h, self.motion((x, y, w, h))
+
+    # Mesures d'une ROI déjà localisée (x, y, w, h) par un autre tracker (suivi de plusieurs visages)
+    def measure(self, frame, x, y, w, h):
+        return self.measure_roi(frame, x, y, w, h, self.motion((x, y, w, h)))
+
+    # Mouvement de la ROI depuis la frame précédente
+    def motion(self, box):
+        motion = box_motion(self.previous_box, box)
+        self.previous_box = box
+        return motion
+
+    # Moyenne RGB et saturation d'une ROI localisée : sans état, peut tourner en parallèle sur plusieurs frames
+    def measure_roi(self, frame, x, y, w, h, motion):
+        is_confident, _ = filter_by_confidence(w, h, frame.shape, threshold=self.confidence_threshold)
+        if not is_confident:
+            return None
+        with self.profiler.stage("roi"):
+            avg_color = roi_means(frame, x, y, w, h, self.regions, self.skin)
+            if self.regions is not None:
+                avg_color = np.nanmean(list(avg_color.values()), axis=0)
+            saturation = saturation_ratio(frame[y:y+h, x:x+w])
+        if not np.all(np.isfinite(avg_color)):
+            return None
+        return avg_color, motion, saturation
+
+# Session d'analyse rPPG : tout l'état d'une requête (signaux, métriques, scores), créée pour chaque vidéo
+class RPPGSession:
+    def __init__(self, fs=30, lowcut=0.8, highcut=2.5, order=4, window_sec=20, hop_sec=1, min_samples=34,
+                confidence_threshold=8, min_total_sec=20, min_seconds=None, log_every=0, skin=False, regions=None,
+                method="green", quality=None, record_trace=False):
+        self.fs = fs
+        self.skin = skin  # Ne moyenner que les pixels de peau de la ROI
+        self.regions = FACE_REGIONS if regions is True else regions  # Sous-régions à moyenner (front, joues) au lieu de tout le visage
+        self.log_every = log_every  # Journaliser les mesures toutes les log_every frames (0 : jamais)
+        self.confidence_threshold = confidence_threshold  # Seuil de confiance du visage (% de la frame)
+        # Durées de signal (s) nécessaires pour calculer les scores et avant de publier chaque moyenne
+        # (ex: {"avg_bpm": 17}) ; comparées au nombre d'échantillons rééchantillonnés à fs, pas au nombre de frames
+        self.min_total = min_total_sec * fs
+        self.publish_after = {avg_key: seconds * fs for avg_key, seconds in (min_seconds or {}).items()}
+        self.profiler = Profiler()  # Durées des étapes de cette session, fusionnées ensuite dans le profileur global
+        self.engine = StreamingVitals(fs, lowcut, highcut, order, window_sec=window_sec, hop_sec=hop_sec,
+                                    min_samples=min_samples, method=method, gate=QualityGate(**(quality or {})),
+                                    profiler=self.profiler)
+        self.sampler = self.new_sampler()
+        self.tracker = self.sampler.tracker
+        # Trace par frame (t, r, g, b, mouvement, saturation), conservée pour le cache de résultats
+        self.trace = GrowableBuffer(width=6) if record_trace else None
+        self.frame_idx = []
+        self.stress_level_label = ''
+
+        # Variables pour stocker les signaux vitaux calculés à chaque intervalle (tableaux NumPy préalloués)
+        self.signals = {key: GrowableBuffer() for key in RATE_KEYS}
+
+        # Variables moyennes pour les signaux physiologiques
+        self.metrics = {"avg_bpm": 0, "avg_hrv": 0, "avg_spo2": 0, "avg_respiration": 0,
+                        "avg_diastolic": 0, "avg_systolic": 0}
+
+        # Variables pour stocker les scores calculés par les métriques des signaux vitaux
+        self.scores = {"activity_score": 0, "sleep_score": 0, "equilibrium_score": 0,
+                    "metabolism_score": 0, "health_score": 0, "relaxation_score": 0}
+
+        # Qualité des fenêtres : nombre de fenêtres évaluées / rejetées (par cause) et, par mesure, somme des scores
+        # des fenêtres acceptées qui l'ont produite
+        self.windows = 0
+        self.rejected = {"motion": 0, "saturation": 0, "snr": 0}
+        self.quality_sums = {avg_key: 0.0 for avg_key, _ in RATE_KEYS.values()}
+        self.hrv_sums = {key: [0.0, 0] for key in HRV_KEYS}  # Somme et nombre de fenêtres par statistique HRV
+
+    # Traiter une frame BGR (horodatée en secondes si possible) : détection/suivi du visage puis moyenne RGB de la ROI
+    def process_frame(self, frame, t=None):
+        self.process_sample(self.sampler.sample(frame), t)
+
+    # Nouvel extracteur de mesures avec les paramètres de la session (un par visage suivi)
+    def new_sampler(self):
+        return FrameSampler(self.confidence_threshold, self.skin, self.regions, self.profiler)
+
+    # Ajouter la mesure d'une frame, dans l'ordre des frames (None : pas de visage exploitable)
+    def process_sample(self, sample, t=None):
+        self.frame_idx.append(len(self.frame_idx) + 1)
+        if sample is not None:
+            avg_color, motion, saturation = sample
+            self.process_rgb(avg_color, t, motion, saturation)
+        if self.log_every and len(self.frame_idx) % self.log_every == 0:
+            self.log()
+
+    # Journal échantillonné des mesures courantes (une ligne clé=valeur toutes les log_every frames)
+    def log(self):
+        if logger.isEnabledFor(logging.INFO):
+            metrics = self.metrics
+            logger.info("frame=%d samples=%d bpm=%s hrv=%s spo2=%s respiration=%s diastolic=%s systolic=%s stress=%r",
+                        len(self.frame_idx), self.engine.count, metrics["avg_bpm"], metrics["avg_hrv"], metrics["avg_spo2"],
+                        metrics["avg_respiration"], metrics["avg_diastolic"], metrics["avg_systolic"], self.stress_level_label)
+
+    # Ajouter une moyenne RGB de la ROI ; avec un horodatage, elle est rééchantillonnée à la fréquence d'analyse fs.
+    # Les signaux vitaux ne sont recalculés qu'une fois par intervalle (hop) ; les fenêtres rejetées par
+    # l'indice de qualité ne contribuent à aucune moyenne
+    def process_rgb(self, avg_color, t=None, motion=0.0, saturation=0.0):
+        if self.trace is not None:
+            self.trace.append((np.nan if t is None else t, *avg_color[:3], motion, saturation))
+        result = self.engine.update(avg_color, t, motion, saturation)
+        if result is None:
+            return
+        quality = result["quality"]
+        self.windows += 1
+        if not quality["ok"]:
+            self.rejected[quality["reason"]] += 1
+            return
+        if not (result["systolic"] and result["diastolic"]):
+            result["systolic"] = result["diastolic"] = None
+        for key, (avg_key, value_key) in RATE_KEYS.items():
+            if result[value_key] is None:
+                continue
+            self.signals[key].append(result[value_key])
+            self.quality_sums[avg_key] += quality["score"]
+            if self.engine.count >= self.publish_after.get(avg_key, 0):
+                self.metrics[avg_key] = round(self.signals[key].mean(), 2)
+        self.stress_level_label = result["stress"]
+        for key, value in result["hrv_stats"].items():
+            if key in self.hrv_sums and value is not None:
+                self.hrv_sums[key][0] += value
+                self.hrv_sums[key][1] += 1
+
+    # Confiance de chaque moyenne entre 0 et 1 : score de qualité moyen des fenêtres, celles qui n'ont pas produit la
+    # mesure comptant pour 0 (fenêtre rejetée, pic respiratoire non significatif, SpO2 sans signal suffisant...)
+    def confidence(self):
+        return {avg_key: round(total / self.windows, 3) if self.windows else 0.0
+                for avg_key, total in self.quality_sums.items()}
+
+    # Calculer les scores à partir des moyennes si assez de signal a été analysé
+    def compute_scores(self, age, weight, height):
+        if self.engine.count > self.min_total:
+            with self.profiler.stage("scoring"):
+                self.scores.update(score_metrics(self.metrics, age, weight, height))
+        return self.scores
+
+    # Dernières estimations sur la fenêtre glissante courante (affichage en direct, avancement des jobs)
+    def live(self):
+        last = self.engine.last or {}
+        values = {key: last.get(key) for key in ("bpm", "spo2", "respiration")}
+        return {"frames": len(self.frame_idx), "samples": self.engine.count, "stress_level": last.get("stress") or '',
+                **{key: None if value is None else round(float(value), 2) for key, value in values.items()},
+                "quality": last.get("quality")}
+
+    # Résultats sérialisables (transmissibles entre processus)
+    def results(self):
+        results = {"frames": len(self.frame_idx), "samples": self.engine.count,
+                "metrics": dict(self.metrics), "scores": dict(self.scores),
+                "stress_level": self.stress_level_label, "face_tracking": self.tracker.stats(),
+                "quality": {"windows": self.windows, "rejected": dict(self.rejected), "confidence": self.confidence()},
+                "hrv": {key: round(total / n, 2) if n else None for key, (total, n) in self.hrv_sums.items()}}
+        if self.trace is not None:
+            results["trace"] = {"samples": self.trace.view().copy(), "frames": results["frames"],
+                                "face_tracking": results["face_tracking"]}
+        results["profile"] = self.profile()
+        return results
+
+    # Instantané du profileur de la session, avec les compteurs de frames et de détection/suivi
+    def profile(self):
+        snapshot = self.profiler.snapshot()
+        stats = self.tracker.stats()
+        snapshot["counters"].update(sessions_total=1, frames_total=len(self.frame_idx),
+                                    face_detections_total=stats["detections"], face_tracked_total=stats["tracked"])
+        return snapshot
+
+# Analyse de plusieurs personnes dans une même vidéo : chaque frame n'est décodée et passée au détecteur qu'une
+# fois (MultiFaceTracker), puis chaque visage suivi alimente sa propre session rPPG, indexée par son identifiant.
+# Les visages étant plus petits quand plusieurs personnes partagent le cadre, le seuil de confiance par défaut
+# est abaissé à 2 % de la frame
+class MultiSubjectSession:
+    def __init__(self, max_subjects=None, **params):
+        params.setdefault("confidence_threshold", 2)
+        self.params = params
+        self.profiler = Profiler()  # Détection et suivi partagés ; les étapes par personne sont dans chaque session
+        self.tracker = MultiFaceTracker(max_faces=max_subjects)
+        self.subjects = {}  # identifiant -> (session, extracteur de mesures, frames où le visage est visible)
+        self.frames = 0
+
+    # Traiter une frame BGR : suivi de tous les visages, puis une mesure par personne déjà vue
+    # (None pour les personnes absentes de la frame)
+    def process_frame(self, frame, t=None):
+        self.frames += 1
+        detections, start = self.tracker.detections, time.perf_counter()
+        boxes = self.tracker.update(frame)
+        self.profiler.observe("detect" if self.tracker.detections > detections else "track", time.perf_counter() - start)
+        for subject_id in boxes:
+            if subject_id not in self.subjects:
+                session = RPPGSession(**self.params)
+                self.subjects[subject_id] = [session, session.new_sampler(), 0]
+        for subject_id, subject in self.subjects.items():
+            session, sampler, _ = subject
+            box = boxes.get(subject_id)
+            if box is None:
+                sampler.previous_box = None
+                session.process_sample(None, t)
+                continue
+            subject[2] += 1
+            session.process_sample(sampler.measure(frame, *box), t)
+
+    def compute_scores(self, age, weight, height):
+        for session, _, _ in self.subjects.values():
+            session.compute_scores(age, weight, height)
+
+    def live(self):
+        return {"frames": self.frames, "subjects": {subject_id: session.live()
+                                                    for subject_id, (session, _, _) in self.subjects.items()}}
+
+    # Résultats sérialisables : une entrée par personne (mêmes champs qu'une session, "face_tracking" donnant
+    # le nombre de frames où le visage est visible) et statistiques du tracker partagé
+    def results(self):
+        subjects = {}
+        for subject_id, (session, _, visible) in self.subjects.items():
+            results = session.results()
+            results.pop("profile")
+            results["face_tracking"] = {"frames": self.frames, "visible": visible}
+            subjects[subject_id] = results
+        return {"frames": self.frames, "subjects": subjects, "face_tracking": self.tracker.stats(),
+                "profile": self.profile()}
+
+    # Profil de la détection partagée et des sessions de chaque personne, compté comme une seule session
+    def profile(self):
+        profile = Profiler()
+        profile.merge(self.profiler.snapshot())
+        for session, _, _ in self.subjects.values():
+            profile.merge(session.profiler.snapshot())
+        snapshot = profile.snapshot()
+        stats = self.tracker.stats()
+        snapshot["counters"].update(sessions_total=1, frames_total=self.frames, subjects_total=stats["subjects"],
+                                    face_detections_total=stats["detections"], face_tracked_total=stats["tracked"])
+        return snapshot
+
+# Scores (metrics.py) calculés à partir des moyennes des signaux vitaux
+def score_metrics(metrics, age, weight, height):
+    return {"activity_score": calculate_activity(metrics["avg_bpm"], age),
+            "sleep_score": calculate_sleep(metrics["avg_hrv"], metrics["avg_respiration"]),
+            "equilibrium_score": calculate_equilibrium(metrics["avg_hrv"], metrics["avg_systolic"], metrics["avg_diastolic"]),
+            "metabolism_score": calculate_metabolism(weight, height, age),
+            "health_score": calculate_health(metrics["avg_spo2"], metrics["avg_bpm"], metrics["avg_systolic"]),
+            "relaxation_score": calculate_relaxation(metrics["avg_hrv"], metrics["avg_respiration"])}
+
+# Recalculer uniquement les scores de résultats existants (résultats en cache, autre âge/poids/taille)
+def rescore(results, age, weight, height, fs=30, min_total_sec=20, **params):
+    scores = dict.fromkeys(results["scores"], 0)
+    if results["samples"] > min_total_sec * fs:
+        scores = score_metrics(results["metrics"], age, weight, height)
+    return {**results, "scores": scores}
+
+# Initialisation des processus du pool : un seul thread OpenCV par processus pour éviter la sur-souscription
+def init_worker():
+    cv2.setNumThreads(1)
+
+# Lire les frames d'une vidéo avec leur horodatage : position dans le flux, ou index / fps si le conteneur
+# ne la fournit pas. Le décodage est chronométré dans le profileur
+def read_frames(cap, profiler, default_fps):
+    fps = cap.get(cv2.CAP_PROP_FPS) or default_fps
+    previous_t = -1
+    while True:
+        with profiler.stage("decode"):
+            ret, frame = cap.read()
+        if not ret:
+            return
+        t = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000
+        if t <= previous_t:
+            t = previous_t + 1 / fps
+        previous_t = t
+        yield frame, t
+
+# Analyser une vidéo complète dans une nouvelle session (utilisable dans un pool de processus) ;
+# avec record_trace=True, les résultats contiennent aussi la trace par frame ("trace") pour le cache.
+# progress(info) est appelé toutes les PROGRESS_EVERY frames avec les mesures en cours ; une exception
+# levée par progress interrompt l'analyse (annulation)
+def analyze_video(video_path, age, weight, height, progress=None, **params):
+    session = RPPGSession(**params)
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        return None
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    start = time.perf_counter()
+    try:
+        for frame, t in read_frames(cap, session.profiler, session.fs):
+            session.process_frame(frame, t)
+            if progress is not None and len(session.frame_idx) % PROGRESS_EVERY == 0:
+                progress({**session.live(), "total_frames": total})
+    finally:
+        cap.release()
+    session.compute_scores(age, weight, height)
+    session.profiler.observe("analysis", time.perf_counter() - start)
+    return session.results()
+
+# Même chose pour toutes les personnes visibles dans la vidéo (un seul décodage) : résultats de
+# MultiSubjectSession.results(), les scores de chaque personne utilisant l'âge, le poids et la taille donnés
+def analyze_video_subjects(video_path, age, weight, height, max_subjects=None, progress=None, **params):
+    session = MultiSubjectSession(max_subjects, **params)
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        return None
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    start = time.perf_counter()
+    try:
+        for frame, t in read_frames(cap, session.profiler, params.get("fs", 30)):
+            session.process_frame(frame, t)
+            if progress is not None and session.frames % PROGRESS_EVERY == 0:
+                progress({**session.live(), "total_frames": total})
+    finally:
+        cap.release()
+    session.compute_scores(age, weight, height)
+    session.profiler.observe("analysis", time.perf_counter() - start)
+    return session.results()
+
+# Analyser une trace RGB déjà extraite (même pipeline que la vidéo à partir de la moyenne de la ROI) ;
+# une trace horodatée est d'abord rééchantillonnée sur une grille uniforme à la fréquence d'analyse
+def analyze_trace(rgb, age, weight, height, t=None, **params):
+    session = RPPGSession(**params)
+    with session.profiler.stage("analysis"):
+        if t is not None and len(t) > 1:
+            _, rgb = resample_trace(t, rgb, session.fs)
+        for avg_color in rgb:
+            session.process_rgb(avg_color)
+        session.compute_scores(age, weight, height)
+    return session.results()
+
+# Rejouer une trace par frame mise en cache (sans décodage ni détection du visage) : mêmes résultats que la vidéo
+def replay_trace(trace, age, weight, height, **params):
+    session = RPPGSession(**params)
+    with session.profiler.stage("analysis"):
+        for t, r, g, b, motion, saturation in trace["samples"]:
+            session.process_rgb(np.array([r, g, b]), None if np.isnan(t) else t, motion, saturation)
+        session.compute_scores(age, weight, height)
+    return {**session.results(), "frames": trace["frames"], "face_tracking": trace["face_tracking"]}
+
+# Analyser une vidéo reçue en passant par le cache de résultats : résultats en cache (scores recalculés), trace en
+# cache rejouée, ou analyse complète avec `analyze`. Renvoie (statut du cache, résultats ou None). Avec `executor`
+# (pool de processus), le rejeu et l'analyse y sont exécutés ; le cache reste lu et écrit par l'appelant
+def analyze_upload(cache, video_path, content_hash, age, weight, height, analyze=analyze_video, progress=None,
+                executor=None, **params):
+    key_params = {**params, "analyzer": analyze.__name__}
+    status, results, trace = cache.lookup(content_hash, key_params)
+    if status == "hit":
+        return status, rescore(results, age, weight, height, **params)
+    if status == "trace":
+        task = partial(replay_trace, trace, age, weight, height, **params)
+    else:
+        task = partial(analyze, video_path, age, weight, height, record_trace=True, progress=progress, **params)
+    results = executor.submit(task).result() if executor is not None else task()
+    if results is not None:
+        cache.store(content_hash, key_params, results, results.pop("trace", None))
+    return status, results
+
+# Analyser dans un job (jobs.JobManager) une vidéo conservée sur disque, supprimée à la fin du job : une personne via
+# le cache de résultats, ou toutes les personnes visibles (group). format_results est la mise en forme propre à chaque
+# application ; avec `executor` (pool de processus), l'analyse y est exécutée. Renvoie l'identifiant du job
+def submit_job(job_manager, cache, video_path, content_hash, age, weight, height, format_results, group=False,
+            analyze=analyze_video, executor=None, **params):
+    def run(progress):
+        if group:
+            task = partial(analyze_video_subjects, video_path, age, weight, height, progress=progress, **params)
+            results = executor.submit(task).result() if executor is not None else task()
+        else:
+            status, results = analyze_upload(cache, video_path, content_hash, age, weight, height, analyze=analyze,
+                                            progress=progress, executor=executor, **params)
+        if results is None:
+            raise ValueError("Erreur lors du chargement de la vidéo.")
+        merge_profile(results)
+        if group:
+            return format_subjects(results, age, weight, height, format_results)
+        return {**format_results(results, age, weight, height), "cache": status}
+    return job_manager.submit(run, cleanup=lambda: os.remove(video_path))
+
+# Ajouter le profil d'une session terminée au profileur global du processus
+def merge_profile(results):
+    profile = results.pop("profile", None)
+    if profile is not None:
+        profiler.merge(profile)
+
+# Résultats de plusieurs personnes (analyze_video_subjects) : une entrée par personne, avec son identifiant, mise en
+# forme par format_results (propre à chaque application)
+def format_subjects(results, age, weight, height, format_results):
+    subjects = []
+    for subject_id, subject in results["subjects"].items():
+        formatted = format_results(subject, age, weight, height)
+        del formatted["message"]
+        subjects.append({"subject": subject_id, **formatted})
+    return {"message": "Vidéo et données reçues avec succès", "frames": results["frames"],
+            "face_tracking": results["face_tracking"], "subjects": subjects}
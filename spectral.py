@@ -0,0 +1,91 @@
+import numpy as np
+from functools import lru_cache
+from numpy.lib.stride_tricks import sliding_window_view
+from lazy import LazyModule
+
+scipy_fft = LazyModule("scipy.fft")  # Loaded on first use
+
+# Physiological bands (Hz)
+HR_BAND = (0.67, 3.33)           # 40 - 200 BPM
+RESPIRATION_BAND = (0.1, 0.5)    # 6 - 30 breaths per minute
+RESPIRATION_MIN_RATIO = 3.0      # Respiration peak power / median power of the band needed for an estimate
+RESPIRATION_MIN_SNR = 1.0        # Power near the respiration peak / rest of the band (dB) needed for an estimate
+
+# -----------------------------------------------------------------------------------------------------------------------
+# Cached workspaces shared by the Welch PSD and the windowed rPPG algorithms (vitals.chrom):
+# Hann window (and its power) per length, frequency grid per (nfft, fs)
+@lru_cache(maxsize=16)
+def hann_window(nperseg):
+    window = np.hanning(nperseg)
+    return window, np.sum(window ** 2)
+
+@lru_cache(maxsize=16)
+def frequency_grid(nfft, fs):
+    return np.fft.rfftfreq(nfft, d=1/fs)
+
+# Zero-padded FFT length giving a grid spacing of at most `resolution` Hz
+def padded_length(nperseg, fs, resolution=0.01):
+    return 1 << int(np.ceil(np.log2(max(nperseg, fs / resolution))))
+
+# -----------------------------------------------------------------------------------------------------------------------
+# Welch PSD: Hann-windowed, linearly detrended segments with 50 % overlap, zero-padded rfft
+def welch_psd(signal, fs, segment_sec=10, resolution=0.01):
+    x = np.asarray(signal, dtype=float)
+    nperseg = min(len(x), max(int(segment_sec * fs), 8))
+    step = max(nperseg // 2, 1)
+    segments = sliding_window_view(x, nperseg)[::step]
+
+    # Remove the mean and the linear trend of every segment at once
+    t = np.arange(nperseg) - (nperseg - 1) / 2
+    segments = segments - segments.mean(axis=1, keepdims=True)
+    slopes = segments @ t / np.dot(t, t)
+    segments = segments - slopes[:, None] * t
+
+    window, power = hann_window(nperseg)
+    nfft = padded_length(nperseg, fs, resolution)
+    spectrum = np.abs(scipy_fft.rfft(segments * window, n=nfft, axis=1)) ** 2
+    return frequency_grid(nfft, fs), spectrum.mean(axis=0) / (fs * power)
+
+# Frequency of the PSD maximum inside a band, refined by parabolic interpolation and kept inside the band;
+# (0, 0) if the band is empty. With min_ratio, the maximum must also be a true peak (not a band edge, where
+# leakage from a neighbouring band rises) at least min_ratio times the median power of the band. With min_snr,
+# the power within `width` Hz of the maximum must stand min_snr dB above the rest of the band (a narrow line,
+# not broadband noise that happens to peak somewhere in the band)
+def band_peak(freqs, psd, band, min_ratio=None, min_snr=None, width=0.05):
+    index = np.flatnonzero((freqs >= band[0]) & (freqs <= band[1]))
+    if len(index) == 0 or not np.any(psd[index] > 0):
+        return 0.0, 0.0
+    k = index[np.argmax(psd[index])]
+    if min_ratio is not None and (k in (index[0], index[-1]) or psd[k] < min_ratio * np.median(psd[index])):
+        return 0.0, 0.0
+    if min_snr is not None:
+        near_peak = np.abs(freqs[index] - freqs[k]) <= width
+        rest = psd[index][~near_peak].sum()
+        if rest > 0 and 10 * np.log10(psd[index][near_peak].sum() / rest) < min_snr:
+            return 0.0, 0.0
+    offset = 0.0
+    if 0 < k < len(psd) - 1:
+        a, b, c = psd[k - 1], psd[k], psd[k + 1]
+        denominator = a - 2 * b + c
+        if denominator != 0:
+            offset = float(np.clip(0.5 * (a - c) / denominator, -0.5, 0.5))
+    return float(np.clip(freqs[k] + offset * (freqs[1] - freqs[0]), band[0], band[1])), psd[k]
+
+# -----------------------------------------------------------------------------------------------------------------------
+# Heart rate and respiration rate (per minute) from one Welch spectrum of the raw (unfiltered) signal;
+# None when there is no estimate (no power in the band, or no breathing peak standing out of the band).
+# Respiration needs a full cycle at the slowest rate of the band (10 s); its SNR counts the power within half a
+# frequency bin of the (unpadded) Welch segment around the peak
+def estimate_rates(signal, fs, segment_sec=10):
+    freqs, psd = welch_psd(signal, fs, segment_sec)
+    hr_freq, hr_power = band_peak(freqs, psd, HR_BAND)
+    respiration_freq, respiration_power = 0.0, 0.0
+    if len(signal) >= fs / RESPIRATION_BAND[0]:
+        respiration_freq, respiration_power = band_peak(freqs, psd, RESPIRATION_BAND, RESPIRATION_MIN_RATIO,
+                                                        RESPIRATION_MIN_SNR, 0.5 / segment_sec)
+    return {"bpm": hr_freq * 60 if hr_freq else None, "respiration": respiration_freq * 60 if respiration_freq else None,
+            "hr_power": hr_power, "respiration_power": respiration_power, "freqs": freqs, "psd": psd}
+
+def estimate_heart_rate(signal, fs, segment_sec=10):
+    freqs, psd = welch_psd(signal, fs, segment_sec)
+    return band_peak(freqs, psd, HR_BAND)[0] * 60
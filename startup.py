@@ -0,0 +1,58 @@
+import os, time, logging, threading
+import numpy as np
+from face import FaceTracker
+from session import analyze_trace, init_worker
+
+# Démarrage d'un worker : les sous-modules lourds (SciPy) et le détecteur de visage sont chargés à la demande ;
+# le préchauffage les charge tout de suite, en arrière-plan, en analysant une frame et un signal synthétiques
+# (imports, fichier du classifieur Haar, détection OpenCV, conception des filtres et caches DSP), avant que
+# /healthz annonce le worker prêt. Le classifieur étant propre à chaque thread, celui du préchauffage ne sert
+# qu'au thread qui l'a créé : les autres créent le leur à leur première détection, à partir du fichier déjà lu.
+WARMUP = os.environ.get("RPPG_WARMUP", "1").lower() not in ("0", "false", "no")  # Préchauffage au démarrage
+WARMUP_SECONDS = 10  # Durée du signal synthétique (assez de battements pour toutes les étapes, HRV comprise)
+
+logger = logging.getLogger("rppg")
+state = {"ready": False, "warmup": WARMUP, "warmup_seconds": None, "error": None}
+started = time.monotonic()
+
+# Passer une frame synthétique dans le tracker (lecture du fichier du classifieur, classifieur du thread appelant,
+# détection) et un pouls synthétique (72 BPM) dans la chaîne d'analyse ; renvoie la durée du préchauffage (s)
+def warm_up(params=None):
+    params = {**(params or {}), "log_every": 0}
+    start = time.perf_counter()
+    rng = np.random.default_rng(0)
+    FaceTracker().update(rng.integers(0, 255, (480, 640, 3), dtype=np.uint8))
+    fs = params.get("fs", 30)
+    t = np.arange(int(WARMUP_SECONDS * fs)) / fs
+    rgb = 120 + np.outer(np.sin(2 * np.pi * 1.2 * t), (0.6, 1.0, 0.3))
+    analyze_trace(rgb, 30, 70, 175, **params)
+    return time.perf_counter() - start
+
+# Lancer le démarrage en arrière-plan : préchauffage (si RPPG_WARMUP), puis `after` (ex: lancer les processus
+# d'un pool) ; le worker n'est prêt qu'une fois les deux terminés sans erreur
+def start(params=None, after=None):
+    def run():
+        try:
+            if WARMUP:
+                state["warmup_seconds"] = round(warm_up(params), 3)
+            if after is not None:
+                after()
+            state["ready"] = True
+            logger.info("ready in %.2fs (warmup=%s)", time.monotonic() - started, WARMUP)
+        except Exception as error:
+            state["error"] = f"{type(error).__name__}: {error}"
+            logger.exception("startup failed")
+    thread = threading.Thread(target=run, name="rppg-startup", daemon=True)
+    thread.start()
+    return thread
+
+# État pour la route /healthz
+def readiness():
+    return {**state, "uptime": round(time.monotonic() - started, 3)}
+
+# Initialisation des processus d'un pool : un thread OpenCV, puis préchauffage du processus dans le thread qui
+# fera ses analyses (son classifieur est donc prêt)
+def init_pool_worker(params=None):
+    init_worker()
+    if WARMUP:
+        warm_up(params)
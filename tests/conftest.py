@@ -0,0 +1,33 @@
+import os, sys, shutil, atexit, tempfile
+import numpy as np
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))  # Vidéos synthétiques (synthetic.py)
+
+# Applications importées par les tests : un seul processus dans le pool, pas de préchauffage, cache et dossier
+# d'upload temporaires (supprimés à la fin de la session : les tests ne laissent aucun fichier dans le dépôt)
+DATA_DIR = tempfile.mkdtemp(prefix="rppg-test-")
+atexit.register(shutil.rmtree, DATA_DIR, True)
+os.environ.setdefault("RPPG_CACHE_DIR", os.path.join(DATA_DIR, "cache"))
+os.environ.setdefault("RPPG_UPLOAD_DIR", os.path.join(DATA_DIR, "uploads"))
+os.environ.setdefault("RPPG_WORKERS", "1")
+os.environ.setdefault("RPPG_WARMUP", "0")
+os.environ.setdefault("RPPG_LOG_LEVEL", "WARNING")
+os.environ.setdefault("RPPG_LOG_EVERY", "0")
+
+# Trace RGB (N, 3) d'un pouls sinusoïdal à hr_bpm, échantillonnée à fs
+def pulse_trace(seconds=30, fs=30, hr_bpm=72, amplitude=1.0, base=(150, 120, 100)):
+    t = np.arange(int(seconds * fs)) / fs
+    return np.asarray(base, dtype=float) + amplitude * np.outer(np.sin(2 * np.pi * hr_bpm / 60 * t), (0.6, 1.0, 0.3))
+
+@pytest.fixture
+def trace():
+    return pulse_trace
+
+# Vidéo synthétique de 8 s avec un visage dont le pouls est à 72 BPM, générée une fois par session de tests
+@pytest.fixture(scope="session")
+def face_video(tmp_path_factory):
+    from synthetic import make_video
+    return make_video(str(tmp_path_factory.mktemp("videos") / "face.mp4"), seconds=8)
@@ -0,0 +1,28 @@
+import csv, shutil
+import batch
+
+def read_rows(path):
+    with open(path, newline='') as journal:
+        return list(csv.DictReader(journal))
+
+# Reprise : les vidéos traitées avec succès sont sautées, les vidéos en erreur sont retraitées (une ligne chacune)
+def test_resume_retries_failed_videos(tmp_path, face_video, capsys):
+    shutil.copy(face_video, tmp_path / "ok.mp4")
+    manifest = tmp_path / "manifest.csv"
+    manifest.write_text("path\nok.mp4\nbroken.mp4\n")
+    output = str(tmp_path / "results.csv")
+    assert batch.main([str(manifest), "-o", output, "--workers", "1"]) == 0
+    rows = {row["path"].rsplit("/", 1)[-1]: row for row in read_rows(output)}
+    assert not rows["ok.mp4"]["error"] and rows["broken.mp4"]["error"]
+
+    (tmp_path / "broken.mp4").write_bytes(b"")  # Toujours illisible : retraitée, toujours en erreur
+    capsys.readouterr()
+    assert batch.main([str(manifest), "-o", output, "--workers", "1"]) == 0
+    assert "1 déjà traitées, 1 à traiter" in capsys.readouterr().out
+    paths = [row["path"].rsplit("/", 1)[-1] for row in read_rows(output)]
+    assert sorted(paths) == ["broken.mp4", "ok.mp4"]
+
+def test_completed_paths_ignores_errors(tmp_path):
+    journal = tmp_path / "results.csv"
+    journal.write_text("path,error\na.mp4,\nb.mp4,ValueError: x\n")
+    assert batch.completed_paths(str(journal), str(journal)) == {"a.mp4"}
@@ -0,0 +1,44 @@
+import os
+from cache import ResultCache
+from pipeline import analyze_video_pipelined
+from session import analyze_upload, analyze_video
+
+PARAMS = dict(fs=30, min_total_sec=5, log_every=0)
+
+# Premier envoi : analyse complète ; deuxième envoi : résultats en cache, scores recalculés avec le nouveau profil
+def test_miss_then_hit(tmp_path, face_video):
+    cache = ResultCache(folder=str(tmp_path))
+    status, first = analyze_upload(cache, face_video, "video", 30, 70, 175, **PARAMS)
+    assert status == "miss" and first["metrics"]["avg_bpm"] > 0
+    status, second = analyze_upload(cache, face_video, "video", 60, 90, 160, **PARAMS)
+    assert status == "hit"
+    assert second["metrics"] == first["metrics"]
+    assert second["scores"]["metabolism_score"] != first["scores"]["metabolism_score"]
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+# Résultats supprimés : la trace en cache est rejouée sans décoder la vidéo
+def test_trace_replay(tmp_path, face_video):
+    cache = ResultCache(folder=str(tmp_path))
+    _, first = analyze_upload(cache, face_video, "video", 30, 70, 175, **PARAMS)
+    for name in os.listdir(tmp_path):
+        if name.endswith(".json"):
+            os.remove(tmp_path / name)
+    status, replayed = analyze_upload(cache, "absente.mp4", "video", 30, 70, 175, **PARAMS)
+    assert status == "trace"
+    assert replayed["metrics"] == first["metrics"]
+
+# Analyse séquentielle et pipeline ont des entrées distinctes
+def test_analyzer_is_part_of_the_key(tmp_path, face_video):
+    cache = ResultCache(folder=str(tmp_path))
+    analyze_upload(cache, face_video, "video", 30, 70, 175, analyze=analyze_video, **PARAMS)
+    status, _ = analyze_upload(cache, face_video, "video", 30, 70, 175, analyze=analyze_video_pipelined, **PARAMS)
+    assert status == "miss"
+    status, _ = analyze_upload(cache, face_video, "video", 30, 70, 175, analyze=analyze_video_pipelined, **PARAMS)
+    assert status == "hit"
+
+def test_eviction_keeps_the_cache_under_its_size(tmp_path):
+    cache = ResultCache(folder=str(tmp_path), max_bytes=1000)
+    for i in range(5):
+        cache.store(f"video{i}", PARAMS, {"metrics": {"avg_bpm": 72}, "scores": {"activity_score": 1}, "pad": "x" * 400})
+    assert sum(entry.stat().st_size for entry in os.scandir(tmp_path)) <= 1000
+    assert cache.evictions >= 3
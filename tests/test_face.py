@@ -0,0 +1,42 @@
+import numpy as np
+from face import FACE_REGIONS, FaceTracker, face_detector, roi_means
+
+def test_roi_means_matches_numpy_rgb_mean():
+    frame = np.random.default_rng(0).integers(0, 255, (120, 160, 3), dtype=np.uint8)
+    means = roi_means(frame, 20, 10, 60, 50)
+    expected = frame[10:60, 20:80].reshape(-1, 3).mean(axis=0)[::-1]  # BGR -> RGB
+    assert np.allclose(means, expected)
+
+def test_roi_means_per_region():
+    frame = np.zeros((100, 100, 3), np.uint8)
+    frame[..., 1] = 200
+    means = roi_means(frame, 0, 0, 100, 100, FACE_REGIONS)
+    assert set(means) == set(FACE_REGIONS)
+    assert all(np.allclose(value, (0, 200, 0)) for value in means.values())
+
+# Aucun pixel de peau : moyenne NaN (frame ignorée par la session)
+def test_roi_means_without_skin_pixels_is_nan():
+    frame = np.zeros((50, 50, 3), np.uint8)
+    assert np.isnan(roi_means(frame, 0, 0, 50, 50, skin=True)).all()
+
+# Un classifieur par thread, réutilisé dans le thread qui l'a créé
+def test_face_detector_is_per_thread():
+    from concurrent.futures import ThreadPoolExecutor
+    assert face_detector() is face_detector()
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        other = pool.submit(face_detector).result()
+    assert other is not face_detector()
+    assert not other.empty()
+
+# Tracker créé dans un thread et utilisé dans un autre (étage de suivi du pipeline) : classifieur du thread appelant
+def test_tracker_uses_the_detector_of_the_calling_thread(face_video):
+    import cv2
+    from concurrent.futures import ThreadPoolExecutor
+    cap = cv2.VideoCapture(face_video)
+    frame = cap.read()[1]
+    cap.release()
+    tracker = FaceTracker()
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        roi, x, y, w, h = pool.submit(tracker.update, frame).result()
+    assert roi is not None and w > 0 and h > 0
+    assert tracker.detections == 1
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+from hrv import RRSeries, rr_statistics
+from session import analyze_trace
+
+def test_rr_statistics_of_regular_beats():
+    stats = rr_statistics([0.8] * 10)
+    assert stats["mean_rr"] == pytest.approx(800) and stats["sdnn"] == pytest.approx(0) and stats["rmssd"] == pytest.approx(0)
+
+# Séries incrémentales : mêmes statistiques que le calcul complet sur les battements de la fenêtre
+def test_incremental_series_matches_full_statistics():
+    rng = np.random.default_rng(0)
+    beats = np.cumsum(rng.normal(25, 2, 200)).astype(int)
+    series = RRSeries(30, window_sec=20)
+    for end in range(600, beats[-1], 30):
+        stats = series.update(beats[beats < end] - (end - 600), end)
+    expected = rr_statistics(np.diff(series.peaks) / 30)
+    for key in ("mean_rr", "sdnn", "rmssd", "pnn50"):
+        assert stats[key] == pytest.approx(expected[key])
+
+def test_peaks_before_settle_are_ignored():
+    series = RRSeries(30, settle=90)
+    series.update(np.array([19, 44, 94, 119, 144]), 300)
+    assert series.peaks[0] >= 90
+
+# Sinusoïde propre : intervalles constants, donc HRV quasi nulle, y compris quand la période n'est pas un nombre
+# entier d'échantillons (pics affinés entre deux échantillons ; auparavant RMSSD 24 ms à 66 BPM et 33 ms à 80 BPM
+# à 30 Hz, jusqu'à 67 ms et pNN50 100 % à 15 Hz). Pas de battements du transitoire du filtre ni du bord de la
+# dernière fenêtre de projection CHROM/POS
+@pytest.mark.parametrize("fs", [30, 15])
+@pytest.mark.parametrize("method", ["green", "chrom", "pos"])
+@pytest.mark.parametrize("hr_bpm", [66, 72, 75, 80, 90])
+def test_clean_sine_has_no_heart_rate_variability(trace, fs, method, hr_bpm):
+    results = analyze_trace(trace(seconds=30, fs=fs, hr_bpm=hr_bpm), 30, 70, 175, fs=fs, method=method)
+    assert results["metrics"]["avg_bpm"] == pytest.approx(hr_bpm, abs=1)
+    assert results["metrics"]["avg_hrv"] == pytest.approx(0, abs=4)
+    assert results["hrv"]["rmssd"] < 8 and results["hrv"]["pnn50"] == 0
+    assert results["hrv"]["mean_rr"] == pytest.approx(60000 / hr_bpm, rel=0.01)
+
+# Tachogramme plat : pas de rapport LF/HF (auparavant 4.29, calculé sur les erreurs d'arrondi)
+def test_flat_series_has_no_lf_hf():
+    stats = rr_statistics([0.8333333333] * 20)
+    assert stats["sdnn"] == pytest.approx(0, abs=1e-6)
+    assert stats["lf_hf"] is None and stats["lf_nu"] is None and stats["hf_nu"] is None
@@ -0,0 +1,59 @@
+import io, json, hashlib
+import numpy as np
+import pytest
+from ingest import UploadTooLarge, parse_sample, parse_trace, spooled_upload
+
+def json_trace(**fields):
+    return json.dumps({"age": 30, "weight": 70, "height": 175, **fields}).encode()
+
+def test_parse_json_trace_with_fps():
+    trace = parse_trace(json_trace(rgb=[[1, 2, 3]] * 4, fps=2), "application/json", {})
+    assert trace["rgb"].shape == (4, 3)
+    assert trace["t"].tolist() == [0, 0.5, 1, 1.5]
+
+def test_parse_binary_trace():
+    rows = np.array([[0, 1, 2, 3], [0.1, 4, 5, 6]], dtype="<f4")
+    trace = parse_trace(rows.tobytes(), "application/octet-stream", {"age": "30", "weight": "70", "height": "175"})
+    assert trace["rgb"].tolist() == [[1, 2, 3], [4, 5, 6]]
+
+# NaN / Infinity dans le JSON, ou NaN dans la trace binaire : ValueError (400), pas une erreur dans le DSP
+@pytest.mark.parametrize("body", ['{"age": 30, "weight": 70, "height": 175, "rgb": [[1, 2, NaN], [1, 2, 3]]}',
+                                '{"age": 30, "weight": 70, "height": 175, "rgb": [[1, 2, 3], [1, 2, 3]], "t": [0, Infinity]}'])
+def test_parse_trace_rejects_non_finite_json(body):
+    with pytest.raises(ValueError):
+        parse_trace(body.encode(), "application/json", {})
+
+def test_parse_trace_rejects_non_finite_binary():
+    rows = np.array([[0, 1, 2, 3], [np.nan, 4, 5, 6]], dtype="<f4")
+    with pytest.raises(ValueError):
+        parse_trace(rows.tobytes(), "application/octet-stream", {"age": "30", "weight": "70", "height": "175"})
+
+def test_parse_trace_requires_parameters():
+    with pytest.raises(ValueError):
+        parse_trace(json.dumps({"rgb": [[1, 2, 3]]}).encode(), "application/json", {})
+
+# Vidéo trop volumineuse : UploadTooLarge et fichier temporaire supprimé
+def test_spooled_upload_size_guard(tmp_path):
+    with pytest.raises(UploadTooLarge):
+        with spooled_upload(io.BytesIO(b"x" * 100), str(tmp_path), "clip.mp4", max_bytes=50, chunk_size=16):
+            pass
+    assert list(tmp_path.iterdir()) == []
+
+def test_spooled_upload_hashes_content(tmp_path):
+    with spooled_upload(io.BytesIO(b"video"), str(tmp_path), "clip.mp4") as (path, content_hash):
+        assert path.endswith(".mp4") and open(path, "rb").read() == b"video"
+    assert content_hash == hashlib.sha256(b"video").hexdigest()
+    assert list(tmp_path.iterdir()) == []
+
+@pytest.mark.parametrize("data", [{"rgb": [float("nan"), 1, 2]}, {"rgb": [1, 2]}, {}, [1, 2, 3], {"rgb": [1, 2, 3], "t": "x"},
+                                  {"rgb": [1, 2, 3], "t": float("inf")}])
+def test_parse_sample_rejects_invalid_samples(data):
+    with pytest.raises(ValueError):
+        parse_sample(data, 0.0)
+
+def test_parse_sample_requires_increasing_timestamps():
+    rgb, t = parse_sample({"rgb": [1, 2, 3]}, 0.5)
+    assert rgb.tolist() == [1, 2, 3] and t == 0.5
+    assert parse_sample({"rgb": [1, 2, 3], "t": 0.6}, 9.0, previous_t=t)[1] == 0.6
+    with pytest.raises(ValueError):
+        parse_sample({"rgb": [1, 2, 3], "t": 0.5}, 9.0, previous_t=t)
@@ -0,0 +1,54 @@
+import time
+import pytest
+from concurrent.futures import ProcessPoolExecutor
+from jobs import JobCancelled, JobManager, JobProgress, MemoryJobStore, make_store
+
+def wait(manager, job_id, timeout=30):
+    deadline = time.time() + timeout
+    while manager.get(job_id)["status"] in ("queued", "running"):
+        assert time.time() < deadline
+        time.sleep(0.02)
+    return manager.get(job_id)
+
+def test_job_lifecycle():
+    manager = JobManager(MemoryJobStore())
+    def run(progress):
+        progress({"frames": 30})
+        return {"avg_bpm": 72}
+    job = wait(manager, manager.submit(run))
+    assert job["status"] == "done" and job["result"] == {"avg_bpm": 72} and job["progress"] == {"frames": 30}
+
+def test_failed_job_reports_the_error():
+    manager = JobManager(MemoryJobStore())
+    def run(progress):
+        raise ValueError("vidéo illisible")
+    job = wait(manager, manager.submit(run))
+    assert job["status"] == "failed" and "vidéo illisible" in job["error"]
+
+def test_cancelled_job_stops_at_the_next_progress_update():
+    manager = JobManager(MemoryJobStore())
+    def run(progress):
+        while True:
+            progress({"frames": 0})
+            time.sleep(0.01)
+    job_id = manager.submit(run)
+    while manager.get(job_id)["status"] != "running":
+        time.sleep(0.01)
+    assert manager.cancel(job_id)["cancel_requested"]
+    assert wait(manager, job_id)["status"] == "cancelled"
+
+# Analyse factice dans un processus du pool : avancement et annulation passent par le store partagé
+def report(progress, steps):
+    for frames in range(steps):
+        progress({"frames": frames})
+    return steps
+
+def test_shared_store_reaches_pool_processes():
+    store = make_store(url="", shared=True)
+    store.create("job", {"progress": None})
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        assert pool.submit(report, JobProgress(store, "job"), 3).result() == 3
+        assert store.get("job")["progress"] == {"frames": 2}
+        store.cancel("job")
+        with pytest.raises(JobCancelled):
+            pool.submit(report, JobProgress(store, "job"), 3).result()
@@ -0,0 +1,13 @@
+import sys
+from lazy import LazyModule
+
+def test_module_is_imported_on_first_attribute_access():
+    sys.modules.pop("colorsys", None)
+    module = LazyModule("colorsys")
+    assert not module.loaded and "colorsys" not in sys.modules
+    assert module.rgb_to_hsv(1, 0, 0) == (0, 1, 1)
+    assert module.loaded and "rgb_to_hsv" in vars(module)  # Attribut gardé sur l'objet
+
+def test_private_attributes_do_not_trigger_the_import():
+    module = LazyModule("colorsys")
+    assert not hasattr(module, "__wrapped__") and not module.loaded
@@ -0,0 +1,48 @@
+import os, time
+import pytest
+
+@pytest.fixture(scope="module")
+def client():
+    import main
+    return main.app.test_client()
+
+def test_upload_trace_rejects_nan(client):
+    response = client.post("/upload_trace", data='{"age": 30, "weight": 70, "height": 175, "rgb": [[1, 2, NaN]]}',
+                        content_type="application/json")
+    assert response.status_code == 400
+
+def test_upload_flat_trace_returns_no_heart_rate(client):
+    response = client.post("/upload_trace", json={"age": 30, "weight": 70, "height": 175, "fps": 30, "rgb": [[120, 120, 120]] * 900})
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["evaluation_HR"] == 0 and data["evaluation_HRV"] == 0 and data["evaluation_systolic"] == 0
+    assert data["sleep_score"] == 0 and data["equilibrium_score"] == 0
+    assert set(data["quality"]["confidence"].values()) == {0}
+
+# Attendre la suppression des vidéos conservées pour les jobs (faite juste après la fin du job)
+def wait_for_cleanup():
+    import main
+    deadline = time.time() + 10
+    while os.listdir(main.UPLOAD_FOLDER):
+        assert time.time() < deadline, os.listdir(main.UPLOAD_FOLDER)
+        time.sleep(0.05)
+
+def test_background_job_returns_results(client, face_video):
+    with open(face_video, "rb") as video:
+        response = client.post("/upload_video", data={"age": 30, "weight": 70, "height": 175, "async": "true",
+                                                     "video": (video, "face.mp4")}, content_type="multipart/form-data")
+    assert response.status_code == 202
+    status_url = response.get_json()["status_url"]
+    deadline = time.time() + 60
+    while (job := client.get(status_url).get_json())["status"] in ("queued", "running"):
+        assert time.time() < deadline
+        time.sleep(0.05)
+    assert job["status"] == "done", job["error"]
+    assert job["result"]["face_tracking"]["frames"] > 0
+    wait_for_cleanup()
+
+def test_metrics_exposes_stage_latencies(client, trace):
+    client.post("/upload_trace", json={"age": 30, "weight": 70, "height": 175, "fps": 30, "rgb": trace(seconds=10).tolist()})
+    text = client.get("/metrics").get_data(as_text=True)
+    assert 'rppg_stage_seconds_count{stage="spectrum"}' in text
+    assert "rppg_cache_misses_total" in text
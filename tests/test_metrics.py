@@ -0,0 +1,33 @@
+import warnings
+import numpy as np
+import pytest
+from metrics import SCORE_KEYS, calculate_activity, calculate_health, calculate_relaxation, score_table
+
+TABLE = {"avg_bpm": [72, 60, np.nan], "avg_hrv": [40, 55, 30], "avg_spo2": [97, 98, 96], "avg_respiration": [15, 6, 12],
+         "avg_systolic": [120, 115, 0], "avg_diastolic": [80, 75, 0], "age": [30, 45, 60], "weight": [70, 80, 60],
+         "height": [175, 180, 165]}
+
+# Table vectorisée : mêmes scores que l'interface scalaire, ligne par ligne
+def test_score_table_matches_scalar_scores():
+    scores = score_table(TABLE)
+    assert set(scores) == set(SCORE_KEYS)
+    assert scores["activity_score"][0] == calculate_activity(72, 30)
+    assert scores["health_score"][1] == calculate_health(98, 60, 115)
+    assert scores["relaxation_score"][0] == calculate_relaxation(40, 15)
+
+# Valeurs manquantes : NaN sans avertissement dans la table, 0 dans l'interface scalaire
+def test_missing_values_give_nan_without_warnings():
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        scores = score_table(TABLE)
+    assert np.isnan(scores["activity_score"][2])
+    assert scores["health_score"][2] == 0  # Pression nulle (non mesurée)
+    assert scores["relaxation_score"][1] == 0  # Respiration trop lente
+    assert calculate_activity(None, 30) == 0
+
+def test_scores_are_bounded():
+    scores = score_table({**TABLE, "avg_bpm": [400, 10, 72], "avg_hrv": [500, 0, 40]})
+    for values in scores.values():
+        values = values[~np.isnan(values)]
+        assert ((values >= 0) & (values <= 5)).all()
+    assert calculate_activity(400, 30) == pytest.approx(5)
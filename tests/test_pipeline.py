@@ -0,0 +1,22 @@
+import pytest
+from pipeline import analyze_video_pipelined
+from session import analyze_video
+
+# Un seul tracker pour toute la vidéo : mêmes boîtes, même mouvement, donc mêmes résultats que l'analyse séquentielle
+def test_pipeline_matches_sequential_analysis(face_video):
+    sequential = analyze_video(face_video, 30, 70, 175, fs=30, min_total_sec=5)
+    pipelined = analyze_video_pipelined(face_video, 30, 70, 175, fs=30, min_total_sec=5)
+    assert pipelined["metrics"] == sequential["metrics"]
+    assert pipelined["hrv"] == sequential["hrv"]
+    assert pipelined["face_tracking"] == sequential["face_tracking"]
+    assert pipelined["quality"] == sequential["quality"]
+
+def test_unreadable_video_returns_none(tmp_path):
+    assert analyze_video_pipelined(str(tmp_path / "absente.mp4"), 30, 70, 175) is None
+
+# Erreur dans l'étage d'analyse (ici le suivi d'avancement) : propagée sans bloquer les étages amont
+def test_analysis_error_stops_the_pipeline(face_video):
+    def progress(info):
+        raise RuntimeError("arrêt")
+    with pytest.raises(RuntimeError, match="arrêt"):
+        analyze_video_pipelined(face_video, 30, 70, 175, progress=progress, fs=30)
@@ -0,0 +1,26 @@
+from profiling import BUCKETS, Profiler
+
+def test_stage_durations_and_counters_are_rendered():
+    profiler = Profiler()
+    with profiler.stage("decode"):
+        pass
+    profiler.observe("analysis", 2.0)
+    profiler.count("frames_total", 60)
+    text = profiler.render(extra={"cache_hits_total": 3})
+    assert 'rppg_stage_seconds_count{stage="decode"} 1' in text
+    assert 'rppg_stage_seconds_bucket{stage="analysis",le="+Inf"} 1' in text
+    assert "rppg_frames_total 60" in text and "rppg_cache_hits_total 3" in text
+    assert "rppg_frames_per_second 30.000" in text
+
+# Instantané d'un profileur de session (transmissible entre processus) fusionné dans le profileur global
+def test_merge_adds_histograms_and_counters():
+    session, total = Profiler(), Profiler()
+    session.observe("detect", 0.003)
+    session.count("windows_total", 2)
+    total.observe("detect", 0.02)
+    total.merge(session.snapshot())
+    total.merge(session.snapshot())
+    histogram = total.snapshot()["histograms"]["detect"]
+    assert histogram["count"] == 3 and sum(histogram["buckets"]) == 3
+    assert len(histogram["buckets"]) == len(BUCKETS) + 1
+    assert total.counters["windows_total"] == 4
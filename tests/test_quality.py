@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+from quality import QualityGate, spectral_snr
+from session import analyze_trace
+
+def test_snr_of_a_clean_pulse_passes_the_gate():
+    freqs = np.linspace(0, 5, 501)
+    psd = np.exp(-((freqs - 1.2) / 0.05) ** 2) + 1e-3
+    snr = spectral_snr(freqs, psd, 1.2)
+    assert snr > 10
+    assert QualityGate().assess({"motion": 0.0, "saturation": 0.0}, snr)["ok"]
+
+# Spectre nul dans la bande ou pas de fréquence cardiaque : pas de SNR, fenêtre rejetée
+def test_zero_in_band_power_is_rejected():
+    freqs = np.linspace(0, 5, 501)
+    assert spectral_snr(freqs, np.zeros(501), 1.2) is None
+    assert spectral_snr(freqs, np.ones(501), 0.0) is None
+    quality = QualityGate().assess({"motion": 0.0, "saturation": 0.0}, None)
+    assert not quality["ok"] and quality["reason"] == "snr"
+
+def test_precheck_rejects_motion_and_saturation():
+    gate = QualityGate()
+    assert gate.precheck(0.2, 0.0)["reason"] == "motion"
+    assert gate.precheck(0.0, 0.5)["reason"] == "saturation"
+
+# Trace constante (ou nulle) : aucune fenêtre acceptée, aucune mesure ; seul le score métabolique
+# (âge, poids, taille) reste calculé
+@pytest.mark.parametrize("value", [0.0, 120.0])
+def test_flat_trace_gives_no_measurement(value):
+    results = analyze_trace(np.full((900, 3), value), 30, 70, 175, fs=30)
+    assert results["quality"]["windows"] > 0
+    assert results["quality"]["rejected"]["snr"] == results["quality"]["windows"]
+    assert all(confidence == 0.0 for confidence in results["quality"]["confidence"].values())
+    assert all(value == 0 for value in results["metrics"].values())
+    assert all(score == 0 for name, score in results["scores"].items() if name != "metabolism_score")
+    assert results["stress_level"] == ''
+
+# Confiance par mesure : un pouls propre sans respiration donne un HR fiable mais aucune respiration
+def test_confidence_is_reported_per_metric(trace):
+    confidence = analyze_trace(trace(seconds=30), 30, 70, 175, fs=30)["quality"]["confidence"]
+    assert 0.5 < confidence["avg_bpm"] <= 1
+    assert confidence["avg_respiration"] == 0.0
+    assert all(0 <= value <= confidence["avg_bpm"] for value in confidence.values())
+
+def test_respiration_confidence_follows_the_breathing_peak(trace):
+    t = np.arange(30 * 30) / 30
+    breathing = trace(seconds=30) + 2 * np.outer(np.sin(2 * np.pi * 0.25 * t), (1, 1, 1))
+    confidence = analyze_trace(breathing, 30, 70, 175, fs=30)["quality"]["confidence"]
+    assert 0 < confidence["avg_respiration"] <= confidence["avg_bpm"]
@@ -0,0 +1,28 @@
+from session import RPPGSession, analyze_trace, rescore
+
+# Seuils exprimés en secondes : 25 s de trace capturée à 30 images/s et analysée à 15 Hz suffisent
+# (500 frames à 30 images/s = 16.7 s avant de publier la FC, 20 s avant les scores)
+def test_gates_are_in_seconds_of_signal(trace):
+    rgb = trace(seconds=25, fs=30)
+    session = RPPGSession(fs=15, min_samples=28, min_total_sec=20, min_seconds={"avg_bpm": 500 / 30, "avg_hrv": 510 / 30})
+    for i, sample in enumerate(rgb):
+        session.process_rgb(sample, i / 30)
+    assert session.engine.count < 500  # Moins d'échantillons que l'ancien seuil en frames
+    assert abs(session.metrics["avg_bpm"] - 72) < 2
+    assert session.compute_scores(30, 70, 175)["activity_score"] > 0
+
+def test_scores_wait_for_min_total_sec(trace):
+    results = analyze_trace(trace(seconds=15), 30, 70, 175, fs=30, min_total_sec=20)
+    assert results["metrics"]["avg_bpm"] > 0
+    assert all(score == 0 for score in results["scores"].values())
+    assert rescore(results, 30, 70, 175, fs=30, min_total_sec=10)["scores"]["activity_score"] > 0
+    assert rescore(results, 30, 70, 175, fs=30, min_total_sec=20)["scores"]["activity_score"] == 0
+
+# Sessions analysées en parallèle : aucun état partagé, chaque requête garde sa propre fréquence cardiaque
+def test_concurrent_sessions_do_not_share_state(trace):
+    from concurrent.futures import ThreadPoolExecutor
+    rates = [60, 72, 90, 108]
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lambda hr: analyze_trace(trace(seconds=25, hr_bpm=hr), 30, 70, 175, fs=30), rates))
+    for hr, result in zip(rates, results):
+        assert abs(result["metrics"]["avg_bpm"] - hr) < 2
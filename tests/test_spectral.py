@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from session import analyze_video
+from spectral import HR_BAND, RESPIRATION_BAND, band_peak, estimate_rates
+from synthetic import make_video
+
+FS = 30
+T = np.arange(20 * FS) / FS
+
+def test_heart_rate_of_a_sine():
+    assert abs(estimate_rates(120 + np.sin(2 * np.pi * 1.2 * T), FS)["bpm"] - 72) < 0.5
+
+def test_respiration_rate_of_a_breathing_component():
+    signal = 120 + np.sin(2 * np.pi * 1.2 * T) + 2 * np.sin(2 * np.pi * 0.25 * T)
+    assert abs(estimate_rates(signal, FS)["respiration"] - 15) < 1
+
+# Pouls seul, sans respiration : pas d'estimation (auparavant 5.93 respirations/min, sous la bande)
+def test_no_respiration_without_breathing():
+    assert estimate_rates(120 + np.sin(2 * np.pi * 1.2 * T), FS)["respiration"] is None
+    noise = 120 + np.random.default_rng(0).standard_normal(len(T))
+    assert estimate_rates(noise, FS)["respiration"] is None
+
+# Moins d'un cycle à la fréquence respiratoire la plus lente (10 s) : pas d'estimation
+def test_no_respiration_on_a_short_window():
+    short = T[:8 * FS]
+    assert estimate_rates(120 + 2 * np.sin(2 * np.pi * 0.25 * short), FS)["respiration"] is None
+
+# Vidéo sans respiration : aucune estimation en direct ni en moyenne (auparavant 8.13/min à 30 fps)
+@pytest.mark.parametrize("breathing_bpm", [0, 15])
+def test_respiration_of_a_video(tmp_path, breathing_bpm):
+    path = make_video(str(tmp_path / "clip.mp4"), seconds=20, size=(320, 240), breathing_bpm=breathing_bpm)
+    live = []
+    results = analyze_video(path, 30, 70, 175, progress=live.append, fs=30)
+    if breathing_bpm:
+        assert results["metrics"]["avg_respiration"] == pytest.approx(breathing_bpm, abs=1)
+    else:
+        assert all(info["respiration"] is None for info in live)
+        assert results["metrics"]["avg_respiration"] == 0  # Moyenne jamais publiée
+        assert results["metrics"]["avg_bpm"] == pytest.approx(72, abs=2)
+
+# L'interpolation parabolique ne sort pas de la bande
+def test_band_peak_is_clamped_to_the_band():
+    freqs = np.arange(0, 1, 0.1)
+    psd = np.array([0, 8.5, 9, 5, 4, 3, 2, 1, 0.5, 0.2])  # Maximum sur le premier point de la bande, voisin gauche plus fort
+    freq, _ = band_peak(freqs, psd, (0.2, 0.6))
+    assert 0.2 <= freq <= 0.6
+    assert band_peak(freqs, psd, (0.2, 0.6), min_ratio=3.0) == (0.0, 0.0)  # Bord de bande : pas un vrai pic
+
+def test_empty_or_flat_band():
+    freqs = np.linspace(0, 5, 100)
+    assert band_peak(freqs, np.zeros(100), HR_BAND) == (0.0, 0.0)
+    assert band_peak(freqs, np.ones(100), (6, 7)) == (0.0, 0.0)
+    assert band_peak(freqs, np.ones(100), RESPIRATION_BAND, min_ratio=3.0) == (0.0, 0.0)
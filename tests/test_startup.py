@@ -0,0 +1,23 @@
+import threading
+import face, startup
+from face import cascade_data
+
+# Le préchauffage passe une frame dans la détection : fichier du classifieur lu, classifieur créé pour ce thread
+def test_warm_up_runs_a_frame_through_the_detector():
+    def run():
+        cascade_data.cache_clear()
+        assert startup.warm_up({"fs": 30}) > 0
+        result.append((cascade_data.cache_info().currsize, getattr(face._local, "cascade", None)))
+    result = []
+    thread = threading.Thread(target=run)  # Thread neuf : aucun classifieur créé auparavant
+    thread.start()
+    thread.join()
+    assert result[0][0] == 1 and result[0][1] is not None
+    assert "<cascade" in cascade_data()
+
+def test_startup_runs_after_hook_then_reports_ready():
+    calls = []
+    startup.start({"fs": 30}, after=lambda: calls.append(True)).join(timeout=60)
+    assert calls == [True]
+    status = startup.readiness()
+    assert status["ready"] and status["error"] is None and status["uptime"] > 0
@@ -0,0 +1,31 @@
+import pytest
+from session import analyze_video_subjects, format_subjects
+
+# Deux personnes dans la même vidéo : un identifiant stable chacune et la fréquence cardiaque de chacune
+def test_each_subject_gets_its_own_heart_rate(tmp_path):
+    from synthetic import make_group_video
+    video_path = make_group_video(str(tmp_path / "groupe.mp4"), [{"center": (240, 240), "hr_bpm": 66},
+                                                                 {"center": (720, 240), "hr_bpm": 90}], seconds=20)
+    results = analyze_video_subjects(video_path, 30, 70, 175, fs=30, min_total_sec=5)
+    assert results["frames"] == 600 and results["face_tracking"]["subjects"] == 2
+    subjects = sorted(results["subjects"].values(), key=lambda subject: subject["metrics"]["avg_bpm"])
+    assert [subject["face_tracking"]["visible"] for subject in subjects] == [600, 600]
+    assert subjects[0]["metrics"]["avg_bpm"] == pytest.approx(66, abs=5)
+    assert subjects[1]["metrics"]["avg_bpm"] == pytest.approx(90, abs=2)
+
+def test_max_subjects_keeps_the_largest_faces(tmp_path):
+    from synthetic import make_group_video
+    video_path = make_group_video(str(tmp_path / "groupe.mp4"), [{"center": (240, 240), "hr_bpm": 66, "size": 70},
+                                                                 {"center": (720, 240), "hr_bpm": 90, "size": 110}], seconds=3)
+    results = analyze_video_subjects(video_path, 30, 70, 175, max_subjects=1, fs=30)
+    assert len(results["subjects"]) == 1
+
+# Mise en forme commune aux deux applications : format_results de l'application pour chaque personne, sans son message
+def test_format_subjects_uses_the_app_formatter():
+    results = {"frames": 90, "face_tracking": {"subjects": 2},
+               "subjects": {0: {"metrics": {"avg_bpm": 66}}, 1: {"metrics": {"avg_bpm": 90}}}}
+    def format_results(subject, age, weight, height):
+        return {"message": "ok", "age": age, "HR": subject["metrics"]["avg_bpm"]}
+    formatted = format_subjects(results, 30, 70, 175, format_results)
+    assert formatted["frames"] == 90 and formatted["face_tracking"] == {"subjects": 2}
+    assert formatted["subjects"] == [{"subject": 0, "age": 30, "HR": 66}, {"subject": 1, "age": 30, "HR": 90}]
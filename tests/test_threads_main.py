@@ -0,0 +1,93 @@
+import os, time
+import cv2
+import pytest
+from fastapi.testclient import TestClient
+
+@pytest.fixture(scope="module")
+def client():
+    import threads_main
+    with TestClient(threads_main.app) as client:
+        yield client
+
+# Frames JPEG et moyennes RGB du flux temps réel : toutes traitées (hors de la boucle d'événements)
+def test_stream_processes_jpeg_frames_and_rgb(client, face_video, trace):
+    cap = cv2.VideoCapture(face_video)
+    frames = [cv2.imencode(".jpg", cap.read()[1])[1].tobytes() for _ in range(20)]
+    cap.release()
+    with client.websocket_connect("/ws/stream") as websocket:
+        websocket.send_json({"age": 30, "weight": 70, "height": 175, "fps": 30})
+        for data in frames:
+            websocket.send_bytes(data)
+        for i, rgb in enumerate(trace(seconds=2)):
+            websocket.send_json({"rgb": rgb.tolist(), "t": 1 + i / 30})
+        websocket.send_json({"type": "end"})
+        message = websocket.receive_json()
+        while message["type"] == "update":
+            message = websocket.receive_json()
+    assert message["type"] == "final"
+    assert message["face_tracking"]["frames"] == len(frames)
+    assert message["face_tracking"]["detections"] >= 1
+
+# Messages invalides (NaN, taille, clé manquante, horodatage non croissant, JSON) : signalés sans fermer le flux
+def test_stream_reports_invalid_samples_and_keeps_going(client, trace):
+    invalid = ['{"rgb": [NaN, NaN, NaN]}', '{"rgb": [1, 2]}', '{"t": 1}', '{"rgb": [1, 2, 3], "t": 0.5}', 'pas du json']
+    with client.websocket_connect("/ws/stream") as websocket:
+        websocket.send_json({"age": 30, "weight": 70, "height": 175, "fps": 30})
+        websocket.send_json({"rgb": [150, 120, 100], "t": 1.0})
+        for text in invalid:
+            websocket.send_text(text)
+        for i, rgb in enumerate(trace(seconds=2)):
+            websocket.send_json({"rgb": rgb.tolist(), "t": 2 + i / 30})
+        websocket.send_json({"type": "end"})
+        messages = [websocket.receive_json()]
+        while messages[-1]["type"] != "final":
+            messages.append(websocket.receive_json())
+    assert sum(message["type"] == "error" for message in messages) == len(invalid)
+    assert messages[-1]["evaluation_HR"] is not None
+
+def test_upload_trace_rejects_infinite_timestamps(client):
+    response = client.post("/upload_trace", content='{"age": 30, "weight": 70, "height": 175, "rgb": [[1, 2, 3], [1, 2, 3]], '
+                                                '"t": [0, Infinity]}', headers={"content-type": "application/json"})
+    assert response.status_code == 400
+
+def wait_for_job(client, job_id, timeout=60):
+    deadline = time.time() + timeout
+    job = client.get(f"/jobs/{job_id}").json()
+    while job["status"] in ("queued", "running"):
+        assert time.time() < deadline
+        time.sleep(0.05)
+        job = client.get(f"/jobs/{job_id}").json()
+    return job
+
+# Attendre la suppression des vidéos conservées pour les jobs (faite juste après la fin du job)
+def wait_for_cleanup():
+    import threads_main
+    deadline = time.time() + 10
+    while os.listdir(threads_main.UPLOAD_FOLDER):
+        assert time.time() < deadline, os.listdir(threads_main.UPLOAD_FOLDER)
+        time.sleep(0.05)
+
+# Job analysé dans le pool de processus : avancement publié dans le store, puis résultats
+def test_background_job_runs_in_the_process_pool(client, face_video):
+    with open(face_video, "rb") as video:
+        response = client.post("/upload_video?async=true", data={"age": 30, "weight": 70, "height": 175},
+                               files={"video": ("face.mp4", video, "video/mp4")})
+    assert response.status_code == 202
+    job = wait_for_job(client, response.json()["job_id"])
+    assert job["status"] == "done", job["error"]
+    assert job["result"]["face_tracking"]["frames"] > 0
+    if job["result"]["cache"] == "miss":  # Le rejeu d'une trace en cache ne publie pas d'avancement
+        assert job["progress"]["frames"] > 0
+    wait_for_cleanup()
+
+def test_background_job_can_be_cancelled(client, tmp_path):
+    from synthetic import make_video
+    video_path = make_video(str(tmp_path / "long.mp4"), seconds=12)
+    with open(video_path, "rb") as video:
+        response = client.post("/upload_video?async=true", data={"age": 30, "weight": 70, "height": 175},
+                               files={"video": ("long.mp4", video, "video/mp4")})
+    job_id = response.json()["job_id"]
+    assert client.delete(f"/jobs/{job_id}").status_code == 200
+    assert wait_for_job(client, job_id)["status"] == "cancelled"
+    wait_for_cleanup()
+    assert client.get("/jobs/inconnu").status_code == 404
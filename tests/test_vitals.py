@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+from vitals import RPPG_ALGORITHMS, StreamingVitals, extract_pulse, refine_peaks
+
+# Chaque algorithme retrouve la fréquence du pouls d'une trace sinusoïdale
+@pytest.mark.parametrize("method", sorted(RPPG_ALGORITHMS))
+def test_algorithms_recover_the_pulse_frequency(trace, method):
+    rgb = trace(seconds=20, hr_bpm=84)
+    pulse = extract_pulse(rgb, 30, method)
+    assert pulse.shape == (len(rgb),)
+    spectrum = np.abs(np.fft.rfft(pulse - pulse.mean()))
+    freqs = np.fft.rfftfreq(len(pulse), 1 / 30)
+    assert freqs[spectrum.argmax()] * 60 == pytest.approx(84, abs=3)
+
+def test_unknown_algorithm_is_rejected(trace):
+    with pytest.raises(ValueError, match="available"):
+        extract_pulse(trace(seconds=2), 30, "ica")
+    with pytest.raises(ValueError):
+        StreamingVitals(30, method="ica")
+
+def test_resample_trace_onto_a_uniform_grid():
+    from vitals import resample_trace
+    t = np.array([0.0, 0.1, 0.25, 0.3, 0.5])
+    rgb = np.column_stack([t * 10, t * 20, t * 30])
+    grid, resampled = resample_trace(t, rgb, 10)
+    assert np.allclose(grid, np.arange(6) / 10)
+    assert np.allclose(resampled, np.column_stack([grid * 10, grid * 20, grid * 30]))
+
+# Trace capturée à 24 images/s avec gigue, analysée à 30 Hz : HR juste malgré la fréquence d'entrée différente
+def test_streaming_resamples_jittered_timestamps():
+    rng = np.random.default_rng(0)
+    t = np.arange(20 * 24) / 24 + rng.uniform(-0.005, 0.005, 20 * 24)
+    rgb = np.asarray((150, 120, 100)) + np.outer(np.sin(2 * np.pi * 1.2 * t), (0.6, 1.0, 0.3))
+    engine = StreamingVitals(30)
+    for sample, stamp in zip(rgb, t):
+        engine.update(sample, stamp)
+    assert engine.count == pytest.approx((t[-1] - t[0]) * 30, abs=1)
+    assert engine.last["bpm"] == pytest.approx(72, abs=1)
+
+def test_out_of_order_timestamps_are_ignored():
+    engine = StreamingVitals(30)
+    engine.update((1, 2, 3), 0.0)
+    engine.update((1, 2, 3), 0.1)
+    count = engine.count
+    assert engine.update((1, 2, 3), 0.1) is None and engine.update((1, 2, 3), 0.05) is None
+    assert engine.count == count
+
+# Filtre conçu une fois par jeu de paramètres ; filtrage zéro-phase identique à scipy
+def test_cached_bandpass_matches_sosfiltfilt(trace):
+    from scipy.signal import sosfiltfilt
+    from vitals import DSPContext, bandpass_filter, dsp
+    context = DSPContext(maxsize=2)
+    first = context.bandpass_design(0.8, 2.5, 30)
+    assert context.bandpass_design(0.8, 2.5, 30) is first and context.hits == 1 and context.misses == 1
+    context.bandpass_design(0.7, 2.5, 30)
+    context.bandpass_design(0.6, 2.5, 30)
+    assert len(context.caches["bandpass"]) == 2  # Plus ancien design évincé
+    signal = trace(seconds=20)[:, 1]
+    expected = sosfiltfilt(dsp.bandpass_sos(0.8, 2.5, 30), signal)
+    assert np.allclose(bandpass_filter(signal, 0.8, 2.5, 30), expected)
+
+def test_growable_buffer_keeps_a_running_mean():
+    from vitals import GrowableBuffer
+    buffer = GrowableBuffer(capacity=2)
+    for value in range(10):
+        buffer.append(value)
+    assert len(buffer) == 10 and buffer.mean() == pytest.approx(4.5)
+    assert np.array_equal(buffer.view(), np.arange(10))
+
+# Pics affinés entre deux échantillons : période de 22.5 échantillons (80 BPM à 30 Hz) retrouvée à 0.05 près
+def test_refine_peaks_finds_sub_sample_positions():
+    n = np.arange(200)
+    signal = np.cos(2 * np.pi * (n - 0.3) / 22.5)
+    peaks = np.flatnonzero((signal[1:-1] > signal[:-2]) & (signal[1:-1] >= signal[2:])) + 1
+    assert np.allclose(refine_peaks(signal, peaks), 0.3 + 22.5 * np.arange(1, len(peaks) + 1), atol=0.05)
@@ -1,27 +1,46 @@
-import cv2, os, numpy as np
+import os, time, json, asyncio, logging, cv2, numpy as np
+from functools import partial
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi import FastAPI, File, UploadFile, Form
-from face import detect_face, filter_by_confidence
-from concurrent.futures import ThreadPoolExecutor
-from metrics import (calculate_activity, calculate_sleep, calculate_equilibrium,
-                    calculate_metabolism, calculate_health, calculate_relaxation)
-from vitals import (bandpass_filter, calculate_heart_rate, calculate_hrv, calculate_stress_level,
-                    calculate_blood_pressure, calculate_spo2, verify_signal_strength, calculate_respiration_rate)
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+from concurrent.futures import ProcessPoolExecutor
+from cache import ResultCache
+from jobs import JobManager, make_store
+from profiling import profiler
+from session import (RPPGSession, analyze_video, analyze_video_subjects, analyze_trace, format_subjects, merge_profile,
+                    replay_trace, rescore, submit_job)
+from startup import init_pool_worker, readiness, start
+from pipeline import PIPELINE, analyze_video_pipelined
+from ingest import spooled_upload_async, keep_upload, parse_sample, parse_trace, UploadTooLarge
 
 # Paramètres de capture
-fs = 15  # Fréquence d'échantillonnage (frames par seconde)
+fs = float(os.environ.get("RPPG_FS", 15))  # Fréquence d'analyse (Hz) : les signaux sont rééchantillonnés à cette fréquence
 lowcut = 0.85  # Fréquence de coupure basse (Hz)
 highcut = 2.5  # Fréquence de coupure haute (Hz)
 order = 4  # Ordre du filtre
-frame_idx = []
+window_sec = 20  # Taille de la fenêtre glissante d'analyse (s)
+hop_sec = 1  # Intervalle entre deux recalculs des signaux vitaux (s)
+method = os.environ.get("RPPG_METHOD", "green")  # Algorithme rPPG (green, chrom, pos)
 
-# Limites des frames pour calculer différents signaux vitaux
-max_frame_HR = 500
-max_frame_HRV = 510
-max_frame_respiration = 520
-max_frame_SPO2 = 530
-max_frame_pressions = 540
-max_frame_total = 600  # Limite pour les frames totales
+# Durées de signal (s) avant de calculer différents signaux vitaux : 500 à 600 frames à 30 images/s,
+# indépendamment de la fréquence d'analyse fs
+min_sec_HR = 500 / 30
+min_sec_HRV = 510 / 30
+min_sec_respiration = 520 / 30
+min_sec_SPO2 = 530 / 30
+min_sec_pressions = 540 / 30
+min_sec_total = 600 / 30  # Durée avant de calculer les scores
+
+# Paramètres de chaque session d'analyse (les moyennes ne sont publiées qu'après assez de signal)
+session_params = dict(fs=fs, lowcut=lowcut, highcut=highcut, order=order, window_sec=window_sec, hop_sec=hop_sec, method=method,
+                    min_samples=28, min_total_sec=min_sec_total,
+                    min_seconds={"avg_bpm": min_sec_HR, "avg_hrv": min_sec_HRV, "avg_respiration": min_sec_respiration,
+                                "avg_spo2": min_sec_SPO2, "avg_systolic": min_sec_pressions, "avg_diastolic": min_sec_pressions},
+                    log_every=int(os.environ.get("RPPG_LOG_EVERY", 0)))
+
+# Journal des mesures (une ligne toutes les RPPG_LOG_EVERY frames, désactivé par défaut) au niveau RPPG_LOG_LEVEL
+logging.basicConfig(level=os.environ.get("RPPG_LOG_LEVEL", "INFO"), format="%(asctime)s %(levelname)s %(name)s %(message)s")
 
 # Initialisation de l'application FastAPI
 app = FastAPI()
@@ -33,133 +52,133 @@ app.add_middleware(
     allow_origins=allowed_origins,
 )
 
-# Initialisation du détecteur de visage en utilisant le modèle Haar Cascade
-face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-
 # Dossier pour stocker les vidéos téléchargées
-UPLOAD_FOLDER = 'uploads/'
+UPLOAD_FOLDER = os.environ.get("RPPG_UPLOAD_DIR", "uploads/")
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)  # Créer le dossier s'il n'existe pas
 
-# Variables pour stocker les signaux RGB et RPPG
-signals = {"rppg_signal": [], "heart_rates": [], "spo2_rates": [], "hrv_rates": [],
-        "respiration_rates": [], "systolic_rates": [], "diastolic_rates": [],
-        "ppg_red_signal": [], "ppg_infra_signal": []}
-
-# Variables moyennes et actuelles pour les signaux physiologiques
-metrics = {"avg_bpm": 0, "bpm": 0, "avg_hrv": 0, "hrv": 0,
-        "avg_spo2": 0, "spo2": 0, "avg_respiration": 0, "respiration": 0,
-        "avg_diastolic": 0, "diastolic": 0, "avg_systolic": 0, "systolic": 0}
-
-# Variables pour stocker les scores calculés
-scores = {"activity_score": 0, "sleep_score": 0, "equilibrium_score": 0,
-        "metabolism_score": 0, "health_score": 0, "relaxation_score": 0}
-
-# Fonction pour réinitialiser les signaux si le nombre de frames dépasse une limite
-def reset_signals_if_exceeds():
-    global frame_idx, signals, metrics
-    signals = {key: [] for key in signals}
-    metrics = {key: 0 for key in metrics}
-    frame_idx = []
-
-# ThreadPoolExecutor pour exécuter des tâches en parallèle
-executor = ThreadPoolExecutor(max_workers=4)
-
-stress_level_label = ''
-# Fonction de traitement des métriques vitaux
-def process_vital_metrics(face_roi):
-    global stress_level_label 
-    if face_roi is not None:
-        roi_rgb = cv2.cvtColor(face_roi, cv2.COLOR_BGR2RGB)  # Convertir en RGB
-        avg_color = np.mean(roi_rgb, axis=(0, 1))  # Moyenne des canaux R, G, B
-        signals["rppg_signal"].append(avg_color[1])  # Utiliser le canal vert
-
-        avg_red = np.mean(roi_rgb[:, :, 0])  # Moyenne du canal rouge
-        avg_infra = 0.3 * avg_red + 0.59 * avg_color[1] + 0.11 * np.mean(roi_rgb[:, :, 2])  # Signal infrarouge
-        signals["ppg_red_signal"].append(avg_red)  # Signal rouge
-        signals["ppg_infra_signal"].append(avg_infra)  # Signal infrarouge
-
-        if len(signals["rppg_signal"]) > 27:
-            filtered_signal = bandpass_filter(signals["rppg_signal"], lowcut, highcut, fs, order)
-            bpm, peak_intervals, peaks = calculate_heart_rate(filtered_signal, fs)
-            signals["heart_rates"].append(bpm)
-            metrics["avg_bpm"] = round(np.mean(signals["heart_rates"]), 2) if len(signals["heart_rates"]) >= max_frame_HR else metrics["avg_bpm"]
-
-            if verify_signal_strength(signals["ppg_red_signal"]) and verify_signal_strength(signals["ppg_infra_signal"]):
-                spo2 = calculate_spo2(signals["ppg_red_signal"], signals["ppg_infra_signal"], fs)
-                signals["spo2_rates"].append(spo2)
-                metrics["avg_spo2"] = round(np.mean(signals["spo2_rates"]), 2) if len(signals["spo2_rates"]) >= max_frame_SPO2 else metrics["avg_spo2"]
-
-            if len(peaks) > 1:
-                _, hrv, _ = calculate_hrv(peaks)
-                signals["hrv_rates"].append(hrv)
-                metrics["avg_hrv"] = round(np.mean(signals["hrv_rates"]), 2) if len(signals["hrv_rates"]) >= max_frame_HRV else metrics["avg_hrv"]
-            
-            # Déterminer le niveau de stress
-            stress_level_label = calculate_stress_level(peak_intervals)
-            
-            respiration = calculate_respiration_rate(filtered_signal, fs)
-            signals["respiration_rates"].append(respiration)
-            metrics["avg_respiration"] = round(np.mean(signals["respiration_rates"]), 2) if len(signals["respiration_rates"]) >= max_frame_respiration else metrics["avg_respiration"]
-
-            systolic, diastolic = calculate_blood_pressure(peak_intervals)
-            if systolic and diastolic:
-                signals["systolic_rates"].append(systolic)
-                signals["diastolic_rates"].append(diastolic)
-                metrics["avg_systolic"] = round(np.mean(signals["systolic_rates"]), 2) if len(signals["systolic_rates"]) >= max_frame_pressions else metrics["avg_systolic"]
-                metrics["avg_diastolic"] = round(np.mean(signals["diastolic_rates"]), 2) if len(signals["diastolic_rates"]) >= max_frame_pressions else metrics["avg_diastolic"]
-
-# Route pour télécharger et traiter la vidéo
+# Pool de processus pour analyser plusieurs vidéos en parallèle (une session par requête) ; chaque processus
+# se préchauffe à son lancement
+pool_workers = int(os.environ.get("RPPG_WORKERS", os.cpu_count() or 1))
+
+# Store des jobs, créé avant le pool : en mémoire, il est tenu par un processus multiprocessing.Manager pour que
+# l'analyse d'un job, dans un processus du pool, publie son avancement et voie les demandes d'annulation
+job_store = make_store(shared=True)
+
+process_pool = ProcessPoolExecutor(max_workers=pool_workers, initializer=init_pool_worker, initargs=(session_params,))
+
+# Lancer tous les processus du pool dès l'import (une tâche vide chacun), avant le thread de préchauffage et les
+# jobs : un fork pendant qu'un autre thread tient un verrou (import, OpenCV) pourrait bloquer le processus enfant
+pool_started = [process_pool.submit(int) for _ in range(pool_workers)]
+
+# Cache disque des résultats, indexé par le contenu des vidéos (lu et écrit dans le processus principal)
+result_cache = ResultCache()
+
+# Analyse d'une vidéo dans un processus du pool : séquentielle, ou pipeline décodage / suivi du visage / analyse
+# (RPPG_PIPELINE=1) à l'intérieur du processus
+analyze = analyze_video_pipelined if PIPELINE else analyze_video
+cache_params = {**session_params, "analyzer": analyze.__name__}  # Clé de cache : paramètres et mode d'analyse
+
+# Analyses en arrière-plan (/upload_video avec async=true), suivies par /jobs/{id} : les threads du gestionnaire de
+# jobs lisent et écrivent le cache, l'analyse elle-même tourne dans le pool de processus
+job_manager = JobManager(job_store)
+
+# Préchauffage en arrière-plan (imports, détecteur, filtres), puis attente du préchauffage des processus du pool ;
+# /healthz indique quand c'est fini
+start(session_params, after=lambda: [future.result() for future in pool_started])
+
+# Route pour télécharger et traiter la vidéo ; avec async=true (formulaire ou URL), renvoie tout de suite
+# un identifiant de job (202) et l'analyse continue en arrière-plan. Avec subjects=true, toutes les personnes
+# visibles sont suivies et les signaux vitaux sont renvoyés par personne (sans passer par le cache)
 @app.post("/upload_video")
-async def upload_video(age: int = Form(...), weight: int = Form(...), height: int = Form(...), video: UploadFile = File(...)):
-    global stress_level_label 
-    global signals, metrics, scores, frame_idx
-    
-    # Sauvegarder la vidéo temporairement
-    video_path = os.path.join(UPLOAD_FOLDER, video.filename)
-    print('Le chemin de la vidéo est :', video_path)
-
-    reset_signals_if_exceeds()  # Réinitialiser les signaux
-    
-    with open(video_path, "wb") as buffer:
-        buffer.write(await video.read())
-        
-    cap = cv2.VideoCapture(video_path)
-
-    if not cap.isOpened():
+async def upload_video(request: Request, age: int = Form(...), weight: int = Form(...), height: int = Form(...),
+                    video: UploadFile = File(...), background: bool = Form(False, alias="async"),
+                    group: bool = Form(False, alias="subjects")):
+    background = background or request.query_params.get("async", "").lower() in ("1", "true", "yes")
+    group = group or request.query_params.get("subjects", "").lower() in ("1", "true", "yes")
+    # Copier la vidéo par blocs dans un fichier temporaire, supprimé même en cas d'erreur
+    try:
+        async with spooled_upload_async(video, UPLOAD_FOLDER) as (video_path, content_hash):
+            loop = asyncio.get_running_loop()
+            if background:
+                job_id = submit_job(job_manager, result_cache, keep_upload(video_path), content_hash, age, weight, height,
+                                    format_results, group, analyze=analyze, executor=process_pool, **session_params)
+                return JSONResponse({"job_id": job_id, "status_url": f"/jobs/{job_id}"}, status_code=202)
+            if group:
+                results = await loop.run_in_executor(process_pool, partial(analyze_video_subjects, video_path, age, weight,
+                                                                          height, **session_params))
+                if results is None:
+                    return {"message": "Erreur lors du chargement de la vidéo"}
+                merge_profile(results)
+                return format_subjects(results, age, weight, height, format_results)
+            # Même contenu déjà analysé : seuls les scores sont recalculés ; trace seule : pas de décodage ni de détection
+            status, results, trace = await run_in_threadpool(result_cache.lookup, content_hash, cache_params)
+            if status == "hit":
+                results = rescore(results, age, weight, height, **session_params)
+            elif status == "trace":
+                results = await loop.run_in_executor(process_pool, partial(replay_trace, trace, age, weight, height, **session_params))
+            else:
+                results = await loop.run_in_executor(process_pool, partial(analyze, video_path, age, weight, height,
+                                                                  record_trace=True, **session_params))
+    except UploadTooLarge as error:
+        raise HTTPException(status_code=413, detail=str(error))
+
+    if results is None:
         print("Erreur lors du chargement de la vidéo.")
         return {"message": "Erreur lors du chargement de la vidéo"}
+    merge_profile(results)
+    if status != "hit":
+        await run_in_threadpool(result_cache.store, content_hash, cache_params, results, results.pop("trace", None))
 
-    futures = []
-    
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break
-        frame_idx.append(len(frame_idx) + 1)
-
-        face_roi, _, _, w, h = detect_face(frame)
-        if face_roi is not None:
-            is_confident, _ = filter_by_confidence(w, h, frame.shape, threshold=8)
-            if is_confident:
-                futures.append(executor.submit(process_vital_metrics, face_roi))
-
-    cap.release()
-
-    for future in futures:
-        future.result()  # Attendre que toutes les tâches soient terminées
-
-    if len(signals["rppg_signal"]) > max_frame_total:
-        scores["activity_score"] = calculate_activity(metrics["avg_bpm"], age)
-        scores["sleep_score"] = calculate_sleep(metrics["avg_hrv"], metrics["avg_respiration"])
-        scores["equilibrium_score"] = calculate_equilibrium(metrics["avg_hrv"], metrics["avg_systolic"], metrics["avg_diastolic"])
-        scores["metabolism_score"] = calculate_metabolism(weight, height, age)
-        scores["health_score"] = calculate_health(metrics["avg_spo2"], metrics["avg_bpm"], metrics["avg_systolic"])
-        scores["relaxation_score"] = calculate_relaxation(metrics["avg_hrv"], metrics["avg_respiration"])
-    
-    os.remove(video_path)
-        
-    # Retourner les résultats
+    return {**format_results(results, age, weight, height), "cache": status}
+
+# État d'un job : statut (queued, running, done, failed, cancelled), avancement (frames traitées, mesures
+# partielles), résultats ou erreur ; 404 si le job est inconnu ou expiré
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = await run_in_threadpool(job_manager.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job introuvable.")
+    return job
+
+# Annuler un job en attente ou en cours
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    job = await run_in_threadpool(job_manager.cancel, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job introuvable.")
+    return job
+
+# Route pour analyser une trace RGB déjà extraite côté client (JSON ou float32 binaire)
+@app.post("/upload_trace")
+async def upload_trace(request: Request):
+    try:
+        trace = parse_trace(await request.body(), request.headers.get("content-type"), request.query_params)
+    except UploadTooLarge as error:
+        raise HTTPException(status_code=413, detail=str(error))
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+    loop = asyncio.get_running_loop()
+    results = await loop.run_in_executor(process_pool, partial(analyze_trace, trace["rgb"], trace["age"], trace["weight"],
+                                                            trace["height"], t=trace["t"], **session_params))
+    merge_profile(results)
+    return format_results(results, trace["age"], trace["weight"], trace["height"])
+
+# Disponibilité du worker : 200 une fois le démarrage terminé, 503 pendant le préchauffage ou s'il a échoué
+@app.get("/healthz")
+async def healthz():
+    status = readiness()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+# Durées par étape, débit et compteurs (détection/suivi, cache) au format texte Prometheus ;
+# les profils des processus du pool sont renvoyés avec les résultats et fusionnés ici
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(profiler.render(extra=result_cache.counters()), media_type="text/plain; version=0.0.4")
+
+# Mettre en forme les résultats d'une session pour la réponse
+def format_results(results, age, weight, height):
+    metrics, scores = results["metrics"], results["scores"]
     return {"message": "Vidéo et données reçues avec succès",
         "age": age,
         "weight": weight,
@@ -170,10 +189,70 @@ async def upload_video(age: int = Form(...), weight: int = Form(...), height: in
         "evaluation_respiration": metrics["avg_respiration"],
         "evaluation_diastolic": metrics["avg_diastolic"],
         "evaluation_systolic": metrics["avg_systolic"],
-        "evaluation_stress": stress_level_label,
+        "evaluation_stress": results["stress_level"],
         "evaluation_activity": scores["activity_score"],
         "evaluation_sleep": scores["sleep_score"],
         "evaluation_equilibre": scores["equilibrium_score"],
         "evaluation_metabolism": scores["metabolism_score"],
         "evaluation_health": scores["health_score"],
-        "evaluation_relaxation": scores["relaxation_score"]}
\ No newline at end of file
+        "evaluation_relaxation": scores["relaxation_score"],
+        "hrv": results["hrv"],
+        "face_tracking": results["face_tracking"],
+        "quality": results["quality"]}
+
+# Intervalle d'envoi des mesures en direct sur le WebSocket (s)
+stream_update_sec = 1
+
+# Décoder une frame JPEG reçue sur le WebSocket puis la traiter dans la session (dans un thread du pool)
+def process_jpeg(session, data, t):
+    with session.profiler.stage("decode"):
+        frame = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    if frame is not None:
+        session.process_frame(frame, t)
+
+# Flux temps réel depuis la webcam : le client envoie d'abord {"age", "weight", "height"[, "fps"]},
+# puis des frames JPEG (messages binaires) ou des moyennes RGB de la ROI ({"rgb": [r, g, b][, "t": s]}),
+# et enfin {"type": "end"} pour recevoir les scores. Les mesures sont poussées toutes les secondes.
+# Un message invalide (JSON, RGB non fini, horodatage non croissant) est ignoré et signalé par {"type": "error"}
+@app.websocket("/ws/stream")
+async def stream(websocket: WebSocket):
+    await websocket.accept()
+    try:
+        config = await websocket.receive_json()
+        age, weight, height = int(config["age"]), int(config["weight"]), int(config["height"])
+        session = RPPGSession(**session_params)
+        capture_fps = config.get("fps")  # Fréquence de capture du client, sinon horodatage à la réception
+        start = last_update = time.monotonic()
+        received = 0
+        previous_t = None  # Horodatage du dernier échantillon RGB accepté
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            t = received / capture_fps if capture_fps else time.monotonic() - start
+            received += 1
+            # Décodage et analyse hors de la boucle d'événements
+            if message.get("bytes") is not None:
+                await run_in_threadpool(process_jpeg, session, message["bytes"], t)
+            else:
+                try:
+                    data = json.loads(message["text"])
+                    if isinstance(data, dict) and data.get("type") == "end":
+                        break
+                    rgb, previous_t = parse_sample(data, t, previous_t)
+                except ValueError as error:
+                    await websocket.send_json({"type": "error", "error": str(error)})
+                    continue
+                await run_in_threadpool(session.process_rgb, rgb, previous_t)
+
+            if time.monotonic() - last_update >= stream_update_sec:
+                last_update = time.monotonic()
+                await websocket.send_json({"type": "update", **session.live()})
+
+        session.compute_scores(age, weight, height)
+        results = session.results()
+        merge_profile(results)
+        await websocket.send_json({"type": "final", **format_results(results, age, weight, height)})
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
\ No newline at end of file
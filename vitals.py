@@ -1,119 +1,160 @@
+import threading
 import numpy as np
-from scipy.signal import butter, filtfilt, find_peaks, savgol_filter
-from scipy.fft import fft
+from collections import OrderedDict
+from numpy.lib.stride_tricks import sliding_window_view
+from lazy import LazyModule
+from hrv import RRSeries, blood_pressure, rr_statistics, stress_level
+from profiling import Profiler
+from quality import QualityGate, spectral_snr
+from spectral import estimate_heart_rate, estimate_rates, hann_window
+
+scipy_signal = LazyModule("scipy.signal")  # Loaded on first use (about 1 s of imports)
+SETTLE_SEC = 3.0  # Start-up transient of the causal bandpass (within 5% of steady state after about 2.7 s)
+PULSE_WINDOW_SEC = 1.6  # Projection window of the CHROM and POS algorithms
+
+# -----------------------------------------------------------------------------------------------------------------------
+# DSP Context: small LRU caches for filter designs (SOS), shared by the functions below
+# (Hann windows and FFT frequency grids are cached in spectral.py)
+class DSPContext:
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self.lock = threading.Lock()
+        self.caches = {}
+        self.hits = 0
+        self.misses = 0
+
+    def cached(self, kind, key, factory):
+        with self.lock:
+            cache = self.caches.setdefault(kind, OrderedDict())
+            if key in cache:
+                self.hits += 1
+                cache.move_to_end(key)
+                return cache[key]
+            self.misses += 1
+        value = factory()  # Shared between callers: never modified in place
+        with self.lock:
+            cache[key] = value
+            if len(cache) > self.maxsize:
+                cache.popitem(last=False)
+        return value
+
+    # Bandpass design: SOS coefficients, their steady-state initial conditions and the zero-phase padding length
+    def bandpass_design(self, lowcut, highcut, fs, order=4):
+        def design():
+            sos = scipy_signal.butter(order, [lowcut, highcut], btype='bandpass', fs=fs, output='sos')
+            padlen = 3 * (2 * len(sos) + 1 - min((sos[:, 2] == 0).sum(), (sos[:, 5] == 0).sum()))
+            return sos, scipy_signal.sosfilt_zi(sos), padlen
+        return self.cached("bandpass", (lowcut, highcut, fs, order), design)
+
+    def bandpass_sos(self, lowcut, highcut, fs, order=4):
+        return self.bandpass_design(lowcut, highcut, fs, order)[0]
+
+dsp = DSPContext()
 
 # -----------------------------------------------------------------------------------------------------------------------
-# Optimized Bandpass Filter
+# Growable NumPy buffer (amortized O(1) append, running mean) replacing growing Python lists
+class GrowableBuffer:
+    def __init__(self, capacity=64, width=None):
+        self.data = np.empty(capacity if width is None else (capacity, width))  # Scalars, or rows of `width` values
+        self.size = 0
+        self.total = 0.0
+
+    def append(self, value):
+        if self.size == len(self.data):
+            self.data = np.concatenate((self.data, np.empty_like(self.data)))
+        self.data[self.size] = value
+        self.total += self.data[self.size]
+        self.size += 1
+
+    def view(self):
+        return self.data[:self.size]
+
+    def mean(self):
+        return self.total / self.size if self.size else 0.0
+
+    def __len__(self):
+        return self.size
+
+# -----------------------------------------------------------------------------------------------------------------------
+# Optimized Bandpass Filter (coefficients designed once per parameter set, zero-phase SOS filtering)
 def butter_bandpass(lowcut, highcut, fs, order=4):
-    nyquist = 0.5 * fs
-    low = lowcut / nyquist
-    high = highcut / nyquist
-    b, a = butter(order, [low, high], btype='bandpass')
-    return b, a
+    return dsp.bandpass_sos(lowcut, highcut, fs, order)
+
+# Zero-phase filtering equivalent to scipy's sosfiltfilt (odd extension), reusing the cached initial conditions
+def zero_phase_filter(signal, design):
+    sos, zi, padlen = design
+    x = np.asarray(signal, dtype=float)
+    ext = np.concatenate((2 * x[0] - x[padlen:0:-1], x, 2 * x[-1] - x[-2:-padlen - 2:-1]))
+    y, _ = scipy_signal.sosfilt(sos, ext, zi=zi * ext[0])
+    y, _ = scipy_signal.sosfilt(sos, y[::-1], zi=zi * y[-1])
+    return y[::-1][padlen:-padlen]
 
 def bandpass_filter(signal, lowcut, highcut, fs, order=4):
-    if len(signal) < 27:  # Ensure the signal is long enough
+    design = dsp.bandpass_design(lowcut, highcut, fs, order)
+    if len(signal) <= design[2]:  # Ensure the signal is long enough
         print("Signal too short for filtering.")
         return signal
-    b, a = butter_bandpass(lowcut, highcut, fs, order=order)
-    filtered_signal = filtfilt(b, a, signal)
+    filtered_signal = zero_phase_filter(signal, design)
     return filtered_signal
 
 # -----------------------------------------------------------------------------------------------------------------------
-# Optimized Heart Rate Calculation
-def calculate_heart_rate(filtered_signal, fs):
-    
+# Heart Beat Detection (peaks of the smoothed, bandpassed pulse signal)
+# Sub-sample peak positions (fractional sample indices): vertex of the parabola through each peak and its two
+# neighbours. Integer indices quantize the RR intervals to 1/fs (33 ms at 30 Hz, 67 ms at 15 Hz), which alone
+# gives a steady pulse tens of ms of RMSSD whenever its period is not a whole number of samples
+def refine_peaks(signal, peaks):
+    peaks = np.asarray(peaks, dtype=np.int64)
+    refined = peaks.astype(float)
+    inner = (peaks > 0) & (peaks < len(signal) - 1)
+    k = peaks[inner]
+    a, b, c = signal[k - 1], signal[k], signal[k + 1]
+    denominator = a - 2 * b + c
+    offset = np.divide(0.5 * (a - c), denominator, out=np.zeros(len(k)), where=denominator != 0)
+    refined[inner] += np.clip(offset, -0.5, 0.5)
+    return refined
+
+def find_heart_peaks(filtered_signal, fs):
     # Lissage du signal avec un filtre de Savitzky-Golay
-    smoothed_signal = savgol_filter(filtered_signal, window_length=11, polyorder=3)
-    
-    # Detect peaks with minimum distance and height
-    peaks, _ = find_peaks(smoothed_signal, distance=fs/2, height=np.mean(smoothed_signal) * 0.7)
+    smoothed_signal = scipy_signal.savgol_filter(filtered_signal, window_length=11, polyorder=3)
+
+    # Detect peaks with minimum distance and height, then refine them to sub-sample positions
+    peaks, _ = scipy_signal.find_peaks(smoothed_signal, distance=fs/2, height=np.mean(smoothed_signal) * 0.7)
+    peaks = refine_peaks(smoothed_signal, peaks)
     # Check if there are enough peaks for BPM calculation
     if len(peaks) >= 2:
         peak_intervals = np.diff(peaks) / fs  # Time between peaks in seconds
     else :
         peak_intervals =[]
-    
-    # FFT pour analyser les fréquences
-    n = len(smoothed_signal)
-    freqs = np.fft.fftfreq(n, d=1/fs)
-    fft_values = fft(smoothed_signal)
-
-    # Filtrer les fréquences positives
-    positive_freqs = freqs[:n // 2]
-    positive_fft_values = np.abs(fft_values[:n // 2])
-
-    # Trouver la fréquence dominante dans le signal FFT
-    dominant_freq_index = np.argmax(positive_fft_values)
-    dominant_freq = positive_freqs[dominant_freq_index]
-    avg_bpm = dominant_freq * 60   # Conversion en BPM
-    
-    return avg_bpm , peak_intervals, peaks
+    return peak_intervals, peaks, smoothed_signal
+
+# -----------------------------------------------------------------------------------------------------------------------
+# Optimized Heart Rate Calculation
+def calculate_heart_rate(filtered_signal, fs):
+    peak_intervals, peaks, smoothed_signal = find_heart_peaks(filtered_signal, fs)
 
+    # Welch PSD limited to 0.67 - 3.33 Hz (40 - 200 BPM), peak refined by parabolic interpolation
+    avg_bpm = estimate_heart_rate(smoothed_signal, fs)
 
-# def calculate_heart_rate(filtered_signal, fs):
-    
-#     # Lissage du signal avec un filtre de Savitzky-Golay
-#     smoothed_signal = savgol_filter(filtered_signal, window_length=11, polyorder=3)
-    
-#     # Detect peaks with minimum distance and height
-#     peaks, _ = find_peaks(smoothed_signal, distance=fs/3, height=np.mean(smoothed_signal) * 0.6)
-#     # Check if there are enough peaks for BPM calculation
-#     if len(peaks) >= 2:
-#         peak_intervals = np.diff(peaks) / fs  # Time between peaks in seconds
-#     else :
-#         peak_intervals =[]
-    
-#     # FFT pour analyser les fréquences
-#     n = len(smoothed_signal)
-#     freqs = np.fft.fftfreq(n, d=1/fs)
-#     fft_values = fft(smoothed_signal)
-
-#     # Filtrer les fréquences positives
-#     positive_freqs = freqs[:n // 2]
-#     positive_fft_values = np.abs(fft_values[:n // 2])
-
-#     # Only consider frequencies between 0.67 Hz (40 BPM) and 3.33 Hz (200 BPM) et Trouver la fréquence dominante dans le signal FFT
-#     valid_freq_indices = np.where((positive_freqs >= 0.67) & (positive_freqs <= 3.33))[0]
-#     dominant_freq_index = valid_freq_indices[np.argmax(positive_fft_values[valid_freq_indices])]
-#     dominant_freq = positive_freqs[dominant_freq_index]
-#     avg_bpm = dominant_freq * 60  # Convert to BPM
-#     # print('le frequence est :', avg_bpm)
-#     return avg_bpm , peak_intervals, peaks
+    return avg_bpm , peak_intervals, peaks
 
 # -----------------------------------------------------------------------------------------------------------------------
-# HRV (Heart Rate Variability) Calculation
+# HRV (Heart Rate Variability) from the RR intervals (s): mean RR, SDNN, RMSSD in seconds.
+# The full set (pNN50, LF/HF) is in hrv.rr_statistics; StreamingVitals computes it once per window
 def calculate_hrv(peak_intervals):
-    if len(peak_intervals) < 2:
+    stats = rr_statistics(peak_intervals)
+    if stats["mean_rr"] is None:
         return 0, 0, 0  # Return zeros if not enough data
-    mean_rr = np.mean(peak_intervals)  # Mean of intervals
-    sdnn = np.std(peak_intervals)      # Standard deviation
-    rmssd = np.sqrt(np.mean(np.diff(peak_intervals)**2))  # RMSSD (root mean square of successive differences)
-    return mean_rr, sdnn, rmssd
+    return stats["mean_rr"] / 1000, stats["sdnn"] / 1000, stats["rmssd"] / 1000
 
 # -----------------------------------------------------------------------------------------------------------------------
-# Stress Level Based on HRV
+# Stress Level Based on HRV (RMSSD)
 def calculate_stress_level(peak_intervals):
-    if len(peak_intervals) < 2:
-        return "Insufficient data"
-    rmssd = np.sqrt(np.mean(np.diff(peak_intervals * 1000)**2))  # Convert intervals to ms
-    if rmssd > 50:
-        return "Very low stress"
-    elif 30 <= rmssd < 50:
-        return "Mild stress"
-    elif 15 <= rmssd <= 30:
-        return "Moderate stress"
-    else:
-        return "High stress"
+    return stress_level(rr_statistics(peak_intervals))
 
 # -----------------------------------------------------------------------------------------------------------------------
-# Blood Pressure Calculation (Basic Estimate)
+# Blood Pressure Calculation (Basic Estimate from the mean RR interval)
 def calculate_blood_pressure(peak_intervals):
-    if len(peak_intervals) < 2:
-        return None, None
-    systolic_pressure = 85 + (np.mean(peak_intervals) * 40)
-    diastolic_pressure = 50 + (np.mean(peak_intervals) * 20)
-    return systolic_pressure, diastolic_pressure
+    return blood_pressure(rr_statistics(peak_intervals))
 
 # -----------------------------------------------------------------------------------------------------------------------
 # SpO2 Calculation Based on Red and Infrared Signals
@@ -139,8 +180,8 @@ def calculate_spo2(red_signal, infra_signal, fs):
 # -----------------------------------------------------------------------------------------------------------------------
 # Respiration Rate Calculation
 def calculate_respiration_rate(filtered_signal, fs):
-    smoothed_signal = savgol_filter(filtered_signal, window_length=11, polyorder=3)
-    peaks_respiration, _ = find_peaks(smoothed_signal, distance=fs * 2, height=np.mean(smoothed_signal) * 0.7)
+    smoothed_signal = scipy_signal.savgol_filter(filtered_signal, window_length=11, polyorder=3)
+    peaks_respiration, _ = scipy_signal.find_peaks(smoothed_signal, distance=fs * 2, height=np.mean(smoothed_signal) * 0.7)
     peak_interval_respiration = np.diff(peaks_respiration) / fs
     if len(peak_interval_respiration) == 0:
         return 0
@@ -152,3 +193,211 @@ def calculate_respiration_rate(filtered_signal, fs):
 def verify_signal_strength(signal, threshold=0.1):
     signal_range = np.max(signal) - np.min(signal)
     return signal_range > threshold
+
+
+# -----------------------------------------------------------------------------------------------------------------------
+# rPPG Algorithms: (N, 3) RGB trace -> pulse signal, selected by name
+RPPG_ALGORITHMS = {}
+
+def register_algorithm(name):
+    def decorator(func):
+        RPPG_ALGORITHMS[name] = func
+        return func
+    return decorator
+
+def extract_pulse(rgb, fs, method="green"):
+    if method not in RPPG_ALGORITHMS:
+        raise ValueError(f"Unknown rPPG algorithm '{method}', available: {', '.join(RPPG_ALGORITHMS)}")
+    return RPPG_ALGORITHMS[method](np.asarray(rgb, dtype=float), fs)
+
+# Overlap-add of per-window signals h (W, l) whose windows start every `step` samples
+def overlap_add(h, n, step=1):
+    starts = np.arange(h.shape[0]) * step
+    index = (starts[:, None] + np.arange(h.shape[1])).ravel()
+    return np.bincount(index, weights=h.ravel(), minlength=n)
+
+# Windows of the trace normalized by their temporal mean: (W, 3, l)
+def _normalized_windows(rgb, length, step):
+    windows = sliding_window_view(rgb, length, axis=0)[::step]
+    return windows / windows.mean(axis=2, keepdims=True)
+
+@register_algorithm("green")
+def green(rgb, fs):
+    return rgb[:, 1]
+
+# CHROM (de Haan & Jeanne, 2013): chrominance projection on Hann windows with 50 % overlap
+@register_algorithm("chrom")
+def chrom(rgb, fs, window_sec=PULSE_WINDOW_SEC):
+    n = len(rgb)
+    length = min(n, 2 * max(int(window_sec * fs) // 2, 1))
+    step = max(length // 2, 1)
+    cn = _normalized_windows(rgb, length, step)
+    xs = 3 * cn[:, 0] - 2 * cn[:, 1]
+    ys = 1.5 * cn[:, 0] + cn[:, 1] - 1.5 * cn[:, 2]
+    xs -= xs.mean(axis=1, keepdims=True)
+    ys -= ys.mean(axis=1, keepdims=True)
+    alpha = xs.std(axis=1) / np.maximum(ys.std(axis=1), 1e-12)
+    h = (xs - alpha[:, None] * ys) * hann_window(length)[0]
+    return overlap_add(h, n, step)
+
+# POS (Wang et al., 2017): plane-orthogonal-to-skin projection on windows sliding by one sample
+@register_algorithm("pos")
+def pos(rgb, fs, window_sec=PULSE_WINDOW_SEC):
+    n = len(rgb)
+    length = min(n, max(int(window_sec * fs), 1))
+    cn = _normalized_windows(rgb, length, 1)
+    s1 = cn[:, 1] - cn[:, 2]
+    s2 = cn[:, 1] + cn[:, 2] - 2 * cn[:, 0]
+    h = s1 + (s1.std(axis=1) / np.maximum(s2.std(axis=1), 1e-12))[:, None] * s2
+    h -= h.mean(axis=1, keepdims=True)
+    return overlap_add(h, n)
+
+# -----------------------------------------------------------------------------------------------------------------------
+# Resample a timestamped (N, 3) trace onto a uniform grid at fs (vectorized linear interpolation)
+def resample_trace(t, rgb, fs):
+    t = np.asarray(t, dtype=float)
+    rgb = np.asarray(rgb, dtype=float)
+    order = np.argsort(t, kind='stable')
+    t, rgb = t[order], rgb[order]
+    grid = t[0] + np.arange(int(np.floor((t[-1] - t[0]) * fs + 1e-9)) + 1) / fs
+    return grid, np.column_stack([np.interp(grid, t, rgb[:, c]) for c in range(rgb.shape[1])])
+
+# -----------------------------------------------------------------------------------------------------------------------
+# Streaming Vitals Estimator (fixed ring buffer + causal bandpass, recomputed every hop).
+# Each window is scored by the quality gate; rejected windows return None for every metric.
+# Detected beats feed an incremental RR series whose HRV statistics are computed once per window and
+# shared by HRV, stress and blood pressure. Stage durations are recorded in the given profiler.
+class StreamingVitals:
+    def __init__(self, fs, lowcut=0.8, highcut=2.5, order=4, window_sec=20, hop_sec=1, min_samples=34, method="green",
+                gate=None, profiler=None):
+        if method not in RPPG_ALGORITHMS:
+            raise ValueError(f"Unknown rPPG algorithm '{method}', available: {', '.join(RPPG_ALGORITHMS)}")
+        self.fs = fs
+        self.method = method
+        self.size = int(window_sec * fs)
+        self.hop = max(1, int(round(hop_sec * fs)))
+        self.min_samples = min_samples
+        self.design = dsp.bandpass_design(lowcut, highcut, fs, order)
+        self.sos = self.design[0]
+        self.zi = None
+        self.rgb = np.zeros((self.size, 3))   # R, G, B means of the ROI
+        self.filtered = np.zeros(self.size)   # Causally filtered green channel
+        self.artifacts = np.zeros((self.size, 2))  # ROI motion and saturation ratio of the frame behind each sample
+        # Beats of the current window (absolute, sub-sample positions), ignoring the bandpass start-up transient.
+        # Beats in the last 7 samples are deferred: the last 5 smoothed samples come from the Savitzky-Golay edge
+        # fit and the sub-sample refinement reads each peak's neighbours. Windowed algorithms also taper the last
+        # projection window of the trace
+        guard = 7 if method == "green" else int(PULSE_WINDOW_SEC * fs) + 7
+        self.rr = RRSeries(fs, window_sec, guard=guard, settle=int(SETTLE_SEC * fs))
+        self.gate = gate or QualityGate()
+        self.profiler = profiler or Profiler()
+        self.count = 0
+        self.last = None
+        self.t0 = None  # Timestamp of the first sample: the uniform grid is t0 + k / fs
+        self.next_k = 0
+        self.prev = None  # Previous timestamped input (t, rgb)
+
+    # Add one input sample (R, G, B), optionally timestamped in seconds, with the ROI motion and saturation
+    # ratio of its frame. Timestamped samples are linearly resampled onto the uniform fs grid, so the input
+    # frame rate may differ or vary. Returns the latest estimates if a hop completed, None otherwise.
+    def update(self, avg_rgb, t=None, motion=0.0, saturation=0.0):
+        avg_rgb = np.asarray(avg_rgb, dtype=float)[:3]
+        artifacts = (motion, saturation)
+        if t is None:
+            return self.push(avg_rgb, artifacts)
+        if self.prev is None:
+            self.t0, self.next_k, self.prev = t, 1, (t, avg_rgb)
+            return self.push(avg_rgb, artifacts)
+        prev_t, prev_rgb = self.prev
+        if t <= prev_t:
+            return None  # Duplicate or out-of-order timestamp
+        self.prev = (t, avg_rgb)
+        last_k = int(np.floor((t - self.t0) * self.fs + 1e-9))
+        if last_k < self.next_k:
+            return None
+        grid = self.t0 + np.arange(self.next_k, last_k + 1) / self.fs
+        self.next_k = last_k + 1
+        weights = ((grid - prev_t) / (t - prev_t))[:, None]
+        result = None
+        for sample in prev_rgb + weights * (avg_rgb - prev_rgb):
+            result = self.push(sample, artifacts) or result
+        return result
+
+    # Add one sample on the uniform grid
+    def push(self, avg_rgb, artifacts=(0.0, 0.0)):
+        green = avg_rgb[1]
+        if self.zi is None:
+            self.zi = self.design[1] * green  # Start in steady state to avoid the step transient
+        with self.profiler.stage("bandpass"):
+            y, self.zi = scipy_signal.sosfilt(self.sos, [green], zi=self.zi)
+        pos = self.count % self.size
+        self.rgb[pos] = avg_rgb[:3]
+        self.filtered[pos] = y[0]
+        self.artifacts[pos] = artifacts
+        self.count += 1
+        if self.count < self.min_samples or (self.count - self.min_samples) % self.hop:
+            return None
+        with self.profiler.stage("window"):
+            self.last = self.estimate()
+        self.profiler.count("windows_total")
+        if not self.last["quality"]["ok"]:
+            self.profiler.count("windows_rejected_total")
+        return self.last
+
+    # Chronological copy of the last min(count, size) samples of a ring buffer
+    def window(self, buffer):
+        if self.count <= self.size:
+            return buffer[:self.count]
+        pos = self.count % self.size
+        return np.concatenate((buffer[pos:], buffer[:pos]))
+
+    def estimate(self):
+        fs = self.fs
+        stage = self.profiler.stage
+        rgb = self.window(self.rgb)
+        skipped = {"bpm": None, "peak_intervals": [], "peaks": [], "spo2": None, "hrv": None, "hrv_stats": None,
+                "stress": None, "respiration": None, "systolic": None, "diastolic": None}
+
+        # Cheap checks first: a window with too much ROI motion or saturated pixels is skipped before any DSP
+        motion, saturation = self.window(self.artifacts).mean(axis=0)
+        quality = self.gate.precheck(motion, saturation)
+        if not quality["ok"]:
+            return {**skipped, "quality": quality}
+
+        # HR and respiration from one Welch spectrum of the unfiltered window (the bandpass removes breathing).
+        # Windowed algorithms remove slow components, so respiration then comes from the green channel.
+        with stage("pulse"):
+            pulse = rgb[:, 1] if self.method == "green" else extract_pulse(rgb, fs, self.method)
+        with stage("spectrum"):
+            rates = estimate_rates(pulse, fs)
+            # No heart rate estimate (e.g. flat trace): no SNR, the window is rejected
+            hr_freq = rates["bpm"] / 60 if rates["bpm"] else None
+            quality = self.gate.assess(quality, spectral_snr(rates["freqs"], rates["psd"], hr_freq))
+        if not quality["ok"]:
+            return {**skipped, "quality": quality}
+
+        with stage("bandpass_window"):
+            if self.method == "green":
+                filtered_signal = self.window(self.filtered)
+            else:
+                # Windowed algorithms are recomputed on the current window only (bounded cost)
+                filtered_signal = zero_phase_filter(pulse, self.design)
+        with stage("respiration"):
+            respiration = rates["respiration"] if self.method == "green" else estimate_rates(rgb[:, 1], fs)["respiration"]
+        red_signal = rgb[:, 0]
+        infra_signal = 0.3 * red_signal + 0.59 * rgb[:, 1] + 0.11 * rgb[:, 2]
+
+        with stage("heart_rate"):
+            peak_intervals, peaks, _ = find_heart_peaks(filtered_signal, fs)
+        result = {"bpm": rates["bpm"], "peak_intervals": peak_intervals, "peaks": peaks,
+                "spo2": None, "hrv": None, "systolic": None, "diastolic": None, "quality": quality}
+        with stage("spo2"):
+            if verify_signal_strength(red_signal) and verify_signal_strength(infra_signal):
+                result["spo2"] = calculate_spo2(red_signal, infra_signal, fs)
+        with stage("hrv"):
+            stats = self.rr.update(peaks, self.count)
+            result["hrv"], result["hrv_stats"] = stats["sdnn"], stats  # HRV reported as SDNN (ms)
+            result["stress"] = stress_level(stats)
+            result["systolic"], result["diastolic"] = blood_pressure(stats)
+        result["respiration"] = respiration
+        return result